@@ -1,16 +1,17 @@
 from fastapi import APIRouter
 from pydantic import BaseModel
+import asyncio
 import logging
 from datetime import datetime
-from app.services.db.company import company_db_service
-from app.services.db.conversation import ConversationService
-from app.core.supabase.client import supabase_client
+from typing import Dict, Any, List, Optional
+from app.services.db.conversation import ConversationRollbackError, ConversationService
+from app.core.supabase.client import async_supabase_client
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
 # Initialize conversation service, savvy!
-conversation_service = ConversationService(supabase_client.get_client())
+conversation_service = ConversationService(async_supabase_client)
 
 class ProcessCompanyRequest(BaseModel):
     company_name: str
@@ -23,6 +24,116 @@ class ProcessCompanyResponse(BaseModel):
     conversation_id: str = ""  # New field for conversation ID!
     processed_at: str
 
+# Upper bound on one bulk request - each batch is a single insert per table
+MAX_BULK_COMPANIES = 500
+
+class ProcessCompaniesRequest(BaseModel):
+    company_names: List[str]
+
+class ProcessCompaniesResponse(BaseModel):
+    success: bool
+    message: str
+    succeeded: int
+    failed: int
+    results: List[ProcessCompanyResponse]
+
+def _conversation_name(company_name: str) -> str:
+    # Create conversation name with current date - arrr!
+    current_date = datetime.now().strftime("%d/%m/%Y")
+    return f"{company_name} analysis - {current_date}"
+
+def _failed_company(company_name: str, error: str) -> ProcessCompanyResponse:
+    return ProcessCompanyResponse(
+        success=False,
+        message=f"Failed to process company: {error}",
+        company_name=company_name,
+        processed_at=""
+    )
+
+async def _create_company_conversations(company_names: List[str]) -> List[Optional[Dict[str, Any]]]:
+    """
+    {"conversation", "company"} per name, in order - None where it couldn't be created.
+
+    The batch call is one transaction (the pre-migration fallback deletes its
+    conversations when the company insert fails), so if it fails each company
+    is retried on its own to find the bad ones instead of failing the whole
+    batch. If that rollback itself failed nothing is retried - a retry would
+    create a second set of conversations.
+    """
+    conversation_names = [_conversation_name(name) for name in company_names]
+    try:
+        return await conversation_service.create_company_conversations(company_names, conversation_names)
+    except ConversationRollbackError:
+        logger.error(f"🏴‍☠️ Company batch failed and couldn't be rolled back - not retrying {len(company_names)} companies")
+        return [None] * len(company_names)
+    except Exception:
+        logger.warning(f"🏴‍☠️ Company batch failed - retrying {len(company_names)} companies one by one")
+
+    results = await asyncio.gather(
+        *(conversation_service.create_company_conversation(company_name, conversation_name)
+          for company_name, conversation_name in zip(company_names, conversation_names)),
+        return_exceptions=True
+    )
+    return [None if isinstance(result, BaseException) else result for result in results]
+
+@router.post("/company/process-companies")
+async def process_companies(request: ProcessCompaniesRequest):
+    """
+    Onboard many companies at once - one database call instead of two round trips per company.
+
+    Every name gets its own result in request order. A name that fails (blank,
+    repeated or rejected by the database) is reported on its own without
+    aborting the rest of the batch.
+    """
+    company_names = [name.strip() for name in request.company_names]
+    logger.info(f"🏴‍☠️ PROCESSING {len(company_names)} COMPANIES")
+
+    if len(company_names) > MAX_BULK_COMPANIES:
+        return ProcessCompaniesResponse(
+            success=False,
+            message=f"Too many companies - send at most {MAX_BULK_COMPANIES} per request",
+            succeeded=0,
+            failed=len(company_names),
+            results=[]
+        )
+
+    results: List[Optional[ProcessCompanyResponse]] = [None] * len(company_names)
+    pending: List[int] = []
+    seen = set()
+    for i, company_name in enumerate(company_names):
+        if not company_name:
+            results[i] = _failed_company(company_name, "Company name is empty")
+        elif company_name.lower() in seen:
+            results[i] = _failed_company(company_name, "Company appears more than once in this request")
+        else:
+            seen.add(company_name.lower())
+            pending.append(i)
+
+    if pending:
+        created = await _create_company_conversations([company_names[i] for i in pending])
+        for i, result in zip(pending, created):
+            if result is None:
+                results[i] = _failed_company(company_names[i], "Could not create conversation and company")
+                continue
+            results[i] = ProcessCompanyResponse(
+                success=True,
+                message=f"Company '{company_names[i]}' and conversation saved successfully, captain!",
+                company_name=company_names[i],
+                company_id=result["company"]["id"],
+                conversation_id=result["conversation"]["id"],
+                processed_at=result["company"]["created_at"]
+            )
+
+    succeeded = sum(1 for result in results if result.success)
+    failed = len(results) - succeeded
+    return ProcessCompaniesResponse(
+        success=failed == 0,
+        message=f"Processed {succeeded} of {len(results)} companies" + (f" - {failed} failed" if failed else ", captain!"),
+        succeeded=succeeded,
+        failed=failed,
+        results=results
+    )
+
 @router.post("/company/process-company")
 async def process_company(request: ProcessCompanyRequest):
     """
@@ -35,26 +146,18 @@ async def process_company(request: ProcessCompanyRequest):
         logger.info(f"🏴‍☠️ PROCESSING COMPANY: {company_name}")
         print(f"=== COMPANY ANALYSIS REQUEST: {company_name} ===")
         
-        # Create conversation name with current date - arrr!
-        current_date = datetime.now().strftime("%d/%m/%Y")
-        conversation_name = f"{company_name} analysis - {current_date}"
-        
-        # Create the conversation first, ye landlubber!
-        conversation = conversation_service.create_conversation(conversation_name)
-        
-        # Save to database with conversation ID
-        db_result = company_db_service.save_company_analysis(company_name, conversation["id"])
-        
-        if not db_result["success"]:
-            raise Exception(f"Database error: {db_result.get('error', 'Unknown error')}")
+        # Conversation and company row together, in one atomic database call - arrr!
+        created = await conversation_service.create_company_conversation(
+            company_name, _conversation_name(company_name))
+        conversation, company = created["conversation"], created["company"]
         
         return ProcessCompanyResponse(
             success=True,
             message=f"Company '{company_name}' and conversation saved successfully, captain!",
             company_name=company_name,
-            company_id=db_result["id"],
+            company_id=company["id"],
             conversation_id=conversation["id"],
-            processed_at=db_result["created_at"]
+            processed_at=company["created_at"]
         )
         
     except Exception as e:
@@ -1,37 +1,79 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Query, Request, Response
 from pydantic import BaseModel
+import hashlib
 import logging
-from typing import List
-from app.services.db.conversation import ConversationService
-from app.core.supabase.client import supabase_client
+from typing import List, Optional
+from app.services.db.conversation import ConversationService, decode_cursor
+from app.core.supabase.client import async_supabase_client
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
 # Initialize conversation service, savvy!
-conversation_service = ConversationService(supabase_client.get_client())
+conversation_service = ConversationService(async_supabase_client)
 
 class ConversationResponse(BaseModel):
     id: str
     name: str
     created_at: str
+    company_id: Optional[str] = None
+    company_name: Optional[str] = None
+    tuesday_ticker: Optional[str] = None
 
 class GetConversationsResponse(BaseModel):
     success: bool
     conversations: List[ConversationResponse] = []
+    next_cursor: Optional[str] = None
     message: str = ""
 
+def _list_etag(conversations: List[dict], next_cursor: Optional[str], limit: int, cursor: Optional[str]) -> str:
+    """
+    ETag for a page - a digest of everything the page shows.
+
+    Renames, deletes, same-second inserts and company changes all change the
+    rows on the page, so they all change the tag.
+    """
+    digest = hashlib.sha1()
+    digest.update(f"{limit}|{cursor or ''}|{next_cursor or ''}|{len(conversations)}".encode())
+    for conv in conversations:
+        digest.update(f"|{conv['id']}:{conv['created_at']}:{conv['name']}".encode())
+        digest.update(f":{conv.get('company_id')}:{conv.get('company_name')}:{conv.get('tuesday_ticker')}".encode())
+    return f'W/"{digest.hexdigest()[:20]}"'
+
+def _not_modified(request: Request, etag: str) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    return etag in [tag.strip() for tag in if_none_match.split(",")] or if_none_match.strip() == "*"
+
 @router.get("/conversations")
-async def get_all_conversations():
+async def get_all_conversations(
+    request: Request,
+    response: Response,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = Query(None)
+):
     """
-    Fetch all conversations for the treasure chest, arrr!
+    Fetch a page of conversations for the treasure chest, arrr!
+    
+    Newest first, keyset-paginated - pass next_cursor back to get the next page.
+    Polling clients send If-None-Match and get a 304 (no body) when the page
+    hasn't changed.
     """
+    if cursor:
+        decode_cursor(cursor)  # Bad cursors are a 400, not a failed fetch
+
     try:
-        logger.info("🏴‍☠️ FETCHING ALL CONVERSATIONS")
-        print("=== CONVERSATIONS REQUEST ===")
+        logger.info(f"🏴‍☠️ FETCHING CONVERSATIONS (limit={limit}, cursor={'yes' if cursor else 'no'})")
         
-        # Get all conversations from the service
-        conversations = conversation_service.get_all_conversations()
+        page = await conversation_service.get_conversations_page(limit=limit, cursor=cursor)
+        conversations = page["conversations"]
+        etag = _list_etag(conversations, page["next_cursor"], limit, cursor)
+        cache_headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        
+        if _not_modified(request, etag):
+            return Response(status_code=304, headers=cache_headers)
+        response.headers.update(cache_headers)
         
         return GetConversationsResponse(
             success=True,
@@ -39,9 +81,13 @@ async def get_all_conversations():
                 ConversationResponse(
                     id=conv["id"],
                     name=conv["name"],
-                    created_at=conv["created_at"]
+                    created_at=conv["created_at"],
+                    company_id=str(conv["company_id"]) if conv.get("company_id") is not None else None,
+                    company_name=conv.get("company_name"),
+                    tuesday_ticker=conv.get("tuesday_ticker")
                 ) for conv in conversations
             ],
+            next_cursor=page["next_cursor"],
             message=f"Found {len(conversations)} conversations, captain!"
         )
         
@@ -51,4 +97,4 @@ async def get_all_conversations():
             success=False,
             conversations=[],
             message=f"Failed to fetch conversations: {str(e)}"
-        )
\ No newline at end of file
+        )
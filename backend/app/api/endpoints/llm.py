@@ -1,35 +1,24 @@
 import logging
 import json
-import os
 from typing import Dict, Any
 from fastapi import APIRouter, Query, WebSocket, WebSocketDisconnect, Depends, HTTPException
 from dotenv import load_dotenv
-from google.oauth2 import service_account
 from app.services.llm.investment_analysis_service import InvestmentAnalysisLLMService
+from app.services.llm.model_pool import chat_models
 
 load_dotenv()
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
 def get_google_credentials():
-    """Initialize Google Cloud credentials directly from JSON"""
-    credentials_json = os.getenv("GOOGLE_APPLICATION_CREDENTIALS_JSON")
-    project_id = os.getenv("GOOGLE_CLOUD_PROJECT")
-    
-    if not credentials_json:
-        logger.error("GOOGLE_APPLICATION_CREDENTIALS_JSON environment variable not set")
-        raise HTTPException(status_code=500, detail="Google Cloud credentials not configured")
-    
-    if not project_id:
-        logger.error("GOOGLE_CLOUD_PROJECT environment variable not set")
-        raise HTTPException(status_code=500, detail="Google Cloud project not configured")
-    
+    """Google Cloud credentials, parsed once at startup and shared by every connection"""
     try:
-        credentials_info = json.loads(credentials_json)
-        credentials = service_account.Credentials.from_service_account_info(credentials_info)
-        return {"credentials": credentials, "project_id": project_id}
-    except json.JSONDecodeError:
-        raise HTTPException(status_code=500, detail="Invalid Google Cloud credentials JSON")
+        chat_models.ensure_configured()
+    except ValueError as e:
+        logger.error(str(e))
+        raise HTTPException(status_code=500, detail="Google Cloud credentials not configured")
+    return {"credentials": chat_models.credentials, "project_id": chat_models.project_id}
+
 # Dependency to get CARA LLM service
 def get_cara_llm_service(creds: dict = Depends(get_google_credentials)):
     return InvestmentAnalysisLLMService(
@@ -0,0 +1,12 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from app.core.metrics import metrics
+
+router = APIRouter()
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """
+    Prometheus scrape endpoint - turn stage latencies, search hit rate and live session gauges
+    """
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
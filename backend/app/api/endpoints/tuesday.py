@@ -0,0 +1,169 @@
+from fastapi import APIRouter, Query
+from pydantic import BaseModel
+import logging
+from typing import Dict, List, Optional
+from app.services.db.tuesday_snapshot import tuesday_snapshot_store
+from app.services.db.tuesday_peers import peer_deltas, tuesday_peer_engine
+from app.services.db.tuesday_name_index import NON_COMPANY_TICKERS
+from app.core.supabase.errors import NotFoundError
+
+logger = logging.getLogger(__name__)
+router = APIRouter()
+
+class RefreshDatasetResponse(BaseModel):
+    success: bool
+    version: int = 0
+    count: int = 0
+    message: str = ""
+
+class CompanySuggestion(BaseModel):
+    ticker: str
+    name: str
+    label: str
+    score: float
+
+class SearchCompaniesResponse(BaseModel):
+    success: bool
+    companies: List[CompanySuggestion] = []
+    dataset_version: int = 0
+    message: str = ""
+
+class MetricDelta(BaseModel):
+    value: Optional[float] = None
+    peer_value: Optional[float] = None
+    delta: Optional[float] = None
+
+class Peer(BaseModel):
+    rank: int
+    ticker: str
+    name: str
+    distance: float
+    metrics: Dict[str, MetricDelta] = {}
+
+class CompanyPeersResponse(BaseModel):
+    success: bool
+    ticker: str = ""
+    name: str = ""
+    peers: List[Peer] = []
+    dataset_version: int = 0
+    message: str = ""
+
+class MetricRank(BaseModel):
+    value: Optional[float] = None
+    percentile: Optional[float] = None
+    rank: Optional[int] = None
+    count: int = 0
+
+class CompanyPercentilesResponse(BaseModel):
+    success: bool
+    ticker: str = ""
+    name: str = ""
+    metrics: Dict[str, MetricRank] = {}
+    dataset_version: int = 0
+    message: str = ""
+
+@router.get("/tuesday/companies/search")
+async def search_companies(q: str = Query("", max_length=100), limit: int = Query(8, ge=1, le=50)):
+    """
+    Autocomplete over the Tuesday dataset - served from the in-memory name index, no database trip
+    """
+    snapshot = await tuesday_snapshot_store.ensure_loaded()
+    if snapshot is None:
+        return SearchCompaniesResponse(success=False, message="Tuesday dataset not available")
+
+    matches = snapshot.name_index.search(q, limit=limit)
+    return SearchCompaniesResponse(
+        success=True,
+        companies=[
+            CompanySuggestion(score=score, **snapshot.name_index.describe(row))
+            for row, score in matches
+        ],
+        dataset_version=snapshot.version
+    )
+
+def _company_row(snapshot, ticker: str) -> int:
+    """Snapshot row for a company ticker - 404 for unknown tickers and non-company rows"""
+    row = snapshot.columns.row_for_ticker(ticker)
+    if row is None or snapshot.columns.tickers[row] in NON_COMPANY_TICKERS:
+        raise NotFoundError(f"Ticker {ticker.upper()} not found in the Tuesday dataset")
+    return row
+
+@router.get("/companies/{ticker}/peers")
+async def get_company_peers(ticker: str, limit: int = Query(5, ge=1, le=tuesday_peer_engine.k)):
+    """
+    Most similar companies in the Tuesday dataset, closest first, with per-metric deltas (peer minus company).
+
+    limit goes up to the precomputed table size (TUESDAY_PEER_TABLE_SIZE).
+    """
+    snapshot = await tuesday_snapshot_store.ensure_loaded()
+    if snapshot is None:
+        return CompanyPeersResponse(success=False, message="Tuesday dataset not available")
+
+    row = _company_row(snapshot, ticker)
+
+    table = snapshot.peer_table
+    company = snapshot.companies[row]
+    return CompanyPeersResponse(
+        success=True,
+        ticker=company.get("stock_ticker") or "",
+        name=company.get("company_name") or "",
+        peers=[
+            Peer(
+                rank=rank,
+                ticker=snapshot.companies[peer].get("stock_ticker") or "",
+                name=snapshot.companies[peer].get("company_name") or "",
+                distance=round(distance, 4),
+                metrics=peer_deltas(snapshot.columns, row, peer, table.fields)
+            )
+            for rank, (peer, distance) in enumerate(table.peers(row, limit), start=1)
+        ],
+        dataset_version=snapshot.version
+    )
+
+@router.get("/companies/{ticker}/percentiles")
+async def get_company_percentiles(ticker: str):
+    """
+    Percentile (0-100) and rank (#1 = highest) of a company in every Tuesday metric - precomputed per dataset version
+    """
+    snapshot = await tuesday_snapshot_store.ensure_loaded()
+    if snapshot is None:
+        return CompanyPercentilesResponse(success=False, message="Tuesday dataset not available")
+
+    row = _company_row(snapshot, ticker)
+
+    ranks = snapshot.ranks
+    metrics = {}
+    for field, count in ranks.counts.items():
+        found = ranks.lookup(row, field) or {"count": count}
+        metrics[field] = MetricRank(value=snapshot.columns.value(row, field), **found)
+
+    company = snapshot.companies[row]
+    return CompanyPercentilesResponse(
+        success=True,
+        ticker=company.get("stock_ticker") or "",
+        name=company.get("company_name") or "",
+        metrics=metrics,
+        dataset_version=snapshot.version
+    )
+
+@router.post("/tuesday/refresh")
+async def refresh_tuesday_dataset():
+    """
+    Reload the shared Tuesday dataset snapshot on demand, arrr!
+    """
+    logger.info("🏴‍☠️ ON-DEMAND TUESDAY REFRESH")
+    result = await tuesday_snapshot_store.refresh()
+
+    if not result["success"]:
+        return RefreshDatasetResponse(
+            success=False,
+            version=tuesday_snapshot_store.version,
+            message=f"Failed to refresh dataset: {result.get('error', 'Unknown error')}"
+        )
+
+    return RefreshDatasetResponse(
+        success=True,
+        version=result["version"],
+        count=result["count"],
+        message=f"Tuesday dataset v{result['version']} loaded with {result['count']} companies, captain!"
+    )
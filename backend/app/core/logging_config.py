@@ -1,42 +1,94 @@
+import atexit
 import logging
-from logging.handlers import RotatingFileHandler
+import os
+import queue
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+# The background thread that owns the real handlers - see setup_logging()
+_listener = None
+
+
+class DroppingQueueHandler(QueueHandler):
+    """
+    QueueHandler that never blocks the event loop.
+
+    Records are formatted here (so args can't change under the writer thread)
+    and dropped, counted, if the queue is full.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
 
 def setup_logging():
+    """
+    Route every log record through a queue to a background writer thread.
+
+    The event loop only formats the record and puts it on the queue - the
+    console and file writes (and file rotation) happen on the listener thread.
+    """
+    global _listener
+
     # Configure root logger at INFO level instead of DEBUG
     root_logger = logging.getLogger()
     root_logger.setLevel(logging.INFO)
-    
+
     # Clear existing handlers (prevents duplicate logs)
     if root_logger.handlers:
         root_logger.handlers.clear()
-    
-    # Create handlers
+    if _listener is not None:
+        _listener.stop()
+
+    # Create handlers - these only ever run on the listener thread
     c_handler = logging.StreamHandler()
-    f_handler = RotatingFileHandler('app.log', maxBytes=10000, backupCount=3)
-    
+    f_handler = RotatingFileHandler(
+        os.environ.get("LOG_FILE", "app.log"),
+        maxBytes=int(os.environ.get("LOG_MAX_BYTES", 10 * 1024 * 1024)),
+        backupCount=int(os.environ.get("LOG_BACKUP_COUNT", 5))
+    )
+
     # Set console to INFO and file to DEBUG (for troubleshooting)
     c_handler.setLevel(logging.INFO)
     f_handler.setLevel(logging.DEBUG)
-    
+
     # Create formatters and add to handlers
     format = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
     c_handler.setFormatter(format)
     f_handler.setFormatter(format)
-    
-    # Add handlers to the root logger
-    root_logger.addHandler(c_handler)
-    root_logger.addHandler(f_handler)
-    
+
+    # The root logger only gets the queue handler
+    log_queue = queue.Queue(maxsize=int(os.environ.get("LOG_QUEUE_SIZE", 10000)))
+    root_logger.addHandler(DroppingQueueHandler(log_queue))
+    _listener = QueueListener(log_queue, c_handler, f_handler, respect_handler_level=True)
+    _listener.start()
+
     # Reduce verbosity for noisy third-party libraries
     logging.getLogger('httpx').setLevel(logging.WARNING)
     logging.getLogger('httpcore').setLevel(logging.WARNING)
     logging.getLogger('hpack').setLevel(logging.ERROR)  # Very noisy
     logging.getLogger('anthropic').setLevel(logging.INFO)
     logging.getLogger('urllib3').setLevel(logging.WARNING)
-    
+
     # Ensure your app's logs are still informative
     app_logger = logging.getLogger('app')
     app_logger.setLevel(logging.INFO)
-    
+
     # Test log message
-    app_logger.info("Logging has been set up")
\ No newline at end of file
+    app_logger.info("Logging has been set up")
+
+
+def stop_logging():
+    """Write out everything still queued and stop the writer thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+atexit.register(stop_logging)
@@ -0,0 +1,223 @@
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Seconds - covers a cached lookup through a slow model turn
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()  # Updated from the event loop and from to_thread workers
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in items]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, *args, function: Optional[Callable[[], float]] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[LabelValues, float] = {} if self.labelnames else {(): 0.0}
+        self._function = function  # Read at scrape time, for values another object already tracks
+
+    def set(self, value: float, **labels: str) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+    def set_function(self, function: Callable[[], float]) -> None:
+        self._function = function
+
+    def render(self) -> List[str]:
+        if self._function is not None:
+            try:
+                return [f"{self.name} {_format_value(float(self._function()))}"]
+            except Exception:
+                return []
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in items]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, *args, buckets: Sequence[float] = DEFAULT_BUCKETS, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self._series: Dict[LabelValues, List[float]] = {}  # Bucket counts, then sum, then count
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0.0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1  # Cumulative counts are summed at render time
+                    break
+            series[-2] += value
+            series[-1] += 1
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def count(self, **labels: str) -> int:
+        series = self._series.get(self._key(labels))
+        return int(series[-1]) if series else 0
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted((key, list(series)) for key, series in self._series.items())
+        lines = []
+        for key, series in items:
+            cumulative = 0.0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                le = 'le="' + _format_value(bound) + '"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {_format_value(cumulative)}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(series[-2])}")
+            lines.append(f"{self.name}_count{labels} {_format_value(series[-1])}")
+        return lines
+
+
+class MetricsRegistry:
+    """
+    Just enough of the Prometheus client for /metrics - counters, gauges and
+    histograms rendered in the text exposition format, no extra dependency.
+    """
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def _register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+              function: Optional[Callable[[], float]] = None) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames, function=function))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets=buckets))
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.header())
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+# Single registry for the process
+metrics = MetricsRegistry()
+
+# Every stage of a chat turn, in one place
+HTTP_REQUEST_SECONDS = metrics.histogram(
+    "cara_http_request_seconds", "HTTP request time by route", ["method", "route", "status"])
+DB_QUERY_SECONDS = metrics.histogram(
+    "cara_db_query_seconds", "Supabase query time by calling service method", ["method", "outcome"])
+SEARCH_SECONDS = metrics.histogram(
+    "cara_search_seconds", "Time a caller waited on web search", ["result"])
+SEARCH_CACHE = metrics.counter(
+    "cara_search_cache_total", "Web search cache lookups", ["result"])
+PROMPT_BUILD_SECONDS = metrics.histogram(
+    "cara_prompt_build_seconds", "Time to build a turn's prompt")
+PROMPT_SECTIONS_SECONDS = metrics.histogram(
+    "cara_prompt_sections_seconds", "Time to render or fetch the static prompt sections", ["cache"])
+TTFT_SECONDS = metrics.histogram(
+    "cara_time_to_first_token_seconds", "Message received to first content chunk")
+TOKENS_PER_SECOND = metrics.histogram(
+    "cara_tokens_per_second", "Output tokens per second after the first token",
+    buckets=(1, 5, 10, 20, 40, 80, 160, 320, 640))
+TURN_SECONDS = metrics.histogram(
+    "cara_turn_seconds", "Message received to turn complete", ["outcome"])
+ACTIVE_WEBSOCKETS = metrics.gauge(
+    "cara_active_websockets", "Open chat websockets")
+LIVE_CHAINS = metrics.gauge(
+    "cara_live_chains", "Chain sessions held in the session registry")
+DATASET_VERSION = metrics.gauge(
+    "cara_tuesday_dataset_version", "Version of the Tuesday snapshot being served")
+LLM_ACTIVE_CALLS = metrics.gauge(
+    "cara_llm_active_calls", "Model calls holding a scheduler slot")
+LLM_QUEUED_CALLS = metrics.gauge(
+    "cara_llm_queued_calls", "Model calls waiting for a scheduler slot")
+SINGLE_FLIGHT = metrics.counter(
+    "cara_single_flight_total", "Coalesced upstream calls - started vs joined an in-flight one", ["flight", "result"])
+ANSWER_CACHE = metrics.counter(
+    "cara_answer_cache_total", "Answer cache lookups for opening questions", ["result"])
+DATASET_CONTEXT = metrics.counter(
+    "cara_dataset_context_total", "Dataset blocks put into investment prompts - selected vs full", ["mode"])
+SEND_QUEUE_DEPTH = metrics.gauge(
+    "cara_send_queue_depth", "Messages waiting in websocket send queues, all sockets")
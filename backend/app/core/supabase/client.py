@@ -1,7 +1,11 @@
-from supabase import create_client, Client
+from supabase import create_client, Client, AsyncClient, AsyncClientOptions
+from postgrest.exceptions import APIError as PostgrestAPIError
+import asyncio
 import os
+import time
 from dotenv import load_dotenv
 from pathlib import Path
+from app.core.metrics import DB_QUERY_SECONDS
 
 # Load environment variables right here, before we try to use them
 # Get the backend directory (where your .env file is)
@@ -29,4 +33,75 @@ class SupabaseClient:
     def get_client(self) -> Client:
         return self.client
 
-supabase_client = SupabaseClient()
\ No newline at end of file
+supabase_client = SupabaseClient()
+
+# PostgREST / Postgres codes for a function, table or view that doesn't exist (yet)
+MISSING_SCHEMA_CODES = {"PGRST202", "PGRST205", "42883", "42P01"}
+
+def is_missing_schema_object(error: Exception) -> bool:
+    """True if a query failed only because a migration hasn't been applied"""
+    return isinstance(error, PostgrestAPIError) and error.code in MISSING_SCHEMA_CODES
+
+
+class AsyncSupabaseClient:
+    """
+    Async Supabase client shared by every DB service - queries never block the event loop.
+
+    One AsyncClient means one pooled HTTP session for PostgREST. Every query
+    goes through execute(), which bounds concurrency and applies a hard timeout.
+    SUPABASE_URL can point at any PostgREST-compatible stand-in for testing.
+    """
+    def __init__(self):
+        self.url = os.environ.get("SUPABASE_URL")
+        self.key = os.environ.get("SUPABASE_KEY")
+        if not self.url or not self.key:
+            raise ValueError(
+                f"Missing Supabase credentials. Please set SUPABASE_URL and SUPABASE_KEY in {env_path}"
+            )
+
+        self.timeout = float(os.environ.get("SUPABASE_TIMEOUT_SECONDS", 10))
+        self.max_concurrency = int(os.environ.get("SUPABASE_MAX_CONCURRENCY", 16))
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        # The HTTP timeout is only a backstop - execute()'s deadline fires first, so a slow
+        # query always surfaces as asyncio.TimeoutError and is timed as a timeout
+        self.client = AsyncClient(
+            self.url,
+            self.key,
+            AsyncClientOptions(postgrest_client_timeout=self.timeout + 1)
+        )
+        print(f"✅ Async Supabase client ready (max {self.max_concurrency} concurrent queries, {self.timeout:.0f}s timeout)")
+
+    def get_client(self) -> AsyncClient:
+        return self.client
+
+    def table(self, name: str):
+        """Start a query - pass the built query to execute()"""
+        return self.client.table(name)
+
+    def rpc(self, fn: str, params: dict = None):
+        """Call a database function - pass the built call to execute()"""
+        return self.client.rpc(fn, params or {})
+
+    async def execute(self, query, label: str):
+        """
+        Run a built query with bounded concurrency and a hard timeout.
+
+        Timed under label - the calling service method, e.g. "ConversationService.create_conversation".
+        """
+        started = time.perf_counter()
+        outcome = "error"
+        try:
+            async with self._semaphore:
+                result = await asyncio.wait_for(query.execute(), timeout=self.timeout)
+            outcome = "ok"
+            return result
+        except asyncio.TimeoutError:
+            outcome = "timeout"
+            raise
+        finally:
+            DB_QUERY_SECONDS.observe(time.perf_counter() - started, method=label, outcome=outcome)
+
+    async def aclose(self) -> None:
+        await self.client.postgrest.aclose()
+
+async_supabase_client = AsyncSupabaseClient()
\ No newline at end of file
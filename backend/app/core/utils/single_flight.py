@@ -0,0 +1,62 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Hashable, TypeVar
+from app.core.metrics import SINGLE_FLIGHT
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """
+    Concurrent calls for the same key share one in-flight call.
+
+    The first caller starts the call and later callers await the same task,
+    so a burst of N identical requests costs one upstream request. Nothing is
+    cached: the key is dropped the moment the call finishes, so the next call
+    goes upstream again, and an error reaches only the callers of that flight.
+    Results are shared objects - callers must not mutate them.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self.started = 0
+        self.joined = 0
+
+    def __len__(self) -> int:
+        return len(self._inflight)
+
+    def start(self, key: Hashable, call: Callable[[], Awaitable[T]]) -> "asyncio.Task[T]":
+        """The in-flight task for key, started with call() if there isn't one"""
+        task = self._inflight.get(key)
+        if task is not None:
+            self.joined += 1
+            SINGLE_FLIGHT.inc(flight=self.name, result="joined")
+            return task
+        task = asyncio.get_running_loop().create_task(call())
+        self._inflight[key] = task
+        task.add_done_callback(lambda done: self._finish(key, done))
+        self.started += 1
+        SINGLE_FLIGHT.inc(flight=self.name, result="started")
+        return task
+
+    async def do(self, key: Hashable, call: Callable[[], Awaitable[T]]) -> T:
+        """
+        Await the shared call for key.
+
+        A caller that is cancelled stops waiting without cancelling the call
+        for everyone else.
+        """
+        return await asyncio.shield(self.start(key, call))
+
+    def _finish(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled() and task.exception() is not None:
+            # Marks the error retrieved even if every caller gave up waiting
+            logger.debug(f"{self.name} call for {key!r} failed: {task.exception()!r}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {"in_flight": len(self._inflight), "started": self.started, "joined": self.joined}
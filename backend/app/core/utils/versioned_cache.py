@@ -0,0 +1,38 @@
+import logging
+import threading
+from typing import Callable, Dict, Generic, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class VersionedCache(Generic[T]):
+    """
+    One computed value per dataset version, built at most once.
+
+    Only the newest max_versions are kept - chains may still hold the
+    previous snapshot while a new one rolls out. Computing happens under a
+    lock, so concurrent threads asking for a new version wait for one build.
+    """
+
+    def __init__(self, name: str, max_versions: int = 2):
+        self.name = name
+        self.max_versions = max_versions
+        self._values: Dict[int, T] = {}
+        self._lock = threading.Lock()
+
+    def get(self, version: int, compute: Callable[[], T]) -> T:
+        value = self._values.get(version)
+        if value is not None:
+            return value
+
+        with self._lock:
+            value = self._values.get(version)
+            if value is None:
+                logger.info(f"🏴‍☠️ Computing {self.name} for dataset v{version}")
+                value = compute()
+                self._values[version] = value
+                for old_version in sorted(self._values)[:-self.max_versions]:
+                    del self._values[old_version]
+        return value
@@ -1,3 +1,5 @@
+from contextlib import asynccontextmanager
+import asyncio
 from fastapi import FastAPI, Request
 from fastapi.responses import JSONResponse
 from app.core.supabase.errors import APIError
@@ -5,8 +7,22 @@ from app.core.supabase.errors import APIError
 from app.api.endpoints.llm import router as chat_router  # Add this line!
 from app.api.endpoints.company import router as company_router
 from app.api.endpoints.conversations import router as conversations_router 
+from app.api.endpoints.tuesday import router as tuesday_router
+from app.api.endpoints.metrics import router as metrics_router
+from app.services.db.tuesday_snapshot import tuesday_snapshot_store
+from app.services.search.serper import serper_search
+from app.services.db.messages import message_buffer
+from app.services.llm.session_registry import chain_sessions
+from app.services.llm.model_pool import chat_models
+from app.services.llm.llm_scheduler import llm_scheduler
+from app.core.supabase.client import async_supabase_client
 from fastapi.middleware.cors import CORSMiddleware
 from app.core.logging_config import setup_logging
+from app.core.metrics import (
+    HTTP_REQUEST_SECONDS, LIVE_CHAINS, DATASET_VERSION, SEND_QUEUE_DEPTH, LLM_ACTIVE_CALLS, LLM_QUEUED_CALLS
+)
+from app.services.llm.stream_writer import send_queue_stats
+import time
 import logging
 import os
 from dotenv import load_dotenv
@@ -25,7 +41,37 @@ logger.info(f"Loading .env from: {env_path} (exists: {os.path.exists(str(env_pat
 logger.info(f"SUPABASE_URL present: {os.environ.get('SUPABASE_URL') is not None}")
 logger.info(f"SUPABASE_KEY present: {os.environ.get('SUPABASE_KEY') is not None}")
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Parse Google credentials once for the whole process
+    startup = []
+    try:
+        chat_models.ensure_configured()
+        startup.append(chat_models.warm_up())
+    except ValueError as e:
+        logger.error(f"Google Cloud credentials not configured: {str(e)}")
+    # Load the shared Tuesday dataset while the model clients connect, before the first socket opens
+    startup.append(tuesday_snapshot_store.refresh())
+    await asyncio.gather(*startup)
+    tuesday_snapshot_store.start_background_refresh()
+    message_buffer.start_background_flush()
+    chain_sessions.start_background_sweep()
+    yield
+    await chain_sessions.stop_background_sweep()
+    await tuesday_snapshot_store.stop_background_refresh()
+    # Buffered chat messages go out before the database client closes
+    await message_buffer.stop_background_flush()
+    await serper_search.aclose()
+    await async_supabase_client.aclose()
+
+app = FastAPI(lifespan=lifespan)
+
+# Gauges read straight from the objects that already track them, at scrape time
+LIVE_CHAINS.set_function(lambda: len(chain_sessions))
+DATASET_VERSION.set_function(lambda: tuesday_snapshot_store.version)
+SEND_QUEUE_DEPTH.set_function(lambda: sum(writer["depth"] for writer in send_queue_stats()))
+LLM_ACTIVE_CALLS.set_function(lambda: llm_scheduler.active)
+LLM_QUEUED_CALLS.set_function(lambda: llm_scheduler.queued)
 
 # Add CORS middleware
 app.add_middleware(
@@ -42,13 +88,25 @@ app.add_middleware(
 @app.middleware("http")
 async def log_requests(request: Request, call_next):
     logger.info(f"Request: {request.method} {request.url.path}")
+    started = time.perf_counter()
+    status = "500"
     try:
         response = await call_next(request)
+        status = str(response.status_code)
         logger.info(f"Response status: {response.status_code}")
         return response
     except Exception as e:
         logger.error(f"Request failed: {str(e)}")
         raise
+    finally:
+        # Route template, not the raw path, so IDs don't explode the label set
+        route = request.scope.get("route")
+        HTTP_REQUEST_SECONDS.observe(
+            time.perf_counter() - started,
+            method=request.method,
+            route=getattr(route, "path", "unmatched"),
+            status=status
+        )
 
 # Add exception handler for custom API errors
 @app.exception_handler(APIError)
@@ -73,6 +131,8 @@ async def general_exception_handler(request: Request, exc: Exception):
 app.include_router(company_router, tags=["company"])
 app.include_router(conversations_router, tags=["conversations"])  # Add this line!
 app.include_router(chat_router, tags=["chat"])  # Add this line!
+app.include_router(tuesday_router, tags=["tuesday"])
+app.include_router(metrics_router, tags=["metrics"])
 
 @app.get("/health")
 async def health_check():
@@ -1,17 +1,43 @@
-from typing import AsyncGenerator, Dict, Any, List
+from typing import AsyncGenerator, Dict, Any, List, Optional
+import asyncio
 import logging
+import os
+import random
+import time
 from langchain_google_vertexai import ChatVertexAI
-from langchain_core.messages import HumanMessage, AIMessage, BaseMessage
+from langchain_core.messages import BaseMessage
+from google.api_core.exceptions import TooManyRequests
+from .conversation_history import ConversationHistory, estimate_tokens
+from ..db.messages import message_buffer, message_service
+from ..llm.llm_scheduler import LLMQueueFull, QueueStatus, llm_scheduler
+from ..llm.answer_cache import AnswerKey, answer_cache
+from ...core.metrics import PROMPT_BUILD_SECONDS, TTFT_SECONDS, TOKENS_PER_SECOND, TURN_SECONDS
 
 logger = logging.getLogger(__name__)
 
+# Newest persisted messages read back when a conversation is resumed
+DEFAULT_HYDRATE_MESSAGES = 24
+
+# Prompt dumps: a sampled share of turns, each message cut to PROMPT_LOG_CHARS.
+# Sessions with debug logging on (DEBUG_CONVERSATIONS or a "debug" socket message) dump every prompt in full.
+# Clients can only send "debug" when LOG_DEBUG_TOGGLE_ENABLED is set - otherwise the message is ignored.
+PROMPT_LOG_SAMPLE_RATE = float(os.environ.get("PROMPT_LOG_SAMPLE_RATE", 0.01))
+PROMPT_LOG_CHARS = int(os.environ.get("PROMPT_LOG_CHARS", 500))
+DEBUG_CONVERSATIONS = {
+    conversation_id.strip()
+    for conversation_id in os.environ.get("DEBUG_CONVERSATIONS", "").split(",")
+    if conversation_id.strip()
+}
+LOG_DEBUG_TOGGLE_ENABLED = os.environ.get("LOG_DEBUG_TOGGLE_ENABLED", "").lower() in ("1", "true", "yes")
+
 class BaseConversationChain:
     """
     Base class for all conversation chains.
     
     Handles:
-    - Universal LLM streaming logic
-    - Message history management  
+    - Universal LLM streaming logic (admitted through the shared LLM scheduler)
+    - Message history management (token-budgeted, with a rolling summary)
+    - History persistence (write-behind to the messages table, hydrated on resume)
     - Error handling
     - Context loading
     
@@ -19,35 +45,144 @@ class BaseConversationChain:
     - get_formatted_prompt() - for chain-specific prompt formatting
     """
     
-    def __init__(self, llm: ChatVertexAI):
+    def __init__(self, llm: ChatVertexAI, history: Optional[ConversationHistory] = None,
+                 summarizer_llm: Optional[ChatVertexAI] = None):
         self.chat_model = llm
-        self.messages: List[BaseMessage] = []
+        self.history = history or ConversationHistory()
+        self.summarizer_llm = summarizer_llm or llm
+        self.conversation_id: Optional[str] = None
+        self._history_hydrated = False
+        self.debug_logging = False  # Full prompt dumps for this session only
+        # Sockets on the same conversation share this chain - one turn at a time keeps the history in order
+        self._turn_lock = asyncio.Lock()
+
+    def bind_conversation(self, conversation_id: str) -> None:
+        """Persist this chain's turns under conversation_id - history is read back on the first message"""
+        if conversation_id != self.conversation_id:
+            self.conversation_id = conversation_id
+            self._history_hydrated = False
+
+    async def _hydrate_history(self) -> None:
+        """Load earlier turns once per bound conversation, with a bounded read"""
+        if self._history_hydrated or not self.conversation_id:
+            return
+        self._history_hydrated = True
+        try:
+            # Anything still buffered goes first, so the read sees every earlier turn
+            await message_buffer.flush(self.conversation_id)
+            limit = int(os.environ.get("HISTORY_HYDRATE_MESSAGES", DEFAULT_HYDRATE_MESSAGES))
+            rows = await message_service.get_recent_messages(self.conversation_id, limit)
+            rows += message_buffer.pending(self.conversation_id)  # Only left if the flush failed
+        except Exception as e:
+            logger.error(f"Failed to load history for conversation {self.conversation_id}: {str(e)}")
+            return
+        if self.history.turns or self.history.summary:
+            return  # Turns already in memory are newer than anything persisted
+        added = self.history.load_messages(rows)
+        if added:
+            logger.info(f"🏴‍☠️ Resumed {added} turns for conversation {self.conversation_id}")
+            self.history.schedule_summary(self.summarizer_llm)
+
+    def _persist_turn(self, message: str, response: str) -> None:
+        """Hand the turn to the write-behind buffer - returns without waiting on the database"""
+        if not self.conversation_id:
+            return
+        message_buffer.add(self.conversation_id, "user", message)
+        message_buffer.add(self.conversation_id, "assistant", response)
+        message_buffer.flush_soon(self.conversation_id)
+
+    def estimated_bytes(self) -> int:
+        """Rough memory held by this chain, for session registry limits"""
+        return self.history.estimated_bytes()
+
+    def _log_prompt(self, formatted_prompt: List[BaseMessage]) -> None:
+        """Dump the prompt for debug sessions, and a truncated copy for a sample of turns"""
+        debug = self.debug_logging or self.conversation_id in DEBUG_CONVERSATIONS
+        if not debug and random.random() >= PROMPT_LOG_SAMPLE_RATE:
+            return
+        lines = [f"=== Formatted Messages ({'debug session' if debug else 'sampled'}) ==="]
+        for i, msg in enumerate(formatted_prompt):
+            content = msg.content if isinstance(msg.content, str) else str(msg.content)
+            if not debug and len(content) > PROMPT_LOG_CHARS:
+                content = f"{content[:PROMPT_LOG_CHARS]}... [{len(content) - PROMPT_LOG_CHARS} more chars]"
+            lines.append(f"Message {i+1} ({type(msg).__name__}): {content}")
+        # One record, not one per message
+        logger.info("\n".join(lines))
+
+    @property
+    def messages(self) -> List[BaseMessage]:
+        """History for the prompt - summary plus recent turns, within the token budget"""
+        return self.history.prompt_messages()
 
     async def process_message(self, message: str) -> AsyncGenerator[Dict[str, Any], None]:
         """
         Universal LLM streaming logic.
         
         Gets formatted prompt from subclass, streams LLM response,
-        manages conversation history, handles errors.
+        manages conversation history, handles errors. Turns run one at a
+        time per chain - a second socket's message waits for the current turn.
         """
+        async with self._turn_lock:
+            async for response in self._process_turn(message):
+                yield response
+
+    async def _process_turn(self, message: str) -> AsyncGenerator[Dict[str, Any], None]:
+        started = time.perf_counter()
         try:
+            await self._hydrate_history()
+
             # Get formatted prompt from subclass
             formatted_prompt = await self.get_formatted_prompt(message)
+            prompt_ready = time.perf_counter()
+            PROMPT_BUILD_SECONDS.observe(prompt_ready - started)
+            self._log_prompt(formatted_prompt)
+
+            # Same question, same company, data and search - replay the earlier answer
+            cache_key = self.answer_cache_key(message) if answer_cache.enabled else None
+            cached = answer_cache.get(cache_key) if cache_key is not None else None
+            if cached is not None:
+                TTFT_SECONDS.observe(time.perf_counter() - started)
+                for chunk_content in answer_cache.replay(cached):
+                    yield {
+                        "type": "content",
+                        "data": chunk_content
+                    }
+                yield {
+                    "type": "complete",
+                    "data": {"length": len(cached)}
+                }
+                self._finish_turn(message, cached)
+                TURN_SECONDS.observe(time.perf_counter() - started, outcome="cached")
+                logger.info(
+                    f"Turn complete: conversation={self.conversation_id} cached=true "
+                    f"prompt_ms={(prompt_ready - started) * 1000:.0f} chars={len(cached)}"
+                )
+                return
             
-            # Log the formatted messages for debugging
-            logger.info("\n=== Formatted Messages ===")
-            for i, msg in enumerate(formatted_prompt):
-                logger.info(f"\nMessage {i+1} ({type(msg).__name__}):")
-                logger.info(f"Content: {msg.content}")
-            logger.info("=====================")
-            
-            # Stream the response
+            # Stream the response - chunks are tallied here and logged once per turn below
             full_response = ""
-            async for chunk in self.chat_model.astream(input=formatted_prompt):
-                logger.info(f"Chunk: content='{chunk.content}', metadata={getattr(chunk, 'response_metadata', None)}")
+            chunks = 0
+            first_chunk_at = None
+            metadata: Dict[str, Any] = {}
+            # Admitted by the shared scheduler - queue updates are passed on while the call waits
+            model_stream = llm_scheduler.stream(
+                self.conversation_id or f"chain-{id(self):x}",
+                lambda: self.chat_model.astream(input=formatted_prompt)
+            )
+            async for chunk in model_stream:
+                if isinstance(chunk, QueueStatus):
+                    yield chunk.as_message()
+                    continue
+                chunks += 1
+                metadata.update(getattr(chunk, 'response_metadata', None) or {})
+                if getattr(chunk, 'usage_metadata', None):
+                    metadata['usage_metadata'] = chunk.usage_metadata
                 
                 chunk_content = chunk.content
                 if chunk_content:  # Only send non-empty content chunks
+                    if first_chunk_at is None:
+                        first_chunk_at = time.perf_counter()
+                        TTFT_SECONDS.observe(first_chunk_at - started)
                     full_response += chunk_content
                     yield {
                         "type": "content",
@@ -60,15 +195,41 @@ class BaseConversationChain:
                 "data": {"length": len(full_response)}
             }
 
-            # Add both messages to history after successful processing
-            self.messages.append(HumanMessage(content=message))
-            self.messages.append(AIMessage(content=full_response))
+            self._finish_turn(message, full_response)
+            if cache_key is not None and metadata.get('finish_reason') in (None, "STOP", "stop"):
+                answer_cache.put(cache_key, full_response)  # Complete answers only - not cut off or blocked
             
-            logger.debug("\n=== Final Conversation State ===")
-            logger.debug(f"Total messages: {len(self.messages)}")
-            logger.debug("=====================")
+            finished = time.perf_counter()
+            usage = metadata.get('usage_metadata') or {}
+            TURN_SECONDS.observe(finished - started, outcome="complete")
+            output_tokens = usage.get('output_tokens') or estimate_tokens(full_response)
+            if first_chunk_at is not None and finished > first_chunk_at and output_tokens:
+                TOKENS_PER_SECOND.observe(output_tokens / (finished - first_chunk_at))
+            logger.info(
+                f"Turn complete: conversation={self.conversation_id} "
+                f"prompt_messages={len(formatted_prompt)} prompt_ms={(prompt_ready - started) * 1000:.0f} "
+                f"ttft_ms={((first_chunk_at or finished) - started) * 1000:.0f} total_ms={(finished - started) * 1000:.0f} "
+                f"chunks={chunks} chars={len(full_response)} "
+                f"finish_reason={metadata.get('finish_reason')} "
+                f"tokens_in={usage.get('input_tokens')} tokens_out={usage.get('output_tokens')}"
+            )
+            logger.debug(f"History: {self.history.stats()}")
+                
+        except (TooManyRequests, LLMQueueFull) as e:
+            # Out of quota even after backing off - the socket stays open for the next message
+            TURN_SECONDS.observe(time.perf_counter() - started, outcome="rate_limited")
+            logger.error(f"Rate limit exceeded: {str(e)}")
+            yield {
+                "type": "error",
+                "data": {
+                    "code": "rate_limit",
+                    "message": "Rate limit exceeded. Please try again later.",
+                    "retry_after": round(getattr(e, "retry_after", None) or llm_scheduler.backoff_max)
+                }
+            }
                 
         except Exception as e:
+            TURN_SECONDS.observe(time.perf_counter() - started, outcome="error")
             logger.error(f"Error processing message: {str(e)}", exc_info=True)
             yield {
                 "type": "error",
@@ -90,5 +251,30 @@ class BaseConversationChain:
         """
         raise NotImplementedError("Subclasses must implement get_formatted_prompt")
 
+    def _finish_turn(self, message: str, response: str) -> None:
+        # Add the turn to history, then fold older turns into the summary in the background
+        self.history.add_turn(message, response)
+        self._persist_turn(message, response)
+        self.history.schedule_summary(self.summarizer_llm)
+        self.on_turn_complete()
+
+    def answer_cache_key(self, message: str) -> Optional[AnswerKey]:
+        """
+        Answer cache key for this turn, or None if the answer can't be reused.
+        
+        Called after get_formatted_prompt(), so it can use anything the prompt
+        was built from. The base chain never caches.
+        """
+        return None
+
+    def on_turn_complete(self) -> None:
+        """
+        Hook called after a turn's messages land in history.
+        
+        Subclasses use it to start background work for the next turn -
+        it must not block, since the client is already waiting on the socket.
+        """
+        pass
+
 
     
\ No newline at end of file
@@ -0,0 +1,168 @@
+import asyncio
+import logging
+import math
+import os
+from typing import Any, Dict, List, Optional, Tuple
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import HumanMessage, AIMessage, BaseMessage
+from ..llm.llm_scheduler import llm_scheduler
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TOKEN_BUDGET = 4000
+DEFAULT_KEEP_TURNS = 4
+
+SUMMARY_PROMPT = """You maintain a running summary of an investment analysis conversation between a user and CARA.
+Merge the existing summary and the new turns into one updated summary of at most {max_words} words.
+Keep company names, tickers, figures, conclusions and open questions. Drop pleasantries.
+
+Existing summary:
+{summary}
+
+New turns:
+{turns}
+
+Updated summary:"""
+
+Turn = Tuple[HumanMessage, AIMessage]
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token) - no tokenizer round trip"""
+    return math.ceil(len(text) / 4) if text else 0
+
+
+class ConversationHistory:
+    """
+    Token-budgeted conversation history with a rolling summary.
+
+    The last keep_turns turns stay verbatim. Older turns are folded into a
+    running summary by a background task after a turn completes. The prompt
+    view stays within token_budget (only the latest turn is always kept) -
+    turns waiting to be summarized are left out rather than blowing the budget.
+    """
+
+    def __init__(
+        self,
+        token_budget: Optional[int] = None,
+        keep_turns: Optional[int] = None,
+        summary_max_words: int = 250
+    ):
+        self.token_budget = token_budget if token_budget is not None else int(
+            os.environ.get("HISTORY_TOKEN_BUDGET", DEFAULT_TOKEN_BUDGET))
+        self.keep_turns = keep_turns if keep_turns is not None else int(
+            os.environ.get("HISTORY_KEEP_TURNS", DEFAULT_KEEP_TURNS))
+        self.summary_max_words = summary_max_words
+        self.turns: List[Turn] = []  # Turns not yet folded into the summary
+        self.summary = ""
+        self.summarized_turns = 0
+        self.raw_tokens = 0  # Every turn ever added, as if sent verbatim
+        self._turn_tokens: List[int] = []
+        self._summary_task: Optional[asyncio.Task] = None
+
+    def add_turn(self, human: str, ai: str) -> None:
+        self.turns.append((HumanMessage(content=human), AIMessage(content=ai)))
+        tokens = estimate_tokens(human) + estimate_tokens(ai)
+        self._turn_tokens.append(tokens)
+        self.raw_tokens += tokens
+
+    def load_messages(self, messages: List[Dict[str, Any]]) -> int:
+        """
+        Seed history from persisted {"role", "content"} rows, oldest first.
+
+        A user message followed by an assistant message makes a turn; anything
+        unpaired (a turn cut off by a disconnect) is skipped. Returns turns added.
+        """
+        added = 0
+        human: Optional[str] = None
+        for message in messages:
+            if message.get("role") == "user":
+                human = message.get("content") or ""
+            elif message.get("role") == "assistant" and human is not None:
+                self.add_turn(human, message.get("content") or "")
+                human = None
+                added += 1
+        return added
+
+    def _summary_messages(self) -> List[BaseMessage]:
+        if not self.summary:
+            return []
+        # A human/AI pair rather than a SystemMessage - Gemini only takes one system instruction
+        return [
+            HumanMessage(content=f"Summary of our earlier conversation:\n{self.summary}"),
+            AIMessage(content="Noted - I'll keep that earlier context in mind.")
+        ]
+
+    def prompt_messages(self) -> List[BaseMessage]:
+        """History to put in the prompt: summary, then as many recent turns as the budget allows"""
+        messages = self._summary_messages()
+        remaining = self.token_budget - sum(estimate_tokens(m.content) for m in messages)
+
+        kept: List[Turn] = []
+        for turn, tokens in zip(reversed(self.turns), reversed(self._turn_tokens)):
+            if len(kept) >= self.keep_turns or (kept and tokens > remaining):
+                break
+            # The latest turn always goes in - a prompt without it can't follow the conversation
+            kept.append(turn)
+            remaining -= tokens
+
+        for human, ai in reversed(kept):
+            messages.extend((human, ai))
+        return messages
+
+    def prompt_tokens(self) -> int:
+        return sum(estimate_tokens(m.content) for m in self.prompt_messages())
+
+    def estimated_bytes(self) -> int:
+        """Rough memory held by the history - message text dominates"""
+        return len(self.summary) + sum(len(human.content) + len(ai.content) for human, ai in self.turns)
+
+    def stats(self) -> Dict[str, Any]:
+        prompt_tokens = self.prompt_tokens()
+        return {
+            "turns": self.summarized_turns + len(self.turns),
+            "verbatim_turns": len(self.turns),
+            "summarized_turns": self.summarized_turns,
+            "summary_tokens": estimate_tokens(self.summary),
+            "prompt_tokens": prompt_tokens,
+            "raw_tokens": self.raw_tokens,
+            "tokens_saved": max(self.raw_tokens - prompt_tokens, 0)
+        }
+
+    def schedule_summary(self, llm: BaseChatModel) -> None:
+        """Fold turns older than keep_turns into the summary, off the streaming path"""
+        if len(self.turns) <= self.keep_turns:
+            return
+        if self._summary_task is not None and not self._summary_task.done():
+            return  # The running task picks up anything new on its next pass
+        try:
+            self._summary_task = asyncio.get_running_loop().create_task(self._summarize(llm))
+        except RuntimeError:
+            return
+
+    async def _summarize(self, llm: BaseChatModel) -> None:
+        while len(self.turns) > self.keep_turns:
+            count = len(self.turns) - self.keep_turns
+            old_turns = self.turns[:count]
+            turns_text = "\n".join(
+                f"User: {human.content}\nCARA: {ai.content}" for human, ai in old_turns
+            )
+            prompt = SUMMARY_PROMPT.format(
+                max_words=self.summary_max_words,
+                summary=self.summary or "(none yet)",
+                turns=turns_text
+            )
+            try:
+                # Background slot - shares the quota and backoff with user calls but never delays them
+                result = await llm_scheduler.invoke(
+                    f"summary-{id(self):x}", lambda: llm.ainvoke(prompt), background=True)
+            except Exception as e:
+                logger.error(f"History summarization failed: {str(e)}")
+                return
+
+            # Only the turns we summarized are dropped - new ones may have landed meanwhile
+            self.summary = result.content if isinstance(result.content, str) else str(result.content)
+            del self.turns[:count]
+            del self._turn_tokens[:count]
+            self.summarized_turns += count
+            logger.info(f"🏴‍☠️ Summarized {count} turns - history stats: {self.stats()}")
@@ -0,0 +1,201 @@
+import logging
+import os
+import re
+from typing import Dict, List, Optional, Tuple
+from .conversation_history import estimate_tokens
+from ..db.tuesday_columns import format_metric
+from ..db.tuesday_snapshot import TuesdaySnapshot
+from ...core.metrics import DATASET_CONTEXT
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_TOKENS = 450
+DEFAULT_PEERS = 5
+
+# Prompt label and unit per metric, in the order the block lists them
+METRIC_LABELS: Dict[str, Tuple[str, str]] = {
+    'ytd_return_percent': ('YTD Return', '%'),
+    'current_stock_price': ('Stock Price', '$'),
+    'market_cap_millions': ('Market Cap', '$M'),
+    'annual_revenue_millions': ('Annual Revenue', '$M'),
+    'ebitda_margin_percent': ('EBITDA Margin', '%'),
+    'return_on_invested_capital': ('ROIC', '%'),
+    'revenue_5yr_growth_rate': ('5Y Revenue Growth', '%'),
+    'sales_yoy_growth_percent': ('Sales YoY Growth', '%'),
+    'projected_3yr_sales_growth': ('Projected 3Y Growth', '%'),
+    'rule_of_40_score': ('Rule of 40', ''),
+    'rd_intensity_percent': ('R&D Intensity', '%'),
+    'capex_intensity_ratio': ('CapEx Intensity', ''),
+    'ghg_emissions_per_revenue': ('GHG Emissions/Revenue', ''),
+    'social_responsibility_score': ('Social Responsibility', ''),
+}
+
+# Where a high percentile is the bad end
+LOWER_IS_BETTER = frozenset({'ghg_emissions_per_revenue'})
+
+# Words in a question that point at metrics - matched on word starts, lowercase.
+# Generic investing words ("invest", "stock", "valued", "cheap") are left out on
+# purpose: "Is NVDA a good investment?" names no metric and gets the overview set.
+METRIC_KEYWORDS: Dict[str, Tuple[str, ...]] = {
+    'ytd_return_percent': ('ytd', 'year to date', 'return', 'performance', 'perform', 'share price'),
+    'current_stock_price': ('price',),
+    'market_cap_millions': ('market cap', 'size', 'big', 'large', 'small'),
+    'annual_revenue_millions': ('revenue', 'sales', 'size', 'top line'),
+    'ebitda_margin_percent': ('ebitda', 'margin', 'profitab', 'profit', 'earnings'),
+    'return_on_invested_capital': ('roic', 'return on invested', 'return on capital', 'capital efficien',
+                                   'profitab', 'moat', 'quality'),
+    'revenue_5yr_growth_rate': ('growth', 'growing', 'grow', '5 year', 'five year', 'long term', 'historical'),
+    'sales_yoy_growth_percent': ('growth', 'growing', 'grow', 'yoy', 'year over year', 'sales', 'momentum'),
+    'projected_3yr_sales_growth': ('growth', 'growing', 'grow', 'projected', 'forecast', 'outlook', 'future',
+                                   'guidance'),
+    'rule_of_40_score': ('rule of 40', 'saas', 'efficien', 'growth', 'profitab'),
+    'rd_intensity_percent': ('r&d', 'r and d', 'research', 'innovat'),
+    'capex_intensity_ratio': ('capex', 'capital expend', 'capital spend', 'capital intens', 'asset heavy',
+                              'asset light', 'asset intens'),
+    'ghg_emissions_per_revenue': ('ghg', 'emission', 'carbon', 'climate', 'esg', 'sustainab', 'green',
+                                  'environment', 'co2', 'footprint'),
+    'social_responsibility_score': ('social', 'esg', 'sustainab', 'responsib', 'governance', 'ethic', 'csr'),
+}
+
+# Shown when the question names no metric - an overview's worth, most important first
+DEFAULT_FIELDS = (
+    'ytd_return_percent', 'market_cap_millions', 'ebitda_margin_percent', 'return_on_invested_capital',
+    'sales_yoy_growth_percent', 'rule_of_40_score', 'ghg_emissions_per_revenue', 'social_responsibility_score'
+)
+
+# Questions about the whole dataset rather than the company - those get the full block
+DATASET_WIDE_PATTERN = re.compile(
+    r"\b(which|what) (other )?(companies|stocks|tickers|names)\b|\btop \d+\b|\bbottom \d+\b|\blist\b|"
+    r"\bscreen|\ball (the |of the )?(companies|stocks)\b|\bleaders\b|\blaggards\b|\bwhole dataset\b|"
+    r"\bentire dataset\b|\bacross the dataset\b"
+)
+
+_KEYWORD_PATTERNS = {
+    field: re.compile("|".join(r"\b" + re.escape(keyword) for keyword in keywords))
+    for field, keywords in METRIC_KEYWORDS.items()
+}
+
+
+def mentioned_metrics(message: str) -> List[str]:
+    """Metrics a question refers to, in the order it first mentions them"""
+    text = message.lower()
+    positions = {}
+    for field in METRIC_LABELS:
+        match = _KEYWORD_PATTERNS[field].search(text)
+        if match:
+            positions[field] = match.start()
+    return sorted(positions, key=positions.get)
+
+
+def is_dataset_wide(message: str) -> bool:
+    return bool(DATASET_WIDE_PATTERN.search(message.lower()))
+
+
+def _format_value(field: str, value: Optional[float]) -> str:
+    if value is None:
+        return "n/a"
+    unit = METRIC_LABELS[field][1]
+    text = format_metric(value)
+    if unit == '%':
+        return f"{text}%"
+    if unit == '$':
+        return f"${text}"
+    if unit == '$M':
+        return f"${text}M"
+    return text
+
+
+def _ordinal(n: int) -> str:
+    suffix = "th" if 10 <= n % 100 <= 20 else {1: "st", 2: "nd", 3: "rd"}.get(n % 10, "th")
+    return f"{n}{suffix}"
+
+
+class DatasetContextSelector:
+    """
+    Builds a compact, question-aware Tuesday dataset block for one company.
+
+    Instead of the global benchmark table for every prompt, the block holds
+    the company's value, percentile and the dataset median for just the
+    metrics the question mentions (an overview set if it names none), plus
+    its nearest peers from the peer table - all under a hard token cap. Returns
+    None when the full block fits better: no matched company, a question
+    about the whole dataset, or nothing useful fits the cap.
+    """
+
+    def __init__(self, max_tokens: Optional[int] = None, peers: Optional[int] = None,
+                 enabled: Optional[bool] = None):
+        self.max_tokens = max_tokens if max_tokens is not None else int(
+            os.environ.get("DATASET_CONTEXT_MAX_TOKENS", DEFAULT_MAX_TOKENS))
+        self.peers = peers if peers is not None else int(os.environ.get("DATASET_CONTEXT_PEERS", DEFAULT_PEERS))
+        self.enabled = enabled if enabled is not None else (
+            os.environ.get("DATASET_CONTEXT_MODE", "selected").lower() != "full")
+
+    def select(self, snapshot: Optional[TuesdaySnapshot], row: Optional[int], message: str) -> Optional[str]:
+        """The selected block, or None to use the full dataset block"""
+        if not self.enabled or snapshot is None or row is None or is_dataset_wide(message):
+            DATASET_CONTEXT.inc(mode="full")
+            return None
+
+        block = self._build(snapshot, row, message)
+        DATASET_CONTEXT.inc(mode="full" if block is None else "selected")
+        return block
+
+    def _build(self, snapshot: TuesdaySnapshot, row: int, message: str) -> Optional[str]:
+        columns = snapshot.columns
+        fields = [field for field in (mentioned_metrics(message) or DEFAULT_FIELDS) if columns.has_metric(field)]
+        summary = snapshot.analysis['metrics_summary']
+        company = snapshot.companies[row]
+
+        header = [
+            f"TUESDAY DATASET - {snapshot.count} companies, Bloomberg data from Tuesday 19 Aug 2025 "
+            f"(don't mention the data date unless asked).",
+            f"Selected for this question: {company.get('company_name')} ({company.get('stock_ticker')}) "
+            f"against the dataset. Percentile 100 and rank #1 = highest value in the dataset.",
+        ]
+
+        metric_lines = []
+        for field in fields:
+            value = columns.value(row, field)
+            if value is None:
+                continue
+            label = METRIC_LABELS[field][0]
+            rank = snapshot.ranks.lookup(row, field)
+            median = summary.get(field, {}).get('median')
+            line = (f"• {label}: {_format_value(field, value)} - {_ordinal(round(rank['percentile']))} percentile, "
+                    f"#{rank['rank']} of {rank['count']}")
+            if median is not None:
+                line += f", dataset median {_format_value(field, median)}"
+            if field in LOWER_IS_BETTER:
+                line += " (lower is better)"
+            metric_lines.append(line)
+        if not metric_lines:
+            return None
+
+        peer_lines = []
+        shown = [field for field in fields if columns.value(row, field) is not None][:3]
+        for peer, _ in snapshot.peer_table.peers(row, self.peers):
+            peer_company = snapshot.companies[peer]
+            values = ", ".join(
+                f"{METRIC_LABELS[field][0]} {_format_value(field, columns.value(peer, field))}" for field in shown
+            )
+            peer_lines.append(f"• {peer_company.get('company_name')} ({peer_company.get('stock_ticker')}): {values}")
+
+        # Trimmed to the cap from the lowest priority up: peers from the bottom, then metrics from the end -
+        # the ones the question mentioned last (or the tail of the overview set)
+        while True:
+            lines = header + metric_lines
+            if peer_lines:
+                lines += ["NEAREST PEERS (most similar across all metrics):"] + peer_lines
+            block = "\n".join(lines)
+            if estimate_tokens(block) <= self.max_tokens:
+                return block
+            if peer_lines:
+                peer_lines.pop()
+            elif len(metric_lines) > 1:
+                metric_lines.pop()
+            else:
+                logger.info(f"🏴‍☠️ Selected dataset context over {self.max_tokens} tokens - using the full block")
+                return None
+
+# Single instance, shared by every chain!
+dataset_context_selector = DatasetContextSelector()
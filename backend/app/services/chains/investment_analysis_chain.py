@@ -1,18 +1,27 @@
-import os
+import asyncio
+import math
 from pathlib import Path
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 import logging
 from datetime import datetime
 from dotenv import load_dotenv
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain_google_vertexai import ChatVertexAI
 from .base_conversation_chain import BaseConversationChain
+from .dataset_context import dataset_context_selector
 from ..llm.prompt import CARA_SYSTEM_PROMPT
 from ..db.tuesday_table import tuesday_table_service
-from langchain_community.utilities import GoogleSerperAPIWrapper
+from ..db.tuesday_snapshot import TuesdaySnapshot, tuesday_snapshot_store
+from ..db.tuesday_columns import METRIC_FIELDS, format_metric, parse_metric
+from ..search.serper import serper_search
+from ..llm.answer_cache import answer_cache
+from ...core.metrics import PROMPT_SECTIONS_SECONDS
 
 logger = logging.getLogger(__name__)
 
+# Bump whenever a _format_* method changes its output, so cached renders are dropped
+PROMPT_TEMPLATE_VERSION = 3
+
 class InvestmentAnalysisChain(BaseConversationChain):
     """
     Investment analysis conversation chain for CARA.
@@ -26,23 +35,21 @@ class InvestmentAnalysisChain(BaseConversationChain):
     backend_dir = Path(__file__).parent.parent.parent  # Go up from services/chains/ to backend/
     env_path = backend_dir / '.env'
     load_dotenv(dotenv_path=env_path)
-    def __init__(self, llm: ChatVertexAI, user_id: str = None):
+    def __init__(self, llm: ChatVertexAI, user_id: str = None, snapshot: Optional[TuesdaySnapshot] = None):
         super().__init__(llm)
         self.user_id = user_id
         self.company_data = None  # Store company analysis data
         self.tuesday_data = None  # Store matched company from Tuesday dataset
-        self.full_tuesday_dataset = None  # Store full dataset
-        self.tuesday_analysis = None  # Store dataset analysis
+        self.tuesday_row = None  # Row of the matched company in the snapshot's columns
+        self.tuesday_ticker_hint = None  # Database's ticker match for the company, if it sent one
+        self.snapshot = snapshot or tuesday_snapshot_store.current  # Shared, read-only dataset snapshot
         self.system_prompt = CARA_SYSTEM_PROMPT
+        self._rendered_sections: Optional[Dict[str, str]] = None  # Static prompt sections, built once per key
+        self._rendered_sections_key = None
         self._initialize_prompt_template()
         self.logger = logging.getLogger(__name__)
-        
-        serper_key = os.environ.get("SERPER_KEY")    
-        if not serper_key:
-            logger.warning("SERPER_KEY not found in environment variables - search functionality will be disabled")
-            self.search = None    
-        self._load_full_tuesday_dataset()
-        self.search = GoogleSerperAPIWrapper(serper_api_key=serper_key)
+        self.search = serper_search  # Shared async search with deadline + TTL cache
+        self._search_results: Optional[str] = None  # What the current prompt was built with, for the answer cache
 
     def _initialize_prompt_template(self) -> None:
         """Sets up the investment analysis prompt template with company context."""
@@ -56,72 +63,102 @@ class InvestmentAnalysisChain(BaseConversationChain):
             ("human", "{current_message}")
         ])
 
-    def _load_full_tuesday_dataset(self):
-        """Load the complete Tuesday dataset and analysis"""
-        try:
-            logger.info("🏴‍☠️ Loading full Tuesday dataset...")
-            
-            # Get all companies
-            dataset_result = tuesday_table_service.get_all_companies()
-            if dataset_result["success"]:
-                self.full_tuesday_dataset = dataset_result["companies"]
-                logger.info(f"🏴‍☠️ Loaded {len(self.full_tuesday_dataset)} companies from Tuesday dataset")
-                
-                # Get dataset analysis
-                analysis_result = tuesday_table_service.analyze_dataset()
-                if analysis_result["success"]:
-                    self.tuesday_analysis = analysis_result["analysis"]
-                    logger.info("🏴‍☠️ Tuesday dataset analysis complete")
-                    
-        except Exception as e:
-            logger.error(f"🏴‍☠️ Failed to load Tuesday dataset: {str(e)}")
+    @property
+    def full_tuesday_dataset(self):
+        """Companies from the shared snapshot (never copied per chain)"""
+        return self.snapshot.companies if self.snapshot else None
+
+    @property
+    def tuesday_analysis(self):
+        """Dataset analysis from the shared snapshot"""
+        return self.snapshot.analysis if self.snapshot else None
+
+    def _sync_snapshot(self):
+        """Move onto the newest snapshot if a refresh has swapped one in"""
+        latest = tuesday_snapshot_store.current
+        if latest is None or latest is self.snapshot:
+            return
+        self.snapshot = latest
+        logger.info(f"🏴‍☠️ Chain moved to Tuesday snapshot v{latest.version}")
+        if self.company_data:
+            self.tuesday_data = None
+            self.tuesday_row = None
+            self._find_company_in_tuesday_data(self.company_data.get('name', ''), self.tuesday_ticker_hint)
 
     async def get_formatted_prompt(self, message: str):
         """
         Format investment analysis prompt with company context and analysis guidance.
         
-        Combines system prompt, company data context, full Tuesday dataset,
+        Combines system prompt, company data context, Tuesday dataset context,
         analysis instructions, message history, and current message into LangChain format.
+        The dataset context is picked for the question when the company is in the
+        dataset, and falls back to the full dataset block otherwise.
         """
+        self._sync_snapshot()
         prompt_vars = await self.get_additional_prompt_vars()
         prompt_vars["current_message"] = message
+        selected = dataset_context_selector.select(self.snapshot, self.tuesday_row, message)
+        if selected is not None:
+            prompt_vars["tuesday_dataset_context"] = selected
         return self.prompt.format_messages(**prompt_vars)
 
-    def load_company_context(self, company_data: Dict[str, Any]):
-        """Load company data for investment analysis context + find in Tuesday dataset"""
+    def load_company_context(self, company_data: Dict[str, Any], tuesday_ticker: Optional[str] = None):
+        """
+        Load company data for investment analysis context + find in Tuesday dataset.
+        
+        tuesday_ticker is the database's match for the company (from the joined
+        conversation read) and is tried before the name index.
+        """
         self.company_data = company_data
+        self.tuesday_ticker_hint = tuesday_ticker
+        self._invalidate_rendered_sections()
         company_name = company_data.get('name', '')
         logger.info(f"🏴‍☠️ Loaded company context: {company_name}")
         
         # Try to find this specific company in Tuesday dataset
-        self._find_company_in_tuesday_data(company_name)
+        self._find_company_in_tuesday_data(company_name, tuesday_ticker)
+
+        # Search only needs the company name - start it now so the first message doesn't wait on it
+        self._prefetch_search()
 
-    def _find_company_in_tuesday_data(self, company_name: str):
+    def _find_company_in_tuesday_data(self, company_name: str, ticker: Optional[str] = None):
         """Find specific company in the Tuesday dataset"""
         if not self.full_tuesday_dataset or not company_name:
             return
             
         try:
-            # Look for company name match (case insensitive)
-            for company in self.full_tuesday_dataset:
-                company_tuesday_name = company.get("company_name", "")
-                if company_tuesday_name.lower() in company_name.lower() or \
-                   company_name.lower() in company_tuesday_name.lower():
-                    self.tuesday_data = company
-                    logger.info(f"🏴‍☠️ Found {company_name} in Tuesday dataset as {company_tuesday_name} "
-                              f"(ticker: {company.get('stock_ticker')})")
-                    return
+            row = self.snapshot.columns.row_for_ticker(ticker) if ticker else None
+            if row is None:
+                # Ranked lookup in the snapshot's prebuilt name/ticker index
+                row = self.snapshot.name_index.resolve(company_name)
+            if row is not None:
+                company = self.snapshot.companies[row]
+                self.tuesday_data = company
+                self.tuesday_row = row
+                logger.info(f"🏴‍☠️ Found {company_name} in Tuesday dataset as {company.get('company_name')} "
+                          f"(ticker: {company.get('stock_ticker')})")
+                return
                     
             logger.info(f"🏴‍☠️ Company {company_name} not found in Tuesday dataset")
             
         except Exception as e:
             logger.error(f"🏴‍☠️ Error finding company in Tuesday data: {str(e)}")
 
-    def get_tuesday_data_by_ticker(self, ticker: str) -> Dict[str, Any]:
+    async def get_tuesday_data_by_ticker(self, ticker: str) -> Dict[str, Any]:
         """Manually fetch Tuesday data by stock ticker"""
-        result = tuesday_table_service.get_company_by_ticker(ticker)
+        row = self.snapshot.columns.row_for_ticker(ticker) if self.snapshot else None
+        if row is not None:
+            self.tuesday_data = self.snapshot.companies[row]
+            self.tuesday_row = row
+            self._invalidate_rendered_sections()
+            logger.info(f"🏴‍☠️ Loaded Tuesday data for ticker {ticker} from snapshot")
+            return {"success": True, "company": self.tuesday_data}
+
+        result = await tuesday_table_service.get_company_by_ticker(ticker)
         if result["success"]:
             self.tuesday_data = result["company"]
+            self.tuesday_row = None
+            self._invalidate_rendered_sections()
             logger.info(f"🏴‍☠️ Loaded Tuesday data for ticker {ticker}")
             return result
         return result
@@ -169,58 +206,86 @@ Use the full Tuesday dataset for comparative analysis and benchmarking.
 """
         return context
 
+    def _tuesday_metric_values(self) -> Dict[str, Any]:
+        """Matched company's metrics, formatted for the prompt (None when missing)"""
+        values = {}
+        for field in METRIC_FIELDS:
+            if self.snapshot is not None and self.tuesday_row is not None:
+                value = self.snapshot.columns.value(self.tuesday_row, field)
+            else:
+                # Row came from a direct ticker lookup, not the snapshot
+                value = parse_metric(self.tuesday_data.get(field))
+                value = None if math.isnan(value) else value
+            values[field] = format_metric(value) if value is not None else None
+        return values
+
+    def _tuesday_metric_ranks(self) -> Dict[str, str]:
+        """Matched company's percentile and rank per metric, as a suffix for the prompt (empty when unknown)"""
+        ranks = {field: "" for field in METRIC_FIELDS}
+        if self.snapshot is None or self.tuesday_row is None:
+            return ranks
+        for field in METRIC_FIELDS:
+            found = self.snapshot.ranks.lookup(self.tuesday_row, field)
+            if found is not None:
+                ranks[field] = f" (percentile {found['percentile']:.0f}, #{found['rank']} of {found['count']})"
+        return ranks
+
     def _format_specific_tuesday_metrics(self) -> str:
         """Format specific company's Tuesday dataset metrics - COMPLETE VERSION"""
         if not self.tuesday_data:
             return ""
             
+        metric = self._tuesday_metric_values()
+        rank = self._tuesday_metric_ranks()
         metrics = []
         
         # Key financial metrics
         if self.tuesday_data.get("stock_ticker"):
             metrics.append(f"Ticker: {self.tuesday_data['stock_ticker']}")
-        if self.tuesday_data.get("current_stock_price"):
-            metrics.append(f"Stock Price: ${self.tuesday_data['current_stock_price']}")
-        if self.tuesday_data.get("market_cap_millions"):
-            metrics.append(f"Market Cap: ${self.tuesday_data['market_cap_millions']}M")
-        if self.tuesday_data.get("annual_revenue_millions"):
-            metrics.append(f"Revenue: ${self.tuesday_data['annual_revenue_millions']}M")
+        if metric["current_stock_price"]:
+            metrics.append(f"Stock Price: ${metric['current_stock_price']}{rank['current_stock_price']}")
+        if metric["market_cap_millions"]:
+            metrics.append(f"Market Cap: ${metric['market_cap_millions']}M{rank['market_cap_millions']}")
+        if metric["annual_revenue_millions"]:
+            metrics.append(f"Revenue: ${metric['annual_revenue_millions']}M{rank['annual_revenue_millions']}")
         
         # Performance metrics
         performance = []
-        if self.tuesday_data.get("ytd_return_percent"):
-            performance.append(f"YTD Return: {self.tuesday_data['ytd_return_percent']}%")
-        if self.tuesday_data.get("sales_yoy_growth_percent"):
-            performance.append(f"Sales YoY Growth: {self.tuesday_data['sales_yoy_growth_percent']}%")
-        if self.tuesday_data.get("revenue_5yr_growth_rate"):
-            performance.append(f"5Y Revenue Growth: {self.tuesday_data['revenue_5yr_growth_rate']}%")
-        if self.tuesday_data.get("projected_3yr_sales_growth"):
-            performance.append(f"Projected 3Y Growth: {self.tuesday_data['projected_3yr_sales_growth']}%")
+        if metric["ytd_return_percent"]:
+            performance.append(f"YTD Return: {metric['ytd_return_percent']}%{rank['ytd_return_percent']}")
+        if metric["sales_yoy_growth_percent"]:
+            performance.append(f"Sales YoY Growth: {metric['sales_yoy_growth_percent']}%{rank['sales_yoy_growth_percent']}")
+        if metric["revenue_5yr_growth_rate"]:
+            performance.append(f"5Y Revenue Growth: {metric['revenue_5yr_growth_rate']}%{rank['revenue_5yr_growth_rate']}")
+        if metric["projected_3yr_sales_growth"]:
+            performance.append(f"Projected 3Y Growth: {metric['projected_3yr_sales_growth']}%{rank['projected_3yr_sales_growth']}")
         
         # Efficiency metrics
         efficiency = []
-        if self.tuesday_data.get("ebitda_margin_percent"):
-            efficiency.append(f"EBITDA Margin: {self.tuesday_data['ebitda_margin_percent']}%")
-        if self.tuesday_data.get("return_on_invested_capital"):
-            efficiency.append(f"ROIC: {self.tuesday_data['return_on_invested_capital']}%")
-        if self.tuesday_data.get("rule_of_40_score"):
-            efficiency.append(f"Rule of 40: {self.tuesday_data['rule_of_40_score']}")
+        if metric["ebitda_margin_percent"]:
+            efficiency.append(f"EBITDA Margin: {metric['ebitda_margin_percent']}%{rank['ebitda_margin_percent']}")
+        if metric["return_on_invested_capital"]:
+            efficiency.append(f"ROIC: {metric['return_on_invested_capital']}%{rank['return_on_invested_capital']}")
+        if metric["rule_of_40_score"]:
+            efficiency.append(f"Rule of 40: {metric['rule_of_40_score']}{rank['rule_of_40_score']}")
 
         # Investment & operational metrics
         investment = []
-        if self.tuesday_data.get("rd_intensity_percent"):
-            investment.append(f"R&D Intensity: {self.tuesday_data['rd_intensity_percent']}%")
-        if self.tuesday_data.get("capex_intensity_ratio"):
-            investment.append(f"CapEx Intensity: {self.tuesday_data['capex_intensity_ratio']}")
+        if metric["rd_intensity_percent"]:
+            investment.append(f"R&D Intensity: {metric['rd_intensity_percent']}%{rank['rd_intensity_percent']}")
+        if metric["capex_intensity_ratio"]:
+            investment.append(f"CapEx Intensity: {metric['capex_intensity_ratio']}{rank['capex_intensity_ratio']}")
 
         # 🌱 SUSTAINABILITY & ESG METRICS
         sustainability = []
-        if self.tuesday_data.get("ghg_emissions_per_revenue"):
-            sustainability.append(f"GHG Emissions/Revenue: {self.tuesday_data['ghg_emissions_per_revenue']}")
-        if self.tuesday_data.get("social_responsibility_score"):
-            sustainability.append(f"Social Responsibility Score: {self.tuesday_data['social_responsibility_score']}")
+        if metric["ghg_emissions_per_revenue"]:
+            sustainability.append(f"GHG Emissions/Revenue: {metric['ghg_emissions_per_revenue']}{rank['ghg_emissions_per_revenue']}")
+        if metric["social_responsibility_score"]:
+            sustainability.append(f"Social Responsibility Score: {metric['social_responsibility_score']}{rank['social_responsibility_score']}")
 
         tuesday_context = f"\n- Tuesday Dataset Match: {self.tuesday_data.get('company_name')}"
+        if any(rank.values()):
+            tuesday_context += " (percentile 100 and #1 = highest value in the dataset)"
         if metrics:
             tuesday_context += f"\n  • Basics: {', '.join(metrics)}"
         if performance:
@@ -231,9 +296,22 @@ Use the full Tuesday dataset for comparative analysis and benchmarking.
             tuesday_context += f"\n  • Investment: {', '.join(investment)}"
         if sustainability:
             tuesday_context += f"\n  • 🌱 Sustainability/ESG: {', '.join(sustainability)}"
+        peers = self._format_tuesday_peers()
+        if peers:
+            tuesday_context += f"\n  • Nearest peers in the dataset: {peers}"
             
         return tuesday_context
 
+    def _format_tuesday_peers(self, limit: int = 5) -> str:
+        """Most similar companies across the Tuesday metrics, closest first"""
+        if self.snapshot is None or self.tuesday_row is None:
+            return ""
+        peers = self.snapshot.peer_table.peers(self.tuesday_row, limit)
+        return ", ".join(
+            f"{self.snapshot.companies[row].get('company_name')} ({self.snapshot.companies[row].get('stock_ticker')})"
+            for row, _ in peers
+        )
+
     def _format_tuesday_dataset_context(self) -> str:
         """Format the full Tuesday dataset context for LLM - INCLUDING ALL METRICS"""
         if not self.full_tuesday_dataset or not self.tuesday_analysis:
@@ -266,7 +344,7 @@ Use the full Tuesday dataset for comparative analysis and benchmarking.
         ]
         
         for metric_key, metric_name, unit in all_metrics:
-            if metric_key in metrics and metrics[metric_key]['mean']:
+            if metric_key in metrics and metrics[metric_key]['mean'] is not None:
                 stats = metrics[metric_key]
                 if unit == '%':
                     context += f"• {metric_name}: avg {stats['mean']}%, median {stats['median']}%, range {stats['min']}-{stats['max']}%\n"
@@ -305,7 +383,7 @@ Use the full Tuesday dataset for comparative analysis and benchmarking.
     1. COMPREHENSIVE ANALYSIS: Cover financial health, market position, competitive advantages, risks, and growth potential
     2. ESG & SUSTAINABILITY: Analyze GHG emissions per revenue and social responsibility scores vs benchmarks
     3. TUESDAY DATASET BENCHMARKING: Compare ALL metrics against the 170-company dataset averages
-    4. PEER COMPARISON: Identify similar companies for comparative analysis including ESG performance
+    4. PEER COMPARISON: Compare against the nearest peers listed for the company, including ESG performance
     5. QUANTITATIVE INSIGHTS: Use specific metrics from the Tuesday dataset for data-driven recommendations
     6. SUSTAINABILITY INTEGRATION: Consider ESG factors as key investment criteria alongside financial metrics
     7. MARKET CONTEXT: Consider broader market conditions and sector trends using dataset insights
@@ -321,24 +399,88 @@ Use the full Tuesday dataset for comparative analysis and benchmarking.
     """
         return instructions
 
+    def estimated_bytes(self) -> int:
+        # The snapshot is shared by every chain, so only per-chain renders count
+        rendered = sum(len(section) for section in (self._rendered_sections or {}).values())
+        return super().estimated_bytes() + rendered
+
+    def _rendered_sections_cache_key(self):
+        """Everything the static sections depend on"""
+        return (
+            self.snapshot.version if self.snapshot else 0,
+            self.company_data.get('id') if self.company_data else None,
+            PROMPT_TEMPLATE_VERSION
+        )
+
+    def _invalidate_rendered_sections(self):
+        self._rendered_sections = None
+        self._rendered_sections_key = None
+
+    def _cached_static_sections(self) -> Optional[Dict[str, str]]:
+        if self._rendered_sections is not None and self._rendered_sections_key == self._rendered_sections_cache_key():
+            return self._rendered_sections
+        return None
+
+    def _format_static_sections(self) -> Dict[str, str]:
+        """Prompt sections that don't depend on search or the current message - rendered once per key"""
+        sections = self._cached_static_sections()
+        if sections is not None:
+            return sections
+
+        key = self._rendered_sections_cache_key()
+        sections = {
+            "company_context": self._format_company_context(),
+            "tuesday_dataset_context": self._format_tuesday_dataset_context(),
+            "analysis_instructions": self._format_analysis_instructions()
+        }
+        self._rendered_sections, self._rendered_sections_key = sections, key
+        logger.info(f"🏴‍☠️ Rendered static prompt sections for key {key}")
+        return sections
+
+    def _timed_static_sections(self) -> Dict[str, str]:
+        with PROMPT_SECTIONS_SECONDS.time(cache="miss"):
+            return self._format_static_sections()
+
     async def get_additional_prompt_vars(self) -> Dict[str, Any]:
         """Get all variables needed for investment analysis prompt formatting."""
-        # Add search context
-        search_context = await self._get_search_context()  # ADD THIS LINE
+        sections = self._cached_static_sections()
+        if sections is not None:
+            PROMPT_SECTIONS_SECONDS.observe(0.0, cache="hit")
+            # Usual case after the first turn - only search (normally cached) is left
+            search_context = await self._get_search_context()
+        else:
+            # Search (usually already prefetched) and the static sections are built side by side
+            search_context, sections = await asyncio.gather(
+                self._get_search_context(),
+                asyncio.to_thread(self._timed_static_sections)
+            )
         
         return {
             "system_prompt": self.system_prompt,
-            "company_context": self._format_company_context(),
-            "tuesday_dataset_context": self._format_tuesday_dataset_context(),
-            "search_context": search_context,  # ADD THIS LINE
-            "analysis_instructions": self._format_analysis_instructions(),
+            **sections,
+            "search_context": search_context,
             "messages": self.messages,
             "current_message": ""
         }
 
-    # ADD THIS NEW METHOD:
+    def _search_query(self) -> Optional[str]:
+        if not self.company_data or not self.company_data.get('name'):
+            return None
+        return f"{self.company_data['name']} stock news earnings recent"
+
+    def _prefetch_search(self):
+        """Warm the search cache in the background (no-op if results are still fresh)"""
+        search_query = self._search_query()
+        if search_query:
+            self.search.prefetch(search_query)
+
+    def on_turn_complete(self) -> None:
+        # Refresh search between turns so the next message never waits on it
+        self._prefetch_search()
+
     async def _get_search_context(self) -> str:
         """Get current search context for the company"""
+        self._search_results = None
         if not self.company_data:
             return "No current search context available"
         
@@ -346,14 +488,37 @@ Use the full Tuesday dataset for comparative analysis and benchmarking.
         if not company_name:
             return "No company name available for search"
         
-        try:
-            search_query = f"{company_name} stock news earnings recent"
-            search_results = self.search.run(search_query)
-            return f"Recent market information for {company_name}:\n{search_results}"
-        except Exception as e:
-            logger.error(f"Search failed: {str(e)}")
+        # Non-blocking and deadline-bounded - joins the prefetch if it's still running
+        search_results = await self.search.search(self._search_query())
+        self._search_results = search_results
+        if search_results is None:
             return f"Search temporarily unavailable for {company_name}"
+        return f"Recent market information for {company_name}:\n{search_results}"
+
 
+    def answer_cache_key(self, message: str):
+        """
+        Opening questions about a company can share an answer - follow-ups can't.
+
+        Keyed on the Tuesday ticker when the company matched one (so every
+        conversation about it shares entries), otherwise its name. Turns built
+        without search results aren't cached.
+        """
+        empty_history = not self.history.turns and not self.history.summary
+        if not empty_history or not self.company_data or self._search_results is None:
+            return None
+        if self.tuesday_data and self.tuesday_data.get('stock_ticker'):
+            company = f"ticker:{self.tuesday_data['stock_ticker']}"
+        else:
+            company = f"name:{self.company_data.get('name', '').strip()}"
+        return answer_cache.key(
+            company,
+            self.snapshot.version if self.snapshot else 0,
+            self._search_results,
+            message,
+            empty_history,
+            PROMPT_TEMPLATE_VERSION
+        )
 
     def get_company_name(self) -> str:
         """Get the current company name being analyzed"""
@@ -383,5 +548,8 @@ Use the full Tuesday dataset for comparative analysis and benchmarking.
         """Clear company context (useful for switching companies)"""
         self.company_data = None
         self.tuesday_data = None  # Clear specific company match
+        self.tuesday_row = None
+        self.tuesday_ticker_hint = None
+        self._invalidate_rendered_sections()
         # Keep full_tuesday_dataset and tuesday_analysis loaded
         logger.info("🏴‍☠️ Cleared company context, kept full Tuesday dataset")
\ No newline at end of file
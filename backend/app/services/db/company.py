@@ -1,24 +1,26 @@
-from app.core.supabase.client import supabase_client
+from app.core.supabase.client import async_supabase_client
 import logging
-from typing import Dict, Any
+from typing import Dict, Any, List, Tuple
+from app.core.utils.single_flight import SingleFlight
 
 logger = logging.getLogger(__name__)
 
 class CompanyDBService:
     def __init__(self):
-        # No setup needed - the client handles everything!
-        self.supabase = supabase_client.get_client()
+        # No setup needed - the shared async client handles pooling and timeouts!
+        self.db = async_supabase_client
+        self._flights = SingleFlight("company_analysis")
         logger.info("🏴‍☠️ CompanyDBService ready for action!")
     
-    def save_company_analysis(self, company_name: str, conversation_id: str) -> Dict[str, Any]:
+    async def save_company_analysis(self, company_name: str, conversation_id: str) -> Dict[str, Any]:
         """Save company to database with conversation ID - now with proper relationships, arrr!"""
         try:
             logger.info(f"🏴‍☠️ Saving company to DB: {company_name} with conversation: {conversation_id}")
             
-            result = self.supabase.table("company_analysis").insert({
+            result = await self.db.execute(self.db.table("company_analysis").insert({
                 "name": company_name.strip(),
                 "conversation_id": conversation_id  # Link to the conversation, savvy!
-            }).execute()
+            }), label="CompanyDBService.save_company_analysis")
             
             if result.data and len(result.data) > 0:
                 record = result.data[0]
@@ -41,17 +43,46 @@ class CompanyDBService:
                 "error": str(e)
             }
 
-    def get_company_analysis(self, conversation_id: str) -> Dict[str, Any]:
-        """Get company analysis by conversation ID"""
+    async def save_company_analyses(self, entries: List[Tuple[str, str]]) -> Dict[str, Any]:
+        """Save many (company_name, conversation_id) pairs in one batched insert"""
+        try:
+            logger.info(f"🏴‍☠️ Saving {len(entries)} companies to DB in one insert")
+            
+            result = await self.db.execute(self.db.table("company_analysis").insert([
+                {"name": company_name.strip(), "conversation_id": conversation_id}
+                for company_name, conversation_id in entries
+            ]), label="CompanyDBService.save_company_analyses")
+            
+            if result.data and len(result.data) == len(entries):
+                return {"success": True, "records": result.data}
+            else:
+                logger.error(f"🏴‍☠️ Unexpected batch insert result: {result}")
+                raise Exception(f"Expected {len(entries)} rows from insert, got {len(result.data or [])}")
+                
+        except Exception as e:
+            logger.error(f"🏴‍☠️ Failed to save company batch: {str(e)}")
+            return {
+                "success": False,
+                "error": str(e)
+            }
+
+    async def get_company_analysis(self, conversation_id: str) -> Dict[str, Any]:
+        """Get company analysis by conversation ID - sockets opening the same conversation share one query"""
+        return await self._flights.do(conversation_id, lambda: self._fetch_company_analysis(conversation_id))
+
+    async def _fetch_company_analysis(self, conversation_id: str) -> Dict[str, Any]:
         try:
             logger.info(f"🏴‍☠️ Fetching company for conversation: {conversation_id}")
-            result = self.supabase.table("company_analysis").select('*').eq('conversation_id', conversation_id).execute()
+            result = await self.db.execute(
+                self.db.table("company_analysis").select('*').eq('conversation_id', conversation_id),
+                label="CompanyDBService._fetch_company_analysis"
+            )
             if result.data and len(result.data) > 0:
                 company = result.data[0]
                 logger.info(f"🏴‍☠️ Found company: {company['name']}")
                 return {"success": True, "company": company}
             else:
-                return {"success": False, "error": "No company found"}
+                return {"success": False, "error": "No company found", "not_found": True}
         except Exception as e:
             logger.error(f"🏴‍☠️ Failed to get company: {str(e)}")
             return {"success": False, "error": str(e)}
@@ -1,20 +1,58 @@
 # /services/conversationService.py
-from supabase import Client
-from typing import List, Optional, Dict, Any
+import base64
+import json
+import uuid
+from datetime import datetime
+from typing import List, Optional, Dict, Any, Tuple
+from app.core.supabase.client import AsyncSupabaseClient, is_missing_schema_object
+from app.core.supabase.errors import BadRequestError
+from app.core.utils.single_flight import SingleFlight
+
+# Only what the conversation list shows - no select('*') on the hot listing path
+LIST_COLUMNS = 'id,name,created_at'
+# conversation_overview adds the linked company (see supabase/migrations)
+OVERVIEW_COLUMNS = LIST_COLUMNS + ',company_id,company_name,tuesday_ticker'
+
+# Module-level - services are built per request, the in-flight lookups are shared by all of them
+_conversation_flights = SingleFlight("conversation_with_company")
+
+class ConversationRollbackError(Exception):
+    """Conversations from a failed fallback insert couldn't be deleted - retrying would duplicate them"""
+
+def encode_cursor(row: Dict[str, Any]) -> str:
+    """Opaque keyset cursor pointing just past this row"""
+    raw = json.dumps([row['created_at'], row['id']]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    """
+    (created_at, id) from a cursor, normalized - raises BadRequestError if it's been tampered with.
+
+    Both values end up inside a PostgREST filter, so they're parsed as a
+    timestamp and a UUID and re-rendered rather than passed through.
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        created_at, conversation_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        created = datetime.fromisoformat(created_at.replace('Z', '+00:00'))
+        conversation_uuid = uuid.UUID(conversation_id)
+    except Exception:
+        raise BadRequestError("Invalid conversations cursor")
+    return created.isoformat(), str(conversation_uuid)
 
 class ConversationService:
-    def __init__(self, supabase_client: Client):
+    def __init__(self, supabase_client: AsyncSupabaseClient):
         # Arrr, ready to sail the conversation seas!
         self.client = supabase_client
     
-    def create_conversation(self, name: str) -> Dict[str, Any]:
+    async def create_conversation(self, name: str) -> Dict[str, Any]:
         """
         Create a new conversation - perfect for starting fresh analysis adventures!
         """
         try:
-            result = self.client.table('conversations').insert({
+            result = await self.client.execute(self.client.table('conversations').insert({
                 'name': name
-            }).execute()
+            }), label="ConversationService.create_conversation")
             
             if result.data:
                 print(f"🏴‍☠️ New conversation created: {name}")
@@ -26,23 +64,170 @@ class ConversationService:
             print(f"⚠️ Failed to create conversation: {e}")
             raise
     
-    def get_conversation(self, conversation_id: str) -> Optional[Dict[str, Any]]:
+    async def create_conversations(self, names: List[str]) -> List[Dict[str, Any]]:
+        """
+        Create many conversations in one batched insert - rows come back in the order given
+        """
+        try:
+            result = await self.client.execute(
+                self.client.table('conversations').insert([{'name': name} for name in names]),
+                label="ConversationService.create_conversations"
+            )
+            
+            if result.data and len(result.data) == len(names):
+                print(f"🏴‍☠️ {len(names)} conversations created in one insert")
+                return result.data
+            else:
+                raise Exception(f"Expected {len(names)} rows from insert, got {len(result.data or [])}")
+                
+        except Exception as e:
+            print(f"⚠️ Failed to create conversations batch: {e}")
+            raise
+    
+    async def create_company_conversation(self, company_name: str, conversation_name: str) -> Dict[str, Any]:
+        """
+        Conversation and its company row, created atomically in one RPC call.
+
+        Returns {"conversation": ..., "company": ...}. Falls back to two inserts
+        if the database functions haven't been migrated in yet.
+        """
+        try:
+            result = await self.client.execute(self.client.rpc('create_company_conversation', {
+                'p_company_name': company_name,
+                'p_conversation_name': conversation_name
+            }), label="ConversationService.create_company_conversation")
+            if not result.data:
+                raise Exception("No data returned from create_company_conversation")
+            print(f"🏴‍☠️ New conversation created with company: {conversation_name}")
+            return result.data
+            
+        except Exception as e:
+            if not is_missing_schema_object(e):
+                print(f"⚠️ Failed to create company conversation: {e}")
+                raise
+
+        from app.services.db.company import company_db_service
+        conversation = await self.create_conversation(conversation_name)
+        company = await company_db_service.save_company_analysis(company_name, conversation['id'])
+        if not company["success"]:
+            # No transaction without the RPC - undo the conversation so a retry doesn't leave an orphan
+            await self.delete_conversations([conversation['id']])
+            raise Exception(f"Database error: {company.get('error', 'Unknown error')}")
+        company.pop("success")
+        return {"conversation": conversation, "company": company}
+
+    async def create_company_conversations(self, company_names: List[str], conversation_names: List[str]) -> List[Dict[str, Any]]:
+        """
+        Bulk create_company_conversation - one RPC call and one transaction for the whole batch,
+        results in input order. Any failure fails the whole batch.
+        """
+        try:
+            result = await self.client.execute(self.client.rpc('create_company_conversations', {
+                'p_company_names': company_names,
+                'p_conversation_names': conversation_names
+            }), label="ConversationService.create_company_conversations")
+            if not result.data or len(result.data) != len(company_names):
+                raise Exception(f"Expected {len(company_names)} results, got {len(result.data or [])}")
+            print(f"🏴‍☠️ {len(company_names)} conversations created with companies in one call")
+            return result.data
+            
+        except Exception as e:
+            if not is_missing_schema_object(e):
+                print(f"⚠️ Failed to create company conversations batch: {e}")
+                raise
+
+        from app.services.db.company import company_db_service
+        conversations = await self.create_conversations(conversation_names)
+        companies = await company_db_service.save_company_analyses(
+            [(name, conversation['id']) for name, conversation in zip(company_names, conversations)]
+        )
+        if not companies["success"]:
+            # No transaction without the RPC - undo the batch so per-company retries don't leave orphans
+            await self.delete_conversations([conversation['id'] for conversation in conversations])
+            raise Exception(f"Database error: {companies.get('error', 'Unknown error')}")
+        return [
+            {"conversation": conversation, "company": company}
+            for conversation, company in zip(conversations, companies["records"])
+        ]
+
+    async def delete_conversations(self, conversation_ids: List[str]) -> None:
+        """
+        Delete conversations by id - rolls back the fallback inserts when their companies fail.
+
+        Raises ConversationRollbackError if the delete fails, so the caller doesn't
+        retry on top of rows it couldn't remove.
+        """
+        try:
+            await self.client.execute(
+                self.client.table('conversations').delete().in_('id', conversation_ids),
+                label="ConversationService.delete_conversations"
+            )
+            print(f"🏴‍☠️ Rolled back {len(conversation_ids)} conversations")
+        except Exception as e:
+            print(f"⚠️ Failed to roll back conversations {conversation_ids}: {e}")
+            raise ConversationRollbackError(str(e)) from e
+
+    async def get_conversation_with_company(self, conversation_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Conversation, its company row and the company's Tuesday ticker in one query.
+
+        Returns {"conversation", "company", "tuesday_ticker"} (company and ticker
+        may be None), or None if the conversation doesn't exist. Database errors
+        are raised. Sockets opening the same conversation at once share one lookup.
+        """
+        return await _conversation_flights.do(
+            conversation_id, lambda: self._fetch_conversation_with_company(conversation_id))
+
+    async def _fetch_conversation_with_company(self, conversation_id: str) -> Optional[Dict[str, Any]]:
+        try:
+            result = await self.client.execute(self.client.rpc('get_conversation_with_company', {
+                'p_conversation_id': conversation_id
+            }), label="ConversationService._fetch_conversation_with_company")
+            return result.data or None
+            
+        except Exception as e:
+            if not is_missing_schema_object(e):
+                # Raised, not None - every socket sharing this lookup would take None as "no such conversation"
+                print(f"⚠️ Failed to fetch conversation with company: {e}")
+                raise
+
+        from app.services.db.company import company_db_service
+        conversation = await self.get_conversation(conversation_id)
+        if conversation is None:
+            return None
+        company = await company_db_service.get_company_analysis(conversation_id)
+        if not company["success"] and not company.get("not_found"):
+            raise Exception(f"Database error: {company.get('error', 'Unknown error')}")
+        return {
+            "conversation": conversation,
+            "company": company["company"] if company["success"] else None,
+            "tuesday_ticker": None
+        }
+
+    async def get_conversation(self, conversation_id: str) -> Optional[Dict[str, Any]]:
         """
-        Fetch a conversation by its ID - for when ye need to revisit old treasures
+        Fetch a conversation by its ID - for when ye need to revisit old treasures.
+        None if it doesn't exist; database errors are raised.
         """
         try:
-            result = self.client.table('conversations').select('*').eq('id', conversation_id).execute()
+            result = await self.client.execute(
+                self.client.table('conversations').select('*').eq('id', conversation_id),
+                label="ConversationService.get_conversation"
+            )
             return result.data[0] if result.data else None
         except Exception as e:
             print(f"⚠️ Failed to fetch conversation: {e}")
-            return None
+            raise
         
-    def get_all_conversations(self) -> List[Dict[str, Any]]:
+    async def get_all_conversations(self) -> List[Dict[str, Any]]:
         """
         Fetch all conversations - perfect for listing the treasure ye've collected!
         """
         try:
-            result = self.client.table('conversations').select('*').order('created_at', desc=True).execute()
+            result = await self.client.execute(
+                self.client.table('conversations').select('*').order('created_at', desc=True),
+                label="ConversationService.get_all_conversations"
+            )
             
             if result.data:
                 print(f"🏴‍☠️ Found {len(result.data)} conversations")
@@ -53,4 +238,52 @@ class ConversationService:
                 
         except Exception as e:
             print(f"⚠️ Failed to fetch conversations: {e}")
-            raise
\ No newline at end of file
+            raise
+
+    async def get_conversations_page(self, limit: int = 50, cursor: Optional[str] = None) -> Dict[str, Any]:
+        """
+        One page of conversations, newest first, keyset-paginated on (created_at, id).
+        
+        Cost stays flat however many conversations pile up - no OFFSET scans.
+        Rows come from conversation_overview, so each carries its company too.
+        """
+        def page_query(table: str, columns: str):
+            query = (
+                self.client.table(table).select(columns)
+                .order('created_at', desc=True).order('id', desc=True)
+                .limit(limit + 1)  # One extra row tells us whether there's a next page
+            )
+            if cursor:
+                created_at, conversation_id = decode_cursor(cursor)
+                query = query.or_(
+                    f'created_at.lt."{created_at}",'
+                    f'and(created_at.eq."{created_at}",id.lt."{conversation_id}")'
+                )
+            return query
+
+        try:
+            try:
+                result = await self.client.execute(
+                    page_query('conversation_overview', OVERVIEW_COLUMNS),
+                    label="ConversationService.get_conversations_page"
+                )
+            except Exception as e:
+                if not is_missing_schema_object(e):
+                    raise
+                result = await self.client.execute(
+                    page_query('conversations', LIST_COLUMNS),
+                    label="ConversationService.get_conversations_page"
+                )
+            rows = result.data or []
+            has_more = len(rows) > limit
+            rows = rows[:limit]
+            
+            print(f"🏴‍☠️ Found {len(rows)} conversations (more: {has_more})")
+            return {
+                "conversations": rows,
+                "next_cursor": encode_cursor(rows[-1]) if has_more and rows else None
+            }
+                
+        except Exception as e:
+            print(f"⚠️ Failed to fetch conversations page: {e}")
+            raise
@@ -0,0 +1,179 @@
+import asyncio
+import logging
+import os
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Optional
+from postgrest.types import ReturnMethod
+from app.core.supabase.client import AsyncSupabaseClient, async_supabase_client
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FLUSH_SECONDS = 2.0
+DEFAULT_FLUSH_BATCH = 20
+DEFAULT_MAX_PENDING = 1000
+
+
+class MessageService:
+    """Reads and writes rows in the messages table (see supabase/migrations)"""
+
+    def __init__(self, supabase_client: AsyncSupabaseClient):
+        self.db = supabase_client
+
+    async def insert_messages(self, rows: List[Dict[str, Any]]) -> None:
+        """Insert a batch of messages in one round trip - raises on failure so the caller can retry"""
+        await self.db.execute(
+            self.db.table("messages").insert(rows, returning=ReturnMethod.minimal),
+            label="MessageService.insert_messages"
+        )
+
+    async def get_recent_messages(self, conversation_id: str, limit: int) -> List[Dict[str, Any]]:
+        """The newest `limit` messages of a conversation, oldest first"""
+        result = await self.db.execute(
+            self.db.table("messages").select("role,content,created_at")
+            .eq("conversation_id", conversation_id)
+            .order("created_at", desc=True).order("id", desc=True)
+            .limit(limit),
+            label="MessageService.get_recent_messages"
+        )
+        return list(reversed(result.data or []))
+
+
+class MessageWriteBehindBuffer:
+    """
+    Write-behind buffer for chat messages, arrr!
+
+    add() only appends to an in-memory list, so it never touches the token
+    stream. Each conversation's messages go out as one batched insert when its
+    turn completes, when batch_size messages pile up, or on the flush timer -
+    whichever comes first. One flush runs per conversation at a time, so rows
+    land in order, and a failed batch is put back for the next timer tick.
+    """
+
+    def __init__(
+        self,
+        service: MessageService,
+        flush_interval: Optional[float] = None,
+        batch_size: Optional[int] = None,
+        max_pending: Optional[int] = None
+    ):
+        self.service = service
+        self.flush_interval = flush_interval if flush_interval is not None else float(
+            os.environ.get("MESSAGE_FLUSH_SECONDS", DEFAULT_FLUSH_SECONDS))
+        self.batch_size = batch_size if batch_size is not None else int(
+            os.environ.get("MESSAGE_FLUSH_BATCH", DEFAULT_FLUSH_BATCH))
+        # Cap per conversation while the database is unreachable - oldest messages go first
+        self.max_pending = max_pending if max_pending is not None else int(
+            os.environ.get("MESSAGE_MAX_PENDING", DEFAULT_MAX_PENDING))
+        self._pending: Dict[str, List[Dict[str, Any]]] = {}
+        self._flushing: Dict[str, asyncio.Task] = {}
+        self._timer_task: Optional[asyncio.Task] = None
+        self.flushed = 0
+        self.failed_flushes = 0
+        self.dropped = 0
+
+    def add(self, conversation_id: str, role: str, content: str) -> None:
+        rows = self._pending.setdefault(conversation_id, [])
+        rows.append({
+            "conversation_id": conversation_id,
+            "role": role,
+            "content": content,
+            "created_at": datetime.now(timezone.utc).isoformat()
+        })
+        self._trim(conversation_id)
+        if len(rows) >= self.batch_size:
+            self.flush_soon(conversation_id)
+
+    def _trim(self, conversation_id: str) -> None:
+        rows = self._pending.get(conversation_id, [])
+        overflow = len(rows) - self.max_pending
+        if overflow > 0:
+            del rows[:overflow]
+            self.dropped += overflow
+            logger.warning(f"🏴‍☠️ Dropped {overflow} unsaved messages for conversation {conversation_id}")
+
+    def pending(self, conversation_id: str) -> List[Dict[str, Any]]:
+        """Messages not yet written for a conversation, oldest first"""
+        return list(self._pending.get(conversation_id, []))
+
+    def flush_soon(self, conversation_id: str) -> None:
+        """Start a background flush for a conversation - returns immediately"""
+        try:
+            self._start_flush(conversation_id)
+        except RuntimeError:
+            # No running event loop - the timer or shutdown flush picks it up
+            return
+
+    def _start_flush(self, conversation_id: str) -> asyncio.Task:
+        task = self._flushing.get(conversation_id)
+        if task is None or task.done():
+            task = asyncio.get_running_loop().create_task(self._flush(conversation_id))
+            self._flushing[conversation_id] = task
+            task.add_done_callback(lambda done: self._finish_flush(conversation_id, done))
+        return task
+
+    def _finish_flush(self, conversation_id: str, task: asyncio.Task) -> None:
+        if self._flushing.get(conversation_id) is task:
+            del self._flushing[conversation_id]
+
+    async def flush(self, conversation_id: str) -> None:
+        """Write everything buffered for a conversation, waiting for it to land"""
+        if conversation_id in self._pending or conversation_id in self._flushing:
+            await asyncio.shield(self._start_flush(conversation_id))
+
+    async def _flush(self, conversation_id: str) -> None:
+        # Keep going while add() lands more rows behind the batch in flight
+        while self._pending.get(conversation_id):
+            batch = self._pending.pop(conversation_id)
+            try:
+                await self.service.insert_messages(batch)
+                self.flushed += len(batch)
+            except Exception as e:
+                self.failed_flushes += 1
+                logger.error(f"🏴‍☠️ Failed to save {len(batch)} messages for conversation {conversation_id}: {str(e)}")
+                # Back in front of anything newer, retried on the next timer tick
+                self._pending[conversation_id] = batch + self._pending.get(conversation_id, [])
+                self._trim(conversation_id)
+                return
+
+    async def flush_all(self) -> None:
+        conversation_ids = set(self._pending) | set(self._flushing)
+        await asyncio.gather(*(self.flush(conversation_id) for conversation_id in conversation_ids))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pending": sum(len(rows) for rows in self._pending.values()),
+            "conversations": len(self._pending),
+            "flushed": self.flushed,
+            "failed_flushes": self.failed_flushes,
+            "dropped": self.dropped
+        }
+
+    def start_background_flush(self) -> None:
+        """Start the flush timer (no-op if disabled or already running)"""
+        if self.flush_interval <= 0 or self._timer_task is not None:
+            return
+        self._timer_task = asyncio.create_task(self._timer_loop())
+        logger.info(f"🏴‍☠️ Message write-behind flush every {self.flush_interval:.1f}s")
+
+    async def stop_background_flush(self) -> None:
+        """Stop the timer and write whatever is still buffered"""
+        if self._timer_task is not None:
+            self._timer_task.cancel()
+            try:
+                await self._timer_task
+            except asyncio.CancelledError:
+                pass
+            self._timer_task = None
+        await self.flush_all()
+        if self._pending:
+            logger.error(f"🏴‍☠️ Shutting down with unsaved messages: {self.stats()}")
+
+    async def _timer_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            for conversation_id in list(self._pending):
+                self.flush_soon(conversation_id)
+
+# Single instances, shared by every chain!
+message_service = MessageService(async_supabase_client)
+message_buffer = MessageWriteBehindBuffer(message_service)
@@ -0,0 +1,92 @@
+import sys
+import math
+from typing import Dict, Any, List, Optional, Sequence, Tuple
+import numpy as np
+
+# Every numeric metric in tuesday_dataset (Supabase stores them as text)
+METRIC_FIELDS = (
+    'current_stock_price', 'ytd_return_percent', 'market_cap_millions',
+    'rule_of_40_score', 'ebitda_margin_percent', 'return_on_invested_capital',
+    'revenue_5yr_growth_rate', 'sales_yoy_growth_percent', 'projected_3yr_sales_growth',
+    'capex_intensity_ratio', 'rd_intensity_percent', 'annual_revenue_millions',
+    'ghg_emissions_per_revenue', 'social_responsibility_score'
+)
+
+
+def parse_metric(value: Any) -> float:
+    """Parse one raw metric value to float, NaN when missing or not a number"""
+    if value is None or isinstance(value, bool):
+        return math.nan
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return float(str(value).strip())
+    except ValueError:
+        return math.nan
+
+
+def format_metric(value: float) -> str:
+    """Render a metric for prompts: thousands separators, at most two decimals"""
+    return f"{value:,.2f}".rstrip("0").rstrip(".")
+
+
+class TuesdayColumns:
+    """
+    Typed, columnar view of the Tuesday dataset - parsed once per snapshot.
+
+    Each metric is a read-only float64 array with NaN for missing values, aligned
+    with the raw rows, so analytics never rebuild DataFrames or re-parse text.
+    """
+
+    def __init__(self, rows: Sequence[Dict[str, Any]]):
+        self.rows = tuple(rows)
+        self.size = len(self.rows)
+        self.tickers: Tuple[str, ...] = tuple(
+            sys.intern(str(row.get("stock_ticker") or "").upper()) for row in self.rows
+        )
+        self.names: Tuple[str, ...] = tuple(
+            sys.intern(str(row.get("company_name") or "")) for row in self.rows
+        )
+        self.ticker_index: Dict[str, int] = {}
+        for i, ticker in enumerate(self.tickers):
+            if ticker:
+                self.ticker_index.setdefault(ticker, i)
+
+        self.metrics: Dict[str, np.ndarray] = {}
+        for field in METRIC_FIELDS:
+            column = np.fromiter(
+                (parse_metric(row.get(field)) for row in self.rows),
+                dtype=np.float64,
+                count=self.size
+            )
+            column.flags.writeable = False
+            self.metrics[field] = column
+
+    def has_metric(self, metric: str) -> bool:
+        return metric in self.metrics
+
+    def row_for_ticker(self, ticker: str) -> Optional[int]:
+        return self.ticker_index.get(ticker.strip().upper()) if ticker else None
+
+    def value(self, row: int, metric: str) -> Optional[float]:
+        """One metric for one company, None when missing"""
+        column = self.metrics.get(metric)
+        if column is None:
+            return None
+        value = column[row]
+        return None if np.isnan(value) else float(value)
+
+    def top(self, metric: str, limit: int = 10) -> List[int]:
+        """Row indices of the highest values for a metric, NaNs excluded"""
+        column = self.metrics[metric]
+        valid = np.flatnonzero(~np.isnan(column))
+        if limit <= 0 or valid.size == 0:
+            return []
+        values = column[valid]
+        if limit < valid.size:
+            candidates = np.argpartition(-values, limit - 1)[:limit]
+        else:
+            candidates = np.arange(valid.size)
+        # Stable sort keeps dataset order for ties, like DataFrame.nlargest
+        ordered = candidates[np.argsort(-values[candidates], kind="stable")]
+        return valid[ordered].tolist()
@@ -0,0 +1,250 @@
+import heapq
+import re
+from typing import Dict, Any, List, Optional, Set, Tuple
+from app.services.db.tuesday_columns import TuesdayColumns
+
+# Rows in tuesday_dataset that aren't companies (the column-description row)
+NON_COMPANY_TICKERS = {"DESCRIPTION_ROW"}
+
+# Legal-form / share-class noise at the end of Bloomberg names ("NUTANIX INC - A")
+NAME_SUFFIXES = {
+    "inc", "incorporated", "corp", "corporation", "co", "company", "ltd", "limited",
+    "plc", "se", "sa", "ag", "nv", "ab", "llc", "lp", "adr", "reg", "shs", "cl",
+    "class", "the", "grp", "ho", "hds"
+}
+
+# Everyday names that don't appear in the Bloomberg company names - only used
+# when the ticker is actually in the dataset
+BRAND_ALIASES = {
+    "alphabet": "GOOGL",
+    "google": "GOOGL",
+    "facebook": "META",
+    "kla tencor": "KLAC",
+    "takeaway": "TKWY",
+    "norton": "GEN",
+}
+
+# Match weights per query token
+EXACT_TOKEN, PREFIX_TOKEN, FUZZY_TOKEN = 1.0, 0.6, 0.4
+
+# Rows kept per trie node for single-word autocomplete - bounds work on short prefixes
+TRIE_NODE_BEST = 64
+
+_DROP_CHARS = re.compile(r"[&.'’]")
+_SPLIT_CHARS = re.compile(r"[^a-z0-9]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase alphanumeric tokens - "AT&T" -> ["att"], "C3.AI INC-A" -> ["c3ai", "inc", "a"]"""
+    text = _DROP_CHARS.sub("", (text or "").lower())
+    return [token for token in _SPLIT_CHARS.split(text) if token]
+
+
+def core_tokens(tokens: List[str]) -> List[str]:
+    """Strip trailing legal-form and share-class tokens, keeping at least one token"""
+    end = len(tokens)
+    while end > 1 and (tokens[end - 1] in NAME_SUFFIXES or len(tokens[end - 1]) == 1):
+        end -= 1
+    return tokens[:end]
+
+
+def _deletes(token: str) -> Set[str]:
+    return {token[:i] + token[i + 1:] for i in range(len(token))}
+
+
+class _TrieNode:
+    __slots__ = ("children", "rows", "best")
+
+    def __init__(self):
+        self.children: Dict[str, "_TrieNode"] = {}
+        self.rows: Set[int] = set()
+        self.best: Tuple[int, ...] = ()  # Top-ranked rows under this prefix, filled after build
+
+
+class CompanyNameIndex:
+    """
+    Prebuilt name/ticker index over one Tuesday snapshot.
+
+    Exact names, tickers and brand aliases resolve through one dict lookup;
+    partial input goes through a token prefix trie; typos fall back to a
+    single-edit deletion index. Nothing scans the whole dataset per query.
+    """
+
+    def __init__(self, columns: TuesdayColumns):
+        self.columns = columns
+        self.aliases: Dict[str, int] = {}
+        self.token_rows: Dict[str, Set[int]] = {}
+        self.core_names: Dict[int, frozenset] = {}
+        self.first_tokens: Dict[int, str] = {}
+        self._trie = _TrieNode()
+        self._deletion_index: Dict[str, Set[str]] = {}
+        self.row_tokens: Dict[int, frozenset] = {}
+
+        for row, (ticker, name) in enumerate(zip(columns.tickers, columns.names)):
+            if ticker in NON_COMPANY_TICKERS or not (ticker or name):
+                continue
+            tokens = tokenize(name)
+            core = core_tokens(tokens) if tokens else []
+            self.core_names[row] = frozenset(core)
+            self.first_tokens[row] = tokens[0] if tokens else ticker.lower()
+
+            for key in (" ".join(tokens), " ".join(core), ticker.lower(),
+                        " ".join(tokens + tokenize(ticker))):
+                if key:
+                    self.aliases.setdefault(key, row)
+
+            # Share-class letters ("- A") would make every one-letter query an exact hit
+            indexed = set(core) | {token for token in tokens[len(core):] if len(token) > 1}
+            self.row_tokens[row] = frozenset(indexed | set(tokenize(ticker)))
+            for token in self.row_tokens[row]:
+                self._add_token(token, row)
+
+        for alias, ticker in BRAND_ALIASES.items():
+            row = columns.row_for_ticker(ticker)
+            if row is not None and row in self.core_names:
+                self.aliases.setdefault(alias, row)
+
+        self._rank_trie(self._trie, "")
+
+    def _rank_key(self, row: int, prefix: str):
+        # Same order search() scores in: name starts with the prefix, whole-word hit, shorter name
+        return (
+            not self.first_tokens[row].startswith(prefix),
+            prefix not in self.row_tokens[row],
+            len(self.core_names[row]),
+            self.columns.names[row]
+        )
+
+    def _rank_trie(self, root: _TrieNode, root_prefix: str) -> None:
+        stack = [(root, root_prefix)]
+        while stack:
+            node, prefix = stack.pop()
+            node.best = tuple(heapq.nsmallest(TRIE_NODE_BEST, node.rows, key=lambda row: self._rank_key(row, prefix)))
+            stack.extend((child, prefix + char) for char, child in node.children.items())
+
+    def _add_token(self, token: str, row: int) -> None:
+        if token not in self.token_rows:
+            self.token_rows[token] = set()
+            if len(token) >= 4:
+                for variant in _deletes(token):
+                    self._deletion_index.setdefault(variant, set()).add(token)
+        self.token_rows[token].add(row)
+
+        node = self._trie
+        node.rows.add(row)
+        for char in token:
+            node = node.children.setdefault(char, _TrieNode())
+            node.rows.add(row)
+
+    def _prefix_node(self, prefix: str) -> Optional[_TrieNode]:
+        node = self._trie
+        for char in prefix:
+            node = node.children.get(char)
+            if node is None:
+                return None
+        return node
+
+    def _fuzzy_tokens(self, token: str) -> Set[str]:
+        """Vocabulary tokens within one insert, delete or substitution of the query token"""
+        if len(token) < 4:
+            return set()
+        matches = set(self._deletion_index.get(token, ()))
+        for variant in _deletes(token):
+            if variant in self.token_rows:
+                matches.add(variant)
+            matches |= self._deletion_index.get(variant, set())
+        matches.discard(token)
+        return matches
+
+    def _token_scores(self, token: str, bounded: bool) -> Dict[int, float]:
+        """
+        Match weight per row for one query token.
+
+        bounded=True (single-word queries) only reads each trie node's precomputed
+        best rows, so "a" costs the same as "nvidia" however big the dataset gets.
+        """
+        scores: Dict[int, float] = {}
+        for fuzzy in self._fuzzy_tokens(token):
+            rows = self.token_rows[fuzzy]
+            for row in (heapq.nsmallest(TRIE_NODE_BEST, rows) if bounded else rows):
+                scores[row] = FUZZY_TOKEN
+        node = self._prefix_node(token)
+        if node is not None:
+            for row in (node.best if bounded else node.rows):
+                scores[row] = EXACT_TOKEN if token in self.row_tokens[row] else PREFIX_TOKEN
+        return scores
+
+    def search(self, query: str, limit: int = 8) -> List[Tuple[int, float]]:
+        """Ranked (row, score) matches for a query - score 100 is an exact name, ticker or alias"""
+        tokens = tokenize(query)
+        if not tokens or limit <= 0:
+            return []
+
+        exact = self.aliases.get(" ".join(tokens))
+        if exact is None:
+            exact = self.aliases.get(" ".join(core_tokens(tokens)))
+        ranked: Dict[int, float] = {exact: 100.0} if exact is not None else {}
+
+        # Every query token must match the company - suffixes typed in full are ignored
+        query_tokens = [token for token in tokens if token not in NAME_SUFFIXES] or tokens
+        bounded = len(query_tokens) == 1
+        candidates: Dict[int, float] = {}
+        # Smallest match set first keeps the intersection cheap
+        for position, scores in enumerate(sorted(
+                (self._token_scores(token, bounded) for token in query_tokens), key=len)):
+            if position == 0:
+                candidates = scores
+            else:
+                candidates = {
+                    row: weight + scores[row]
+                    for row, weight in candidates.items() if row in scores
+                }
+            if not candidates:
+                break
+
+        for row, total in candidates.items():
+            if row not in self.core_names:
+                continue
+            core_length = max(len(self.core_names[row]), len(query_tokens))
+            score = 60.0 * total / len(query_tokens) + 20.0 * len(query_tokens) / core_length
+            # Bonus when the name starts with what was typed ("meta" -> META PLATFORMS)
+            if self.first_tokens[row].startswith(query_tokens[0]):
+                score += 10.0
+            ranked[row] = max(ranked.get(row, 0.0), round(score, 2))
+
+        return heapq.nsmallest(limit, ranked.items(), key=lambda item: (-item[1], self.columns.names[item[0]]))
+
+    def resolve(self, company_name: str, min_score: float = 70.0) -> Optional[int]:
+        """
+        Best row for a company name, or None if nothing is a confident match.
+
+        The default threshold needs every word to match a whole token, so "Meta"
+        never resolves to a company that merely starts with "meta".
+        """
+        matches = self.search(company_name, limit=1)
+        if matches and matches[0][1] >= min_score:
+            return matches[0][0]
+
+        # Names with extra words ("Adobe Inc shares") - a company whose whole core
+        # name appears in the query still counts, as the old substring check allowed
+        tokens = set(tokenize(company_name)) - NAME_SUFFIXES
+        candidates = set()
+        for token in tokens:
+            candidates |= self.token_rows.get(token, set())
+        contained = [
+            row for row in candidates
+            if row in self.core_names and self.core_names[row] and self.core_names[row] <= tokens
+        ]
+        if contained:
+            # Longest contained name wins ("ASML HOLDING" over "ASML")
+            return max(contained, key=lambda row: (len(self.core_names[row]), -row))
+        return None
+
+    def describe(self, row: int) -> Dict[str, Any]:
+        ticker = self.columns.tickers[row]
+        name = self.columns.names[row]
+        return {
+            "ticker": ticker,
+            "name": name,
+            "label": f"{name} ({ticker})" if ticker else name
+        }
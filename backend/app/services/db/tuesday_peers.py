@@ -0,0 +1,144 @@
+import logging
+import os
+import warnings
+from dataclasses import dataclass
+from typing import Dict, Any, List, Optional, Tuple
+import numpy as np
+from app.core.utils.versioned_cache import VersionedCache
+from app.services.db.tuesday_columns import METRIC_FIELDS, TuesdayColumns
+from app.services.db.tuesday_name_index import NON_COMPANY_TICKERS
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PEER_TABLE_SIZE = 20
+DEFAULT_BLOCK_ROWS = 512  # Rows per distance block - bounds the scratch matrices at block x companies
+
+# Not a company characteristic, so it doesn't count towards similarity
+PEER_EXCLUDED_FIELDS = frozenset({'current_stock_price'})
+# Heavy-tailed sizes are compared on a log scale
+LOG_SCALED_FIELDS = frozenset({'market_cap_millions', 'annual_revenue_millions'})
+PEER_FIELDS = tuple(field for field in METRIC_FIELDS if field not in PEER_EXCLUDED_FIELDS)
+
+
+@dataclass(frozen=True)
+class PeerTable:
+    """Top-k nearest neighbours of every company, closest first (-1 / inf pad short rows)"""
+    fields: Tuple[str, ...]
+    neighbors: np.ndarray  # (companies x k) int32 rows
+    distances: np.ndarray  # (companies x k) float32 RMS z-score distance
+
+    def peers(self, row: int, limit: int) -> List[Tuple[int, float]]:
+        result = []
+        for peer, distance in zip(self.neighbors[row, :limit], self.distances[row, :limit]):
+            if peer < 0:
+                break
+            result.append((int(peer), float(distance)))
+        return result
+
+
+def standardize(columns: TuesdayColumns, fields: Tuple[str, ...]) -> np.ndarray:
+    """
+    (companies x fields) z-scores, NaN where the value is missing.
+
+    Mean and std come from each metric's present values only; a metric with
+    no spread is all NaN, so it never counts towards a distance.
+    """
+    matrix = np.vstack([columns.metrics[field] for field in fields]).T.astype(np.float64)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        for j, field in enumerate(fields):
+            if field in LOG_SCALED_FIELDS:
+                matrix[:, j] = np.sign(matrix[:, j]) * np.log1p(np.abs(matrix[:, j]))
+        std = np.nanstd(matrix, axis=0)
+        return (matrix - np.nanmean(matrix, axis=0)) / np.where(std > 0, std, np.nan)
+
+
+def compute_peer_table(
+    columns: TuesdayColumns,
+    k: int = DEFAULT_PEER_TABLE_SIZE,
+    block_rows: int = DEFAULT_BLOCK_ROWS
+) -> PeerTable:
+    """
+    Nearest neighbours of every company in one vectorized pass per block.
+
+    The distance between two companies is the RMS of their z-score
+    differences over the metrics both have. With M the presence mask and Z the
+    z-scores zero-filled, the masked squared sum for a whole block of rows is
+    (Z²)Mᵀ + M(Z²)ᵀ - 2ZZᵀ and the shared count is MMᵀ - matrix products, so
+    nothing is looped per pair. Pairs sharing fewer than half the metrics
+    aren't peers. The full matrix is never held: each block keeps only its
+    top k via argpartition, so memory stays at block x companies.
+    """
+    fields = tuple(field for field in PEER_FIELDS if columns.has_metric(field))
+    size = columns.size
+    k = max(min(k, size - 1), 0)
+    neighbors = np.full((size, k), -1, dtype=np.int32)
+    distances = np.full((size, k), np.inf, dtype=np.float32)
+    if k == 0 or not fields:
+        return PeerTable(fields=fields, neighbors=neighbors, distances=distances)
+
+    z = standardize(columns, fields)
+    # The description row shares no metrics with anything, so it's nobody's peer
+    z[[i for i, ticker in enumerate(columns.tickers) if ticker in NON_COMPANY_TICKERS]] = np.nan
+    present = ~np.isnan(z)
+    z = np.nan_to_num(z, nan=0.0)
+    # float32 halves the memory traffic of the products, and the expansion folds into one: [Z², M, Z]·[M, Z², -2Z]ᵀ
+    left = np.hstack([z * z, present, z]).astype(np.float32)
+    right = np.hstack([present, z * z, -2 * z]).astype(np.float32)
+    present = present.astype(np.float32)
+    min_shared = max(len(fields) // 2, 1)
+
+    for start in range(0, size, block_rows):
+        stop = min(start + block_rows, size)
+        shared = present[start:stop] @ present.T
+        block = left[start:stop] @ right.T
+        np.maximum(block, 0, out=block)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            np.divide(block, shared, out=block)
+        np.sqrt(block, out=block)
+        block[shared < min_shared] = np.inf
+        block[np.arange(stop - start), np.arange(start, stop)] = np.inf  # Not your own peer
+
+        nearest = np.argpartition(block, k - 1, axis=1)[:, :k]
+        nearest_distances = np.take_along_axis(block, nearest, axis=1)
+        order = np.argsort(nearest_distances, axis=1, kind="stable")
+        nearest = np.take_along_axis(nearest, order, axis=1)
+        nearest_distances = np.take_along_axis(nearest_distances, order, axis=1)
+        nearest[~np.isfinite(nearest_distances)] = -1
+
+        neighbors[start:stop] = nearest
+        distances[start:stop] = nearest_distances
+
+    return PeerTable(fields=fields, neighbors=neighbors, distances=distances)
+
+
+def peer_deltas(columns: TuesdayColumns, row: int, peer: int, fields: Tuple[str, ...] = PEER_FIELDS) -> Dict[str, Any]:
+    """Per-metric comparison of a peer against the company - delta is peer minus company"""
+    deltas = {}
+    for field in fields:
+        value = columns.value(row, field)
+        peer_value = columns.value(peer, field)
+        delta = None if value is None or peer_value is None else round(peer_value - value, 2)
+        deltas[field] = {"value": value, "peer_value": peer_value, "delta": delta}
+    return deltas
+
+
+class TuesdayPeerEngine:
+    """Memoizes the peer table per snapshot version - rebuilt only when the data changes"""
+
+    def __init__(self, k: Optional[int] = None, max_versions: int = 2):
+        self.k = k if k is not None else int(os.environ.get("TUESDAY_PEER_TABLE_SIZE", DEFAULT_PEER_TABLE_SIZE))
+        self._cache: VersionedCache[PeerTable] = VersionedCache("Tuesday peer table", max_versions)
+
+    def table(self, columns: TuesdayColumns, version: Optional[int] = None) -> PeerTable:
+        if version is None:
+            return compute_peer_table(columns, self.k)
+        return self._cache.get(version, lambda: compute_peer_table(columns, self.k))
+
+    def peers(self, columns: TuesdayColumns, row: int, limit: int = 5,
+              version: Optional[int] = None) -> List[Tuple[int, float]]:
+        """Up to limit (row, distance) pairs most similar to row, closest first"""
+        return self.table(columns, version).peers(row, limit)
+
+
+tuesday_peer_engine = TuesdayPeerEngine()
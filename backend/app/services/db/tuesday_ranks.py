@@ -0,0 +1,83 @@
+import logging
+from dataclasses import dataclass
+from typing import Dict, Any, Optional
+import numpy as np
+from app.core.utils.versioned_cache import VersionedCache
+from app.services.db.tuesday_columns import METRIC_FIELDS, TuesdayColumns
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class MetricRanks:
+    """
+    Percentile and rank of every company in every metric, row-aligned with the columns.
+
+    percentiles are mid-rank (0-100, ties share the average of their span, NaN
+    when the value is missing); ranks count from the highest value (1 = highest,
+    ties share the best rank, 0 when missing); counts is how many companies have
+    a value for the metric.
+    """
+    percentiles: Dict[str, np.ndarray]  # float32
+    ranks: Dict[str, np.ndarray]  # int32
+    counts: Dict[str, int]
+
+    def lookup(self, row: int, metric: str) -> Optional[Dict[str, Any]]:
+        """Percentile and rank of one company in one metric, None when it has no value"""
+        ranks = self.ranks.get(metric)
+        if ranks is None or ranks[row] == 0:
+            return None
+        return {
+            "percentile": round(float(self.percentiles[metric][row]), 1),
+            "rank": int(ranks[row]),
+            "count": self.counts[metric]
+        }
+
+
+def compute_metric_ranks(columns: TuesdayColumns) -> MetricRanks:
+    """
+    Percentiles and ranks for every metric - one sort per metric.
+
+    Each company's position comes from two binary searches into the sorted
+    present values: left gives how many are below it, right how many are at
+    or below, so ties come out equal without a pass over duplicates.
+    """
+    percentiles, ranks, counts = {}, {}, {}
+    for field in METRIC_FIELDS:
+        column = columns.metrics.get(field)
+        if column is None:
+            continue
+        present = ~np.isnan(column)
+        ordered = np.sort(column[present])
+        count = ordered.size
+
+        below = np.searchsorted(ordered, column[present], side="left")
+        at_or_below = np.searchsorted(ordered, column[present], side="right")
+
+        field_percentiles = np.full(columns.size, np.nan, dtype=np.float32)
+        field_ranks = np.zeros(columns.size, dtype=np.int32)
+        if count:
+            field_percentiles[present] = (below + at_or_below) / (2 * count) * 100
+            field_ranks[present] = count - at_or_below + 1
+        field_percentiles.flags.writeable = False
+        field_ranks.flags.writeable = False
+
+        percentiles[field] = field_percentiles
+        ranks[field] = field_ranks
+        counts[field] = int(count)
+    return MetricRanks(percentiles=percentiles, ranks=ranks, counts=counts)
+
+
+class TuesdayRankEngine:
+    """Memoizes metric ranks per snapshot version - recomputed only when the data changes"""
+
+    def __init__(self, max_versions: int = 2):
+        self._cache: VersionedCache[MetricRanks] = VersionedCache("Tuesday metric ranks", max_versions)
+
+    def ranks(self, columns: TuesdayColumns, version: Optional[int] = None) -> MetricRanks:
+        if version is None:
+            return compute_metric_ranks(columns)
+        return self._cache.get(version, lambda: compute_metric_ranks(columns))
+
+
+tuesday_rank_engine = TuesdayRankEngine()
@@ -0,0 +1,157 @@
+import asyncio
+import logging
+import os
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Dict, Any, Optional, Tuple
+from app.services.db.tuesday_table import tuesday_table_service
+from app.services.db.tuesday_columns import TuesdayColumns
+from app.services.db.tuesday_stats import tuesday_stats_engine
+from app.services.db.tuesday_peers import PeerTable, tuesday_peer_engine
+from app.services.db.tuesday_ranks import MetricRanks, tuesday_rank_engine
+from app.services.db.tuesday_name_index import CompanyNameIndex
+from app.core.utils.single_flight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+# Seconds between background refreshes - set to 0 to disable the refresh loop
+DEFAULT_REFRESH_SECONDS = 900.0
+
+
+@dataclass(frozen=True)
+class TuesdaySnapshot:
+    """Read-only view of the Tuesday dataset, shared by every chain in the process"""
+    version: int
+    companies: Tuple[Dict[str, Any], ...]
+    columns: TuesdayColumns
+    name_index: CompanyNameIndex
+    loaded_at: datetime
+
+    @property
+    def count(self) -> int:
+        return len(self.companies)
+
+    @property
+    def analysis(self) -> Dict[str, Any]:
+        """Dataset stats, computed once per version by the stats engine"""
+        return tuesday_stats_engine.summarize(self.columns, self.version)
+
+    @property
+    def peer_table(self) -> PeerTable:
+        """Nearest neighbours of every company, computed once per version by the peer engine"""
+        return tuesday_peer_engine.table(self.columns, self.version)
+
+    @property
+    def ranks(self) -> MetricRanks:
+        """Percentile and rank of every company per metric, computed once per version by the rank engine"""
+        return tuesday_rank_engine.ranks(self.columns, self.version)
+
+
+class TuesdaySnapshotStore:
+    """
+    Holds the one Tuesday dataset snapshot per process, arrr!
+
+    The snapshot is loaded at startup, refreshed in the background (or on demand)
+    and swapped in with a single reference assignment, so readers never see a
+    half-built dataset. Every swap bumps the version number.
+    """
+
+    def __init__(self, refresh_interval: Optional[float] = None):
+        if refresh_interval is None:
+            refresh_interval = float(os.environ.get("TUESDAY_REFRESH_SECONDS", DEFAULT_REFRESH_SECONDS))
+        self.refresh_interval = refresh_interval
+        self._snapshot: Optional[TuesdaySnapshot] = None
+        self._version = 0
+        self._lock = asyncio.Lock()
+        self._flights = SingleFlight("tuesday_snapshot")
+        self._refresh_task: Optional[asyncio.Task] = None
+
+    @property
+    def current(self) -> Optional[TuesdaySnapshot]:
+        """The latest snapshot, or None if the dataset has never loaded"""
+        return self._snapshot
+
+    @property
+    def version(self) -> int:
+        return self._snapshot.version if self._snapshot else 0
+
+    async def refresh(self) -> Dict[str, Any]:
+        """
+        Fetch the dataset off the event loop and swap in a new snapshot.
+
+        A refresh requested while one is already running joins it instead of queuing a second load.
+        """
+        return await self._flights.do("refresh", self._locked_load)
+
+    async def _locked_load(self) -> Dict[str, Any]:
+        async with self._lock:
+            return await self._load()
+
+    async def ensure_loaded(self) -> Optional[TuesdaySnapshot]:
+        """Return the current snapshot, loading it first if startup didn't manage to"""
+        if self._snapshot is not None:
+            return self._snapshot
+        async with self._lock:
+            if self._snapshot is None:
+                await self._load()
+        return self._snapshot
+
+    async def _load(self) -> Dict[str, Any]:
+        try:
+            logger.info("🏴‍☠️ Loading Tuesday dataset snapshot...")
+            dataset_result = await tuesday_table_service.get_all_companies()
+            if not dataset_result["success"]:
+                logger.error(f"🏴‍☠️ Tuesday snapshot load failed: {dataset_result.get('error')}")
+                return dataset_result
+
+            # Parse text metrics into typed columns once, off the event loop
+            columns = await asyncio.to_thread(TuesdayColumns, dataset_result["companies"])
+            name_index = await asyncio.to_thread(CompanyNameIndex, columns)
+
+            version = self._version + 1
+            # Warm the stats, peer and rank memos from the rows we already have - no second fetch
+            await asyncio.to_thread(tuesday_stats_engine.summarize, columns, version)
+            await asyncio.to_thread(tuesday_peer_engine.table, columns, version)
+            await asyncio.to_thread(tuesday_rank_engine.ranks, columns, version)
+
+            self._version = version
+            snapshot = TuesdaySnapshot(
+                version=version,
+                companies=columns.rows,
+                columns=columns,
+                name_index=name_index,
+                loaded_at=datetime.now(timezone.utc)
+            )
+            # Single assignment - chains holding the old snapshot keep a consistent view
+            self._snapshot = snapshot
+            logger.info(f"🏴‍☠️ Tuesday snapshot v{snapshot.version} ready with {snapshot.count} companies")
+            return {"success": True, "version": snapshot.version, "count": snapshot.count}
+
+        except Exception as e:
+            logger.error(f"🏴‍☠️ Failed to load Tuesday snapshot: {str(e)}")
+            return {"success": False, "error": str(e)}
+
+    def start_background_refresh(self) -> None:
+        """Start the periodic refresh loop (no-op if disabled or already running)"""
+        if self.refresh_interval <= 0 or self._refresh_task is not None:
+            return
+        self._refresh_task = asyncio.create_task(self._refresh_loop())
+        logger.info(f"🏴‍☠️ Tuesday snapshot refresh every {self.refresh_interval:.0f}s")
+
+    async def stop_background_refresh(self) -> None:
+        if self._refresh_task is None:
+            return
+        self._refresh_task.cancel()
+        try:
+            await self._refresh_task
+        except asyncio.CancelledError:
+            pass
+        self._refresh_task = None
+
+    async def _refresh_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            await self.refresh()
+
+# Single instance, shared by every chain!
+tuesday_snapshot_store = TuesdaySnapshotStore()
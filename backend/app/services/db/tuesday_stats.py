@@ -0,0 +1,69 @@
+import logging
+import warnings
+from typing import Dict, Any, Optional
+import numpy as np
+from app.core.utils.versioned_cache import VersionedCache
+from app.services.db.tuesday_columns import METRIC_FIELDS, TuesdayColumns
+
+logger = logging.getLogger(__name__)
+
+# Quantiles reported per metric - min, median and max come out of the same pass
+QUANTILES = (0.0, 0.10, 0.25, 0.50, 0.75, 0.90, 1.0)
+QUANTILE_KEYS = ("min", "p10", "p25", "median", "p75", "p90", "max")
+
+
+def _rounded(value: float) -> Optional[float]:
+    return None if np.isnan(value) else round(float(value), 2)
+
+
+def compute_dataset_stats(columns: TuesdayColumns) -> Dict[str, Any]:
+    """
+    Summary stats for every metric in one vectorized pass.
+
+    Stacks the metric columns into a (metrics x companies) matrix and reduces
+    along the company axis, so each statistic is one NumPy call for all metrics.
+    """
+    fields = [field for field in METRIC_FIELDS if columns.has_metric(field)]
+    matrix = np.vstack([columns.metrics[field] for field in fields])
+
+    if columns.size == 0:
+        valid_entries = np.zeros(len(fields), dtype=int)
+        means = stds = np.full(len(fields), np.nan)
+        quantiles = np.full((len(QUANTILES), len(fields)), np.nan)
+    else:
+        with warnings.catch_warnings():
+            # All-NaN metrics are expected and reported as None
+            warnings.simplefilter("ignore", RuntimeWarning)
+            valid_entries = np.count_nonzero(~np.isnan(matrix), axis=1)
+            means = np.nanmean(matrix, axis=1)
+            stds = np.nanstd(matrix, axis=1)
+            quantiles = np.nanquantile(matrix, QUANTILES, axis=1)
+
+    metrics_summary = {}
+    for i, field in enumerate(fields):
+        summary = {"mean": _rounded(means[i])}
+        for q, key in enumerate(QUANTILE_KEYS):
+            summary[key] = _rounded(quantiles[q, i])
+        summary["std"] = _rounded(stds[i])
+        summary["valid_entries"] = int(valid_entries[i])
+        metrics_summary[field] = summary
+
+    return {
+        "total_companies": columns.size,
+        "metrics_summary": metrics_summary
+    }
+
+
+class TuesdayStatsEngine:
+    """Memoizes dataset stats per snapshot version - recomputed only when the data changes"""
+
+    def __init__(self, max_versions: int = 2):
+        self._cache: VersionedCache[Dict[str, Any]] = VersionedCache("Tuesday stats", max_versions)
+
+    def summarize(self, columns: TuesdayColumns, version: Optional[int] = None) -> Dict[str, Any]:
+        if version is None:
+            return compute_dataset_stats(columns)
+        return self._cache.get(version, lambda: compute_dataset_stats(columns))
+
+# Single instance, shared by the snapshot store and the table service!
+tuesday_stats_engine = TuesdayStatsEngine()
@@ -1,20 +1,33 @@
-from app.core.supabase.client import supabase_client
+from app.core.supabase.client import async_supabase_client
 import logging
-from typing import Dict, Any
-import pandas as pd
+from typing import Dict, Any, Optional
+from app.services.db.tuesday_columns import TuesdayColumns
+from app.services.db.tuesday_stats import tuesday_stats_engine
+from app.core.utils.single_flight import SingleFlight
 
 logger = logging.getLogger(__name__)
 
 class TuesdayTableService:
     def __init__(self):
-        self.supabase = supabase_client.get_client()
+        self.db = async_supabase_client
+        self._flights = SingleFlight("tuesday_dataset")
         logger.info("🏴‍☠️ TuesdayTableService ready for financial treasure hunting!")
     
-    def get_all_companies(self) -> Dict[str, Any]:
-        """Retrieve all companies from tuesday_dataset - the complete treasure map!"""
+    async def get_all_companies(self) -> Dict[str, Any]:
+        """
+        Retrieve all companies from tuesday_dataset - the complete treasure map!
+
+        Concurrent callers share one query instead of each fetching every row.
+        """
+        return await self._flights.do("all", self._fetch_all_companies)
+
+    async def _fetch_all_companies(self) -> Dict[str, Any]:
         try:
             logger.info("🏴‍☠️ Fetching all Tuesday dataset companies")
-            result = self.supabase.table("tuesday_dataset").select('*').execute()
+            result = await self.db.execute(
+                self.db.table("tuesday_dataset").select('*'),
+                label="TuesdayTableService._fetch_all_companies"
+            )
             
             if result.data:
                 logger.info(f"🏴‍☠️ Found {len(result.data)} companies in the dataset")
@@ -29,11 +42,18 @@ class TuesdayTableService:
             logger.error(f"🏴‍☠️ Failed to fetch companies: {str(e)}")
             return {"success": False, "error": str(e)}
     
-    def get_company_by_ticker(self, ticker: str) -> Dict[str, Any]:
-        """Find a specific company by stock ticker"""
+    async def get_company_by_ticker(self, ticker: str) -> Dict[str, Any]:
+        """Find a specific company by stock ticker - concurrent lookups of one ticker share a query"""
+        ticker = ticker.upper()
+        return await self._flights.do(("ticker", ticker), lambda: self._fetch_company_by_ticker(ticker))
+
+    async def _fetch_company_by_ticker(self, ticker: str) -> Dict[str, Any]:
         try:
             logger.info(f"🏴‍☠️ Searching for ticker: {ticker}")
-            result = self.supabase.table("tuesday_dataset").select('*').eq('stock_ticker', ticker.upper()).execute()
+            result = await self.db.execute(
+                self.db.table("tuesday_dataset").select('*').eq('stock_ticker', ticker),
+                label="TuesdayTableService._fetch_company_by_ticker"
+            )
             
             if result.data and len(result.data) > 0:
                 company = result.data[0]
@@ -45,71 +65,60 @@ class TuesdayTableService:
             logger.error(f"🏴‍☠️ Failed to get company by ticker: {str(e)}")
             return {"success": False, "error": str(e)}
     
-    def get_top_performers(self, metric: str = "ytd_return_percent", limit: int = 10) -> Dict[str, Any]:
+    async def _load_columns(self, columns: Optional[TuesdayColumns]) -> Dict[str, Any]:
+        """Use the caller's columnar store, or fetch and parse the dataset once"""
+        if columns is not None:
+            return {"success": True, "columns": columns}
+        all_data = await self.get_all_companies()
+        if not all_data["success"]:
+            return all_data
+        return {"success": True, "columns": TuesdayColumns(all_data["companies"])}
+
+    async def get_top_performers(self, metric: str = "ytd_return_percent", limit: int = 10,
+                           columns: Optional[TuesdayColumns] = None) -> Dict[str, Any]:
         """Get top performing companies by specified metric"""
         try:
             logger.info(f"🏴‍☠️ Finding top {limit} performers by {metric}")
             
-            # Get all data first, then sort (since Supabase text fields need conversion)
-            all_data = self.get_all_companies()
-            if not all_data["success"]:
-                return all_data
-            
-            # Convert to DataFrame for easier analysis
-            df = pd.DataFrame(all_data["companies"])
+            loaded = await self._load_columns(columns)
+            if not loaded["success"]:
+                return loaded
+            columns = loaded["columns"]
             
-            # Convert metric to numeric (handling text fields)
-            if metric in df.columns:
-                df[f"{metric}_numeric"] = pd.to_numeric(df[metric], errors='coerce')
-                top_companies = df.nlargest(limit, f"{metric}_numeric").to_dict('records')
-                
-                return {
-                    "success": True,
-                    "top_performers": top_companies,
-                    "metric": metric,
-                    "count": len(top_companies)
-                }
-            else:
+            if not columns.has_metric(metric):
                 return {"success": False, "error": f"Metric {metric} not found"}
+            
+            # Metric arrays are pre-parsed, so this is a partial sort - no DataFrame
+            values = columns.metrics[metric]
+            top_companies = [
+                {**columns.rows[i], f"{metric}_numeric": float(values[i])}
+                for i in columns.top(metric, limit)
+            ]
+            
+            return {
+                "success": True,
+                "top_performers": top_companies,
+                "metric": metric,
+                "count": len(top_companies)
+            }
                 
         except Exception as e:
             logger.error(f"🏴‍☠️ Failed to get top performers: {str(e)}")
             return {"success": False, "error": str(e)}
     
-    def analyze_dataset(self) -> Dict[str, Any]:
+    async def analyze_dataset(self, columns: Optional[TuesdayColumns] = None,
+                        version: Optional[int] = None) -> Dict[str, Any]:
         """Perform basic analysis on the entire dataset"""
         try:
             logger.info("🏴‍☠️ Running dataset analysis")
             
-            all_data = self.get_all_companies()
-            if not all_data["success"]:
-                return all_data
-            
-            df = pd.DataFrame(all_data["companies"])
-            
-            # Convert numeric fields
-            numeric_fields = [
-                'current_stock_price', 'ytd_return_percent', 'market_cap_millions',
-                'rule_of_40_score', 'ebitda_margin_percent', 'return_on_invested_capital',
-                'revenue_5yr_growth_rate', 'sales_yoy_growth_percent', 'projected_3yr_sales_growth',
-                'capex_intensity_ratio', 'rd_intensity_percent', 'annual_revenue_millions'
-            ]
-            
-            analysis = {
-                "total_companies": len(df),
-                "metrics_summary": {}
-            }
+            loaded = await self._load_columns(columns)
+            if not loaded["success"]:
+                return loaded
+            columns = loaded["columns"]
             
-            for field in numeric_fields:
-                if field in df.columns:
-                    numeric_series = pd.to_numeric(df[field], errors='coerce')
-                    analysis["metrics_summary"][field] = {
-                        "mean": round(numeric_series.mean(), 2) if not numeric_series.isna().all() else None,
-                        "median": round(numeric_series.median(), 2) if not numeric_series.isna().all() else None,
-                        "min": round(numeric_series.min(), 2) if not numeric_series.isna().all() else None,
-                        "max": round(numeric_series.max(), 2) if not numeric_series.isna().all() else None,
-                        "valid_entries": numeric_series.count()
-                    }
+            # One vectorized pass over every metric, memoized per dataset version
+            analysis = tuesday_stats_engine.summarize(columns, version)
             
             return {"success": True, "analysis": analysis}
             
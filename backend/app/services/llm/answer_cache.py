@@ -0,0 +1,142 @@
+import hashlib
+import logging
+import os
+import re
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, Optional, Tuple
+from app.core.metrics import ANSWER_CACHE
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL_SECONDS = 3600.0
+DEFAULT_MAX_ENTRIES = 1024
+DEFAULT_MAX_MB = 32.0
+DEFAULT_REPLAY_CHARS = 48  # About what one streamed model chunk carries
+
+AnswerKey = Tuple[Any, ...]
+
+
+def normalize_message(message: str) -> str:
+    """Case, spacing and trailing punctuation don't change the question"""
+    return re.sub(r"\s+", " ", message.lower()).strip().rstrip("?!. ")
+
+
+def digest(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class _Entry:
+    answer: str
+    expires_at: float
+    size: int
+
+
+class AnswerCache:
+    """
+    Exact-match cache of complete answers to opening questions, arrr!
+
+    Keyed on everything the answer depends on - company, dataset version,
+    a digest of the search context, the normalized question and whether the
+    conversation had any history - so a hit is the answer the model would
+    have been asked to write from the same prompt. Off unless
+    ANSWER_CACHE_ENABLED is set. Entries expire after ttl_seconds, and least
+    recently used ones go first once max_entries or max_bytes is passed.
+    """
+
+    def __init__(
+        self,
+        enabled: Optional[bool] = None,
+        ttl_seconds: Optional[float] = None,
+        max_entries: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        replay_chars: int = DEFAULT_REPLAY_CHARS
+    ):
+        self.enabled = enabled if enabled is not None else (
+            os.environ.get("ANSWER_CACHE_ENABLED", "").lower() in ("1", "true", "yes"))
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else float(
+            os.environ.get("ANSWER_CACHE_TTL_SECONDS", DEFAULT_TTL_SECONDS))
+        self.max_entries = max_entries if max_entries is not None else int(
+            os.environ.get("ANSWER_CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES))
+        self.max_bytes = max_bytes if max_bytes is not None else int(
+            float(os.environ.get("ANSWER_CACHE_MAX_MB", DEFAULT_MAX_MB)) * 1024 * 1024)
+        self.replay_chars = replay_chars
+        self._entries: "OrderedDict[AnswerKey, _Entry]" = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def key(
+        self,
+        company: str,
+        dataset_version: int,
+        search_context: str,
+        message: str,
+        empty_history: bool,
+        template_version: int = 0
+    ) -> AnswerKey:
+        return (
+            company.lower(),
+            dataset_version,
+            digest(search_context),
+            normalize_message(message),
+            empty_history,
+            template_version
+        )
+
+    def get(self, key: AnswerKey) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is not None and entry.expires_at < time.monotonic():
+            self._remove(key)
+            entry = None
+        if entry is None:
+            self.misses += 1
+            ANSWER_CACHE.inc(result="miss")
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        ANSWER_CACHE.inc(result="hit")
+        return entry.answer
+
+    def put(self, key: AnswerKey, answer: str) -> None:
+        size = len(answer.encode("utf-8"))
+        if not answer or size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = _Entry(answer=answer, expires_at=time.monotonic() + self.ttl_seconds, size=size)
+        self._bytes += size
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def _remove(self, key: AnswerKey) -> None:
+        self._bytes -= self._entries.pop(key).size
+
+    def replay(self, answer: str) -> Iterator[str]:
+        """A cached answer cut into chunks, so it streams to the client like a live one"""
+        for start in range(0, len(answer), self.replay_chars):
+            yield answer[start:start + self.replay_chars]
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions
+        }
+
+# Single instance, shared by every chain!
+answer_cache = AnswerCache()
@@ -1,7 +1,14 @@
 import logging
+from typing import Dict, Any, Optional
 import google.api_core.exceptions
-from langchain_google_vertexai import ChatVertexAI
+from fastapi import WebSocketDisconnect
+from app.services.chains.base_conversation_chain import LOG_DEBUG_TOGGLE_ENABLED
 from app.services.chains.investment_analysis_chain import InvestmentAnalysisChain
+from app.services.db.tuesday_snapshot import tuesday_snapshot_store
+from app.services.llm.session_registry import chain_sessions
+from app.services.llm.model_pool import chat_models
+from app.services.llm.stream_writer import WebSocketStreamWriter
+from app.core.metrics import ACTIVE_WEBSOCKETS
 from google.oauth2.credentials import Credentials
 logger = logging.getLogger(__name__)
 
@@ -10,30 +17,78 @@ class InvestmentAnalysisLLMService:
     
     def __init__(self, credentials: Credentials = None, project_id: str = None):
         self._chain = None
+        self._conversation_id = None  # Set while a registry session is held
+        self._writer: Optional[WebSocketStreamWriter] = None
         self.credentials = credentials
         self.project_id = project_id
         
     def get_chain(self) -> InvestmentAnalysisChain:
         """Get or create the analysis chain"""
         if self._chain is None:
-            # Initialize LLM with explicit credentials
-            llm = ChatVertexAI(
-                model="gemini-2.5-pro",
-                streaming=True,
-                max_retries=0,
-                temperature=0,
-                credentials=self.credentials,  # Pass credentials explicitly
-                project=self.project_id       # Pass project ID explicitly
-            )
+            # Shared, already-connected client - no per-connection client or TLS setup
+            llm = chat_models.get(model="gemini-2.5-pro", streaming=True, max_retries=0, temperature=0)
                     
-            # Create chain
-            self._chain = InvestmentAnalysisChain(llm=llm)
+            # Create chain on the shared Tuesday snapshot - no per-connection dataset load
+            self._chain = InvestmentAnalysisChain(llm=llm, snapshot=tuesday_snapshot_store.current)
             
         return self._chain
 
         
+    async def open_chain(self, conversation_id: str = None) -> InvestmentAnalysisChain:
+        """
+        Chain for a socket - resumed from the session registry when the conversation is warm.
+        
+        A resumed chain already has its history, company match and rendered
+        prompt sections, so nothing is loaded. Call close_chain() when the socket ends.
+        """
+        if conversation_id:
+            chain = chain_sessions.acquire(conversation_id)
+            if chain is not None:
+                self._chain = chain
+                self._conversation_id = conversation_id
+                logger.info(f"🏴‍☠️ Resumed warm chain for conversation {conversation_id}")
+                return chain
+
+        chain = self.get_chain()
+        if not conversation_id:
+            return chain
+
+        # Turns are saved under this conversation and read back on the first message
+        chain.bind_conversation(conversation_id)
+
+        # Conversation, company and Tuesday ticker in one query
+        from app.services.db.conversation import ConversationService
+        from app.core.supabase.client import async_supabase_client
+        opened = await ConversationService(async_supabase_client).get_conversation_with_company(conversation_id)
+        if opened and opened.get("company"):
+            chain.load_company_context(opened["company"], tuesday_ticker=opened.get("tuesday_ticker"))
+            logger.info(f"🏴‍☠️ Loaded company context: {opened['company']['name']}")
+
+        # Another socket may have registered this conversation while we loaded - use its chain
+        self._chain = chain_sessions.add(conversation_id, chain)
+        self._conversation_id = conversation_id
+        return self._chain
+
+    def close_chain(self) -> None:
+        """Hand the chain back to the session registry, where it stays warm for reconnects"""
+        if self._conversation_id:
+            chain_sessions.release(self._conversation_id)
+            self._conversation_id = None
+
+    async def _send_final(self, websocket, message: Dict[str, Any]) -> None:
+        """Send a last message after anything still queued, then stop the writer"""
+        if self._writer is None:
+            await websocket.send_json(message)
+            return
+        writer, self._writer = self._writer, None
+        try:
+            await writer.send(message)
+        finally:
+            await writer.close()
+
     async def process_websocket(self, websocket, conversation_id: str = None):
         """Process WebSocket with optional company context"""
+        ACTIVE_WEBSOCKETS.inc()
         try:
             await websocket.accept()
             logger.info("CARA WebSocket connection accepted")
@@ -43,16 +98,14 @@ class InvestmentAnalysisLLMService:
                 "data": "connected"
             })
             
-            # Get chain and load company context if conversation_id provided
-            chain = self.get_chain()
-            
-            if conversation_id:
-                # Load company context
-                from app.services.db.company import company_db_service
-                company_result = company_db_service.get_company_analysis(conversation_id)
-                if company_result["success"]:
-                    chain.load_company_context(company_result["company"])
-                    logger.info(f"🏴‍☠️ Loaded company context: {company_result['company']['name']}")
+            # Only hits the database if the startup load didn't land
+            await tuesday_snapshot_store.ensure_loaded()
+
+            # Warm chain for this conversation if a recent socket left one, otherwise a new one
+            chain = await self.open_chain(conversation_id)
+
+            # Everything after connect goes through one writer - coalesced chunks, bounded queue
+            self._writer = WebSocketStreamWriter(websocket, session_id=conversation_id)
             
             # Process messages (your existing while loop)
             while True:
@@ -60,29 +113,46 @@ class InvestmentAnalysisLLMService:
                 
                 # Handle heartbeat
                 if data.get('type') == 'heartbeat':
-                    await websocket.send_json({
+                    await self._writer.send({
                         "type": "heartbeat_ack",
                         "timestamp": data.get('timestamp')
                     })
                     continue
                 
+                # Per-session debug logging - full prompt dumps for this conversation only.
+                # Off unless the server allows it, so a client can't turn on prompt dumps by itself.
+                if data.get('type') == 'debug':
+                    if not LOG_DEBUG_TOGGLE_ENABLED:
+                        logger.debug(f"Ignored debug toggle for conversation {conversation_id} (LOG_DEBUG_TOGGLE_ENABLED is off)")
+                        continue
+                    chain.debug_logging = bool(data.get('enabled'))
+                    await self._writer.send({
+                        "type": "debug_ack",
+                        "enabled": chain.debug_logging
+                    })
+                    continue
+                
                 # Handle regular messages
                 if data.get('type') == 'message' or 'message' in data:
                     message = data.get('message', '')
                     if message.strip():
                         # Process message through chain
                         async for response in chain.process_message(message):
-                            await websocket.send_json(response)
+                            await self._writer.send(response)
                     else:
-                        await websocket.send_json({
+                        await self._writer.send({
                             "type": "error",
                             "data": {"message": "Empty message received"}
                         })
                             
+        except WebSocketDisconnect as e:
+            # Client went away - nothing to send, the finally block cleans up
+            logger.info(f"CARA WebSocket closed by client (code {e.code})")
+
         except google.api_core.exceptions.ResourceExhausted as e:
             logger.error(f"Rate limit exceeded: {str(e)}")
             try:
-                await websocket.send_json({
+                await self._send_final(websocket, {
                     "type": "error",
                     "data": {
                         "code": "rate_limit",
@@ -96,7 +166,7 @@ class InvestmentAnalysisLLMService:
         except Exception as e:
             logger.error(f"Error in CARA websocket: {str(e)}", exc_info=True)
             try:
-                await websocket.send_json({
+                await self._send_final(websocket, {
                     "type": "error",
                     "data": {
                         "message": f"Connection error: {str(e)}"
@@ -104,4 +174,11 @@ class InvestmentAnalysisLLMService:
                 })
                 await websocket.close(code=1011)
             except:
-                pass
\ No newline at end of file
+                pass
+
+        finally:
+            ACTIVE_WEBSOCKETS.dec()
+            if self._writer is not None:
+                await self._writer.close()
+                self._writer = None
+            self.close_chain()
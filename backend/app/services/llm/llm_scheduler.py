@@ -0,0 +1,336 @@
+import asyncio
+import logging
+import os
+import random
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, Optional, TypeVar, Union
+from google.api_core.exceptions import TooManyRequests
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+DEFAULT_MAX_CONCURRENT = 32
+DEFAULT_MAX_BACKGROUND = 4
+DEFAULT_MAX_QUEUED = 1000
+DEFAULT_QUOTA_RETRIES = 5
+DEFAULT_BACKOFF_BASE_SECONDS = 1.0
+DEFAULT_BACKOFF_MAX_SECONDS = 30.0
+DEFAULT_STATUS_INTERVAL_SECONDS = 1.0
+DEFAULT_HOLD_SECONDS = 10.0  # Assumed length of a model call until real ones have been timed
+
+
+class LLMQueueFull(Exception):
+    """Too many requests already waiting - try again after retry_after seconds"""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"LLM queue is full, retry in {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+@dataclass
+class QueueStatus:
+    """Where a waiting request stands - streamed to the client while it waits"""
+    position: int  # 1 = next to be admitted
+    eta_seconds: float
+    reason: str = "queued"  # "queued" for capacity, "rate_limit" while backing off a quota error
+
+    def as_message(self) -> Dict[str, Any]:
+        return {
+            "type": "queue_status",
+            "data": {
+                "position": self.position,
+                "eta_seconds": round(self.eta_seconds, 1),
+                "reason": self.reason
+            }
+        }
+
+
+@dataclass
+class _Waiter:
+    session_id: str
+    future: asyncio.Future = field(repr=False)
+    background: bool = False
+
+
+class LLMScheduler:
+    """
+    Process-wide admission control for model calls, arrr!
+
+    At most max_concurrent calls run at once. The rest wait in one FIFO queue
+    per session, and sessions are served round-robin - a user with five
+    messages queued gets one slot per rotation, not five in a row. A quota
+    error (429 / ResourceExhausted) before the first token is retried with
+    jittered exponential backoff, and pauses admissions for everyone until the
+    backoff ends, so the whole process eases off instead of hammering Vertex.
+    Waiting callers get QueueStatus updates to pass on to the client.
+
+    Background calls (history summaries) wait in their own queue, are only
+    admitted when no user call is waiting, and hold at most max_background
+    slots - they share the quota and the backoff without ever delaying a user.
+    """
+
+    def __init__(
+        self,
+        max_concurrent: Optional[int] = None,
+        max_queued: Optional[int] = None,
+        max_background: Optional[int] = None,
+        quota_retries: Optional[int] = None,
+        backoff_base: Optional[float] = None,
+        backoff_max: Optional[float] = None,
+        status_interval: Optional[float] = None
+    ):
+        self.max_concurrent = max_concurrent if max_concurrent is not None else int(
+            os.environ.get("LLM_MAX_CONCURRENT", DEFAULT_MAX_CONCURRENT))
+        self.max_queued = max_queued if max_queued is not None else int(
+            os.environ.get("LLM_MAX_QUEUED", DEFAULT_MAX_QUEUED))
+        self.max_background = max_background if max_background is not None else int(
+            os.environ.get("LLM_MAX_BACKGROUND", DEFAULT_MAX_BACKGROUND))
+        self.quota_retries = quota_retries if quota_retries is not None else int(
+            os.environ.get("LLM_QUOTA_RETRIES", DEFAULT_QUOTA_RETRIES))
+        self.backoff_base = backoff_base if backoff_base is not None else float(
+            os.environ.get("LLM_BACKOFF_BASE_SECONDS", DEFAULT_BACKOFF_BASE_SECONDS))
+        self.backoff_max = backoff_max if backoff_max is not None else float(
+            os.environ.get("LLM_BACKOFF_MAX_SECONDS", DEFAULT_BACKOFF_MAX_SECONDS))
+        self.status_interval = status_interval if status_interval is not None else DEFAULT_STATUS_INTERVAL_SECONDS
+        self._active = 0
+        self._queues: "OrderedDict[str, Deque[_Waiter]]" = OrderedDict()  # Next session to serve first
+        self._queued = 0
+        self._background: Deque[_Waiter] = deque()  # Served only when no session is waiting
+        self._background_active = 0
+        self._paused_until = 0.0
+        self._resume_handle: Optional[asyncio.TimerHandle] = None
+        self._hold_seconds = DEFAULT_HOLD_SECONDS  # Moving average of slot hold time, for ETAs
+        self.admitted = 0
+        self.quota_errors = 0
+        self.rejected = 0
+
+    @property
+    def active(self) -> int:
+        return self._active
+
+    @property
+    def queued(self) -> int:
+        return self._queued
+
+    def _pause_remaining(self) -> float:
+        return max(self._paused_until - time.monotonic(), 0.0)
+
+    def backoff(self, attempt: int) -> float:
+        """Full-jitter exponential backoff: uniform over [0, min(max, base * 2^attempt)]"""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def position(self, waiter: _Waiter) -> int:
+        """1-based admission order of a queued waiter under round-robin service"""
+        if waiter.background:
+            return self._queued + self._background.index(waiter) + 1 if waiter in self._background else 0
+        queue = self._queues.get(waiter.session_id)
+        if queue is None or waiter not in queue:
+            return 0
+        index = queue.index(waiter)
+        ahead = index
+        before = True  # Sessions earlier in the rotation get one more turn in before this waiter's
+        for session_id, other in self._queues.items():
+            if session_id == waiter.session_id:
+                before = False
+                continue
+            ahead += min(len(other), index + 1 if before else index)
+        return ahead + 1
+
+    def _status(self, waiter: _Waiter, reason: str = "queued") -> QueueStatus:
+        position = self.position(waiter)
+        rounds = (position - 1) // max(self.max_concurrent, 1) + 1
+        return QueueStatus(
+            position=position,
+            eta_seconds=self._pause_remaining() + rounds * self._hold_seconds,
+            reason="rate_limit" if self._pause_remaining() > 0 else reason
+        )
+
+    def _can_admit(self, background: bool = False) -> bool:
+        if background and (self._queues or self._background or self._background_active >= self.max_background):
+            return False
+        return self._active < self.max_concurrent and self._pause_remaining() <= 0
+
+    def _dispatch(self) -> None:
+        """Admit waiters round-robin while there are free slots"""
+        remaining = self._pause_remaining()
+        if remaining > 0:
+            if self._resume_handle is None and (self._queues or self._background):
+                self._resume_handle = asyncio.get_running_loop().call_later(remaining, self._resume)
+            return
+        while self._active < self.max_concurrent and self._queues:
+            session_id, queue = next(iter(self._queues.items()))
+            waiter = queue.popleft()
+            self._queued -= 1
+            if queue:
+                self._queues.move_to_end(session_id)  # Back of the rotation
+            else:
+                del self._queues[session_id]
+            if waiter.future.done():
+                continue  # Gave up while waiting
+            self._active += 1
+            self.admitted += 1
+            waiter.future.set_result(None)
+        # Background work only gets what the sessions left over
+        while (self._active < self.max_concurrent and not self._queues and self._background
+               and self._background_active < self.max_background):
+            waiter = self._background.popleft()
+            if waiter.future.done():
+                continue
+            self._active += 1
+            self._background_active += 1
+            self.admitted += 1
+            waiter.future.set_result(None)
+
+    def _resume(self) -> None:
+        self._resume_handle = None
+        self._dispatch()
+
+    def _release(self, held: Optional[float] = None, background: bool = False) -> None:
+        self._active -= 1
+        if background:
+            self._background_active -= 1
+        if held is not None:
+            self._hold_seconds += 0.1 * (held - self._hold_seconds)
+        self._dispatch()
+
+    def _remove(self, waiter: _Waiter) -> None:
+        if waiter.background:
+            if waiter in self._background:
+                self._background.remove(waiter)
+            return
+        queue = self._queues.get(waiter.session_id)
+        if queue is not None and waiter in queue:
+            queue.remove(waiter)
+            self._queued -= 1
+            if not queue:
+                del self._queues[waiter.session_id]
+
+    def pause(self, seconds: float) -> None:
+        """Hold all admissions for seconds - every caller backs off together after a quota error"""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        if self._resume_handle is not None:
+            self._resume_handle.cancel()
+            self._resume_handle = None
+        self._dispatch()
+
+    async def _acquire(
+        self,
+        session_id: str,
+        reason: str = "queued",
+        background: bool = False
+    ) -> AsyncIterator[QueueStatus]:
+        """Wait for a slot, yielding a QueueStatus whenever the wait changes - holds the slot on return"""
+        if self._can_admit(background) and not self._queues:
+            self._active += 1
+            self._background_active += int(background)
+            self.admitted += 1
+            return
+        if (len(self._background) if background else self._queued) >= self.max_queued:
+            self.rejected += 1
+            raise LLMQueueFull(retry_after=self._pause_remaining() + self._hold_seconds)
+
+        waiter = _Waiter(session_id, asyncio.get_running_loop().create_future(), background)
+        if background:
+            self._background.append(waiter)
+        else:
+            self._queues.setdefault(session_id, deque()).append(waiter)
+            self._queued += 1
+        self._dispatch()
+        last = None
+        try:
+            while not waiter.future.done():
+                status = self._status(waiter, reason)
+                if last is None or (status.position, status.reason) != (last.position, last.reason):
+                    last = status
+                    yield status
+                await asyncio.wait({waiter.future}, timeout=self.status_interval)
+        except BaseException:
+            # Socket closed or generator dropped while waiting - give up the place, or the slot if it just arrived
+            if waiter.future.done() and not waiter.future.cancelled():
+                self._release(background=background)
+            else:
+                waiter.future.cancel()
+                self._remove(waiter)
+            raise
+
+    async def stream(
+        self,
+        session_id: str,
+        start: Callable[[], AsyncIterator[Any]],
+        background: bool = False
+    ) -> AsyncIterator[Union[QueueStatus, Any]]:
+        """
+        Run start() - a model stream - inside a slot, yielding its chunks.
+
+        QueueStatus items are interleaved while the call waits for a slot or
+        backs off a quota error. A quota error after the first chunk can't be
+        retried without repeating output, so it's raised like any other error,
+        as is the last one once quota_retries are used up.
+        """
+        attempt = 0
+        reason = "queued"
+        while True:
+            acquiring = self._acquire(session_id, reason, background)
+            try:
+                async for status in acquiring:
+                    yield status
+            finally:
+                # Closed here, not by the GC, so a dropped wait gives its place back straight away
+                await acquiring.aclose()
+
+            started = time.monotonic()
+            emitted = False
+            try:
+                async for chunk in start():
+                    emitted = True
+                    yield chunk
+                return
+            except TooManyRequests as e:
+                self.quota_errors += 1
+                if emitted or attempt >= self.quota_retries:
+                    logger.error(f"Model quota exhausted for {session_id} after {attempt + 1} attempts: {str(e)}")
+                    raise
+                retry_in = self.backoff(attempt)
+                logger.warning(f"🏴‍☠️ Model quota hit for {session_id}, retry {attempt + 1} in {retry_in:.1f}s")
+                # Paused before the slot is released, so nobody else is admitted into the same quota wall
+                self.pause(retry_in)
+            finally:
+                self._release(time.monotonic() - started, background)
+
+            # Back in the queue behind the pause - the wait is reported as a rate limit
+            attempt += 1
+            reason = "rate_limit"
+
+    async def invoke(self, session_id: str, call: Callable[[], Awaitable[T]], background: bool = False) -> T:
+        """Run one non-streaming model call - call() - inside a slot, with the same quota backoff"""
+        async def start() -> AsyncIterator[T]:
+            yield await call()
+
+        result = None
+        calls = self.stream(session_id, start, background=background)
+        try:
+            async for item in calls:
+                if not isinstance(item, QueueStatus):
+                    result = item
+        finally:
+            await calls.aclose()
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "active": self._active,
+            "queued": self._queued,
+            "background_active": self._background_active,
+            "background_queued": len(self._background),
+            "sessions_waiting": len(self._queues),
+            "paused_seconds": round(self._pause_remaining(), 1),
+            "admitted": self.admitted,
+            "quota_errors": self.quota_errors,
+            "rejected": self.rejected
+        }
+
+# Single instance, shared by every chain!
+llm_scheduler = LLMScheduler()
@@ -0,0 +1,133 @@
+import asyncio
+import itertools
+import json
+import logging
+import os
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+from google.oauth2 import service_account
+from google.auth.transport.requests import Request as GoogleAuthRequest
+from langchain_google_vertexai import ChatVertexAI
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL = "gemini-2.5-pro"
+DEFAULT_POOL_SIZE = 2
+
+
+def load_google_credentials() -> Dict[str, Any]:
+    """
+    Parse the service account from GOOGLE_APPLICATION_CREDENTIALS_JSON.
+
+    Returns {"credentials", "project_id"}; raises ValueError if either
+    variable is missing or the JSON is invalid.
+    """
+    credentials_json = os.getenv("GOOGLE_APPLICATION_CREDENTIALS_JSON")
+    project_id = os.getenv("GOOGLE_CLOUD_PROJECT")
+
+    if not credentials_json:
+        raise ValueError("GOOGLE_APPLICATION_CREDENTIALS_JSON environment variable not set")
+    if not project_id:
+        raise ValueError("GOOGLE_CLOUD_PROJECT environment variable not set")
+
+    try:
+        credentials_info = json.loads(credentials_json)
+    except json.JSONDecodeError:
+        raise ValueError("Invalid Google Cloud credentials JSON")
+    credentials = service_account.Credentials.from_service_account_info(
+        credentials_info, scopes=["https://www.googleapis.com/auth/cloud-platform"])
+    return {"credentials": credentials, "project_id": project_id}
+
+
+class ChatModelPool:
+    """
+    Process-wide ChatVertexAI clients, a few per model config, arrr!
+
+    Credentials are parsed once and every client shares them. The Vertex SDK
+    keeps one gRPC channel per client, so a handful of clients handed out
+    round-robin spread concurrent streams over a handful of kept-alive
+    connections, instead of a new client (and TLS handshake) per websocket.
+    """
+
+    def __init__(self, pool_size: Optional[int] = None):
+        self.pool_size = pool_size if pool_size is not None else int(
+            os.environ.get("VERTEX_CLIENT_POOL_SIZE", DEFAULT_POOL_SIZE))
+        self.credentials = None
+        self.project_id: Optional[str] = None
+        self._clients: Dict[Tuple, List[ChatVertexAI]] = {}
+        self._cycles: Dict[Tuple, Iterator[ChatVertexAI]] = {}
+
+    @property
+    def configured(self) -> bool:
+        return self.credentials is not None
+
+    def configure(self, credentials, project_id: str) -> None:
+        """Set the shared credentials - drops clients built with earlier ones"""
+        self.credentials = credentials
+        self.project_id = project_id
+        self._clients.clear()
+        self._cycles.clear()
+
+    def ensure_configured(self) -> None:
+        """Load credentials from the environment if startup didn't - raises ValueError"""
+        if not self.configured:
+            self.configure(**load_google_credentials())
+
+    def get(
+        self,
+        model: str = DEFAULT_MODEL,
+        temperature: float = 0,
+        streaming: bool = True,
+        max_retries: int = 0
+    ) -> ChatVertexAI:
+        """A shared client for this config - safe to use from many sessions at once"""
+        return next(self._cycles[self._build(model, temperature, streaming, max_retries)])
+
+    def _build(self, model: str, temperature: float, streaming: bool, max_retries: int) -> Tuple:
+        self.ensure_configured()
+        key = (model, temperature, streaming, max_retries)
+        if key not in self._clients:
+            self._clients[key] = [
+                ChatVertexAI(
+                    model=model,
+                    streaming=streaming,
+                    max_retries=max_retries,
+                    temperature=temperature,
+                    credentials=self.credentials,  # Pass credentials explicitly
+                    project=self.project_id       # Pass project ID explicitly
+                )
+                for _ in range(max(self.pool_size, 1))
+            ]
+            self._cycles[key] = itertools.cycle(self._clients[key])
+            logger.info(f"🏴‍☠️ Built {len(self._clients[key])} shared {model} clients")
+        return key
+
+    async def warm_up(self, model: str = DEFAULT_MODEL) -> None:
+        """
+        Fetch an access token and open each client's channel before the first session.
+
+        Best effort - anything that fails here just happens on first use instead.
+        """
+        self.ensure_configured()
+        try:
+            await asyncio.to_thread(self.credentials.refresh, GoogleAuthRequest())
+        except Exception as e:
+            logger.warning(f"Google access token prefetch failed: {str(e)}")
+
+        results = await asyncio.gather(
+            *(self._open_channel(llm) for llm in self._clients[self._build(model, 0, True, 0)]),
+            return_exceptions=True
+        )
+        failed = [result for result in results if isinstance(result, Exception)]
+        if failed:
+            logger.warning(f"Vertex AI channel warm-up failed: {failed[0]!r}")
+        else:
+            logger.info(f"🏴‍☠️ Warmed {model} client pool")
+
+    async def _open_channel(self, llm: ChatVertexAI) -> None:
+        # The SDK caches this client per event loop, so sessions reuse the channel opened here
+        channel = getattr(llm.async_prediction_client.transport, "grpc_channel", None)
+        if channel is not None and hasattr(channel, "channel_ready"):
+            await asyncio.wait_for(channel.channel_ready(), timeout=5.0)
+
+# Single instance, shared by every session!
+chat_models = ChatModelPool()
@@ -0,0 +1,161 @@
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Any, Optional
+from app.services.chains.investment_analysis_chain import InvestmentAnalysisChain
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_SESSIONS = 256
+DEFAULT_IDLE_SECONDS = 900.0
+DEFAULT_MAX_MB = 256.0
+
+
+@dataclass
+class _Session:
+    chain: InvestmentAnalysisChain
+    last_used: float
+    active: int = 1  # Open sockets using the chain - active sessions are never evicted
+    size: int = 0
+
+
+class ChainSessionRegistry:
+    """
+    Warm InvestmentAnalysisChain instances per conversation_id, arrr!
+
+    A reconnect to a conversation picks its chain back up - history, matched
+    company and rendered prompt sections included - instead of rebuilding it.
+    Chains with no open socket are evicted after idle_seconds, and least
+    recently used first once there are more than max_sessions or their
+    estimated size passes max_bytes.
+
+    Two sockets open on the same conversation share one chain, so the
+    conversation keeps one history. The chain runs one turn at a time
+    (see BaseConversationChain.process_message), so their turns queue
+    behind each other instead of interleaving in the history and the
+    write-behind buffer.
+    """
+
+    def __init__(
+        self,
+        max_sessions: Optional[int] = None,
+        idle_seconds: Optional[float] = None,
+        max_bytes: Optional[int] = None
+    ):
+        self.max_sessions = max_sessions if max_sessions is not None else int(
+            os.environ.get("CHAIN_SESSION_MAX", DEFAULT_MAX_SESSIONS))
+        self.idle_seconds = idle_seconds if idle_seconds is not None else float(
+            os.environ.get("CHAIN_SESSION_IDLE_SECONDS", DEFAULT_IDLE_SECONDS))
+        self.max_bytes = max_bytes if max_bytes is not None else int(
+            float(os.environ.get("CHAIN_SESSION_MAX_MB", DEFAULT_MAX_MB)) * 1024 * 1024)
+        self._sessions: "OrderedDict[str, _Session]" = OrderedDict()
+        self._sweep_task: Optional[asyncio.Task] = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def acquire(self, conversation_id: str) -> Optional[InvestmentAnalysisChain]:
+        """The warm chain for a conversation, or None - pair every hit with release()"""
+        session = self._sessions.get(conversation_id)
+        if session is None or self._expired(session, time.monotonic()):
+            if session is not None:
+                self._evict(conversation_id, "idle")
+            self.misses += 1
+            return None
+        session.active += 1
+        session.last_used = time.monotonic()
+        self._sessions.move_to_end(conversation_id)
+        self.hits += 1
+        return session.chain
+
+    def add(self, conversation_id: str, chain: InvestmentAnalysisChain) -> InvestmentAnalysisChain:
+        """
+        Register a freshly built chain as acquired - pair with release().
+
+        If another socket registered one for the conversation meanwhile, that
+        chain is kept and returned instead, so a conversation has one history.
+        """
+        session = self._sessions.get(conversation_id)
+        if session is not None:
+            session.active += 1
+            session.last_used = time.monotonic()
+            self._sessions.move_to_end(conversation_id)
+            return session.chain
+        self._sessions[conversation_id] = _Session(
+            chain=chain, last_used=time.monotonic(), size=chain.estimated_bytes())
+        self._enforce_limits()
+        return chain
+
+    def release(self, conversation_id: str) -> None:
+        """A socket is done with the chain - it stays warm until evicted"""
+        session = self._sessions.get(conversation_id)
+        if session is None:
+            return
+        session.active = max(session.active - 1, 0)
+        session.last_used = time.monotonic()
+        session.size = session.chain.estimated_bytes()  # History has grown since it was added
+        self._enforce_limits()
+
+    def _expired(self, session: _Session, now: float) -> bool:
+        return session.active == 0 and 0 < self.idle_seconds < now - session.last_used
+
+    def _evict(self, conversation_id: str, reason: str) -> None:
+        del self._sessions[conversation_id]
+        self.evictions += 1
+        logger.info(f"🏴‍☠️ Evicted chain session {conversation_id} ({reason})")
+
+    def _enforce_limits(self) -> None:
+        now = time.monotonic()
+        for conversation_id, session in list(self._sessions.items()):
+            if self._expired(session, now):
+                self._evict(conversation_id, "idle")
+
+        total = sum(session.size for session in self._sessions.values())
+        # Oldest first; sessions with an open socket are skipped
+        for conversation_id, session in list(self._sessions.items()):
+            if len(self._sessions) <= self.max_sessions and total <= self.max_bytes:
+                break
+            if session.active:
+                continue
+            total -= session.size
+            self._evict(conversation_id, "capacity")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "sessions": len(self._sessions),
+            "active": sum(1 for session in self._sessions.values() if session.active),
+            "bytes": sum(session.size for session in self._sessions.values()),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions
+        }
+
+    def start_background_sweep(self) -> None:
+        """Start the idle sweep loop (no-op if disabled or already running)"""
+        if self.idle_seconds <= 0 or self._sweep_task is not None:
+            return
+        self._sweep_task = asyncio.create_task(self._sweep_loop())
+
+    async def stop_background_sweep(self) -> None:
+        if self._sweep_task is None:
+            return
+        self._sweep_task.cancel()
+        try:
+            await self._sweep_task
+        except asyncio.CancelledError:
+            pass
+        self._sweep_task = None
+
+    async def _sweep_loop(self) -> None:
+        while True:
+            await asyncio.sleep(min(self.idle_seconds, 60.0))
+            self._enforce_limits()
+
+# Single instance, shared by every websocket!
+chain_sessions = ChainSessionRegistry()
@@ -0,0 +1,156 @@
+import asyncio
+import logging
+import os
+import time
+import weakref
+from typing import Dict, Any, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_COALESCE_MS = 20.0
+DEFAULT_COALESCE_BYTES = 512
+DEFAULT_QUEUE_SIZE = 64
+
+_CLOSE = object()
+
+# Every open writer, for per-session queue depth reporting
+live_writers: "weakref.WeakSet[WebSocketStreamWriter]" = weakref.WeakSet()
+
+
+class WebSocketStreamWriter:
+    """
+    Sends a socket's messages from one background task, coalescing token chunks.
+
+    The first content chunk of a turn goes out on its own straight away, so
+    time to first token doesn't move. After that, chunks that arrive within
+    coalesce_ms of each other are merged into one frame of up to
+    coalesce_bytes - or more, when a slow client has let chunks pile up.
+    The queue between the LLM stream and the socket is bounded, so a client
+    that can't keep up pauses the stream instead of buffering it in memory.
+    Every message for the socket goes through send() to keep them in order.
+    """
+
+    def __init__(
+        self,
+        websocket,
+        session_id: Optional[str] = None,
+        coalesce_ms: Optional[float] = None,
+        coalesce_bytes: Optional[int] = None,
+        max_queue: Optional[int] = None
+    ):
+        self.websocket = websocket
+        self.session_id = session_id or f"socket-{id(websocket):x}"
+        self.coalesce_seconds = (coalesce_ms if coalesce_ms is not None else float(
+            os.environ.get("STREAM_COALESCE_MS", DEFAULT_COALESCE_MS))) / 1000
+        self.coalesce_bytes = coalesce_bytes if coalesce_bytes is not None else int(
+            os.environ.get("STREAM_COALESCE_BYTES", DEFAULT_COALESCE_BYTES))
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue if max_queue is not None else int(
+            os.environ.get("STREAM_QUEUE_SIZE", DEFAULT_QUEUE_SIZE)))
+        self._turn_started = False  # A content chunk has been sent since the last non-content message
+        self._error: Optional[BaseException] = None
+        self._sender = asyncio.get_running_loop().create_task(self._send_loop())
+        self.frames = 0
+        self.chunks = 0
+        self.max_depth = 0
+        live_writers.add(self)
+
+    @property
+    def depth(self) -> int:
+        return self._queue.qsize()
+
+    async def send(self, message: Dict[str, Any]) -> None:
+        """Queue a message - waits while the queue is full, raises if the socket has failed"""
+        if self._error is not None:
+            raise self._error
+        await self._queue.put(message)
+        self.max_depth = max(self.max_depth, self._queue.qsize())
+
+    async def close(self, timeout: float = 5.0) -> None:
+        """Send whatever is queued, then stop the sender - gives up after timeout on a stalled socket"""
+        live_writers.discard(self)
+        if self._sender.done():
+            return
+        try:
+            await asyncio.wait_for(self._drain(), timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Stream writer for {self.session_id} didn't drain in {timeout:g}s - dropping {self.depth} messages")
+            self._sender.cancel()
+
+    async def _drain(self) -> None:
+        await self._queue.put(_CLOSE)
+        await asyncio.wait({self._sender})
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "session_id": self.session_id,
+            "depth": self.depth,
+            "max_depth": self.max_depth,
+            "frames": self.frames,
+            "chunks": self.chunks
+        }
+
+    async def _send_loop(self) -> None:
+        pending: Any = None  # An item read past the end of a coalesced frame
+        try:
+            while True:
+                item = pending if pending is not None else await self._queue.get()
+                pending = None
+                if item is _CLOSE:
+                    return
+
+                if not _is_content(item):
+                    self._turn_started = False
+                    await self._send_frame(item)
+                    continue
+
+                self.chunks += 1
+                if not self._turn_started:
+                    # First token of the turn - never held back
+                    self._turn_started = True
+                    await self._send_frame(item)
+                    continue
+
+                parts = [item["data"]]
+                size = len(item["data"])
+                deadline = time.monotonic() + self.coalesce_seconds
+                while True:
+                    if self._queue.empty():
+                        # Nothing backed up - wait out the window only while the frame is small
+                        remaining = deadline - time.monotonic()
+                        if size >= self.coalesce_bytes or remaining <= 0:
+                            break
+                        try:
+                            next_item = await asyncio.wait_for(self._queue.get(), timeout=remaining)
+                        except asyncio.TimeoutError:
+                            break
+                    else:
+                        # Backlog from a slow client - merge everything already queued
+                        next_item = self._queue.get_nowait()
+                    if not _is_content(next_item):
+                        pending = next_item
+                        break
+                    self.chunks += 1
+                    parts.append(next_item["data"])
+                    size += len(next_item["data"])
+
+                await self._send_frame({"type": "content", "data": "".join(parts)})
+
+        except Exception as e:
+            self._error = e
+            logger.info(f"Stream writer for {self.session_id} stopped: {str(e)}")
+            # Unblock a producer waiting on a full queue - it sees the error on its next send
+            while not self._queue.empty():
+                self._queue.get_nowait()
+
+    async def _send_frame(self, message: Dict[str, Any]) -> None:
+        await self.websocket.send_json(message)
+        self.frames += 1
+
+
+def _is_content(item: Any) -> bool:
+    return isinstance(item, dict) and item.get("type") == "content" and isinstance(item.get("data"), str)
+
+
+def send_queue_stats() -> List[Dict[str, Any]]:
+    """Queue depth and frame counts for every open socket"""
+    return [writer.stats() for writer in list(live_writers)]
@@ -0,0 +1,206 @@
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Tuple
+import httpx
+from dotenv import load_dotenv
+from app.core.metrics import SEARCH_CACHE, SEARCH_SECONDS
+from app.core.utils.single_flight import SingleFlight
+
+# Same .env the chain and Supabase client read
+backend_dir = Path(__file__).parent.parent.parent.parent
+load_dotenv(dotenv_path=backend_dir / '.env')
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SERPER_URL = "https://google.serper.dev/search"
+
+
+def normalize_query(query: str) -> str:
+    """Cache key for a query - case and whitespace don't change the search"""
+    return " ".join(query.lower().split())
+
+
+def parse_serper_results(results: Dict[str, Any], k: int = 10) -> str:
+    """Flatten a Serper response into snippets, the same way GoogleSerperAPIWrapper.run did"""
+    answer_box = results.get("answerBox") or {}
+    if answer_box.get("answer"):
+        return answer_box["answer"]
+    if answer_box.get("snippet"):
+        return answer_box["snippet"].replace("\n", " ")
+    if answer_box.get("snippetHighlighted"):
+        return " ".join(answer_box["snippetHighlighted"])
+
+    snippets: List[str] = []
+    kg = results.get("knowledgeGraph") or {}
+    if kg:
+        title = kg.get("title")
+        if kg.get("type"):
+            snippets.append(f"{title}: {kg['type']}.")
+        if kg.get("description"):
+            snippets.append(kg["description"])
+        for attribute, value in kg.get("attributes", {}).items():
+            snippets.append(f"{title} {attribute}: {value}.")
+
+    for result in results.get("organic", [])[:k]:
+        if "snippet" in result:
+            snippets.append(result["snippet"])
+        for attribute, value in result.get("attributes", {}).items():
+            snippets.append(f"{attribute}: {value}.")
+
+    if not snippets:
+        return "No good Google Search Result was found"
+    return " ".join(snippets)
+
+
+class SerperSearchService:
+    """
+    Non-blocking Serper search with a hard deadline and an in-process TTL cache.
+
+    A search that misses its deadline keeps running in the background and lands
+    in the cache, so the next message about the same company gets it for free.
+    Point SERPER_URL at a local fake server to test without the real API.
+    """
+
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        url: Optional[str] = None,
+        deadline: Optional[float] = None,
+        cache_ttl: Optional[float] = None,
+        cache_size: int = 512,
+        request_timeout: float = 10.0,
+        refresh_ahead: float = 0.75
+    ):
+        self.api_key = api_key if api_key is not None else os.environ.get("SERPER_KEY")
+        self.url = url or os.environ.get("SERPER_URL", DEFAULT_SERPER_URL)
+        self.deadline = deadline if deadline is not None else float(os.environ.get("SERPER_DEADLINE_SECONDS", 2.5))
+        self.cache_ttl = cache_ttl if cache_ttl is not None else float(os.environ.get("SERPER_CACHE_TTL_SECONDS", 900))
+        self.cache_size = cache_size
+        self.request_timeout = request_timeout
+        self.refresh_ahead = refresh_ahead  # Fraction of the TTL after which prefetch re-searches
+        self._cache: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._flights = SingleFlight("serper_search")
+        self._client: Optional[httpx.AsyncClient] = None
+
+        if not self.api_key:
+            logger.warning("SERPER_KEY not found in environment variables - search functionality will be disabled")
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.api_key)
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(timeout=self.request_timeout)
+        return self._client
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def get_cached(self, query: str) -> Optional[str]:
+        key = normalize_query(query)
+        entry = self._cache.get(key)
+        if entry is None:
+            return None
+        expires_at, result = entry
+        if expires_at < time.monotonic():
+            del self._cache[key]
+            return None
+        self._cache.move_to_end(key)
+        return result
+
+    def _store(self, query: str, result: str) -> None:
+        key = normalize_query(query)
+        self._cache[key] = (time.monotonic() + self.cache_ttl, result)
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def _needs_refresh(self, query: str) -> bool:
+        entry = self._cache.get(normalize_query(query))
+        if entry is None:
+            return True
+        expires_at, _ = entry
+        remaining = expires_at - time.monotonic()
+        return remaining < self.cache_ttl * (1 - self.refresh_ahead)
+
+    def _start_fetch(self, query: str) -> asyncio.Task:
+        """One background fetch per normalized query - later callers join it"""
+        # RuntimeError outside a loop, before any coroutine exists
+        return self._flights.start(normalize_query(query), lambda: self._fetch(query))
+
+    def prefetch(self, query: str) -> None:
+        """
+        Start a search in the background if the cache has nothing fresh for it.
+
+        Called when company context loads and between turns, so the next
+        message finds results already cached (or at least already in flight).
+        """
+        if not self.enabled or not self._needs_refresh(query):
+            return
+        try:
+            self._start_fetch(query)
+        except RuntimeError:
+            # No running event loop - nothing to prefetch on
+            return
+
+    async def _fetch(self, query: str) -> str:
+        try:
+            response = await self._get_client().post(
+                self.url,
+                headers={"X-API-KEY": self.api_key, "Content-Type": "application/json"},
+                json={"q": query}
+            )
+            response.raise_for_status()
+        except Exception as e:
+            # Logged here rather than by search(), since a prefetch may have nobody waiting on it
+            logger.error(f"Search failed: {str(e)}")
+            raise
+        result = parse_serper_results(response.json())
+        self._store(query, result)
+        return result
+
+    async def search(self, query: str, deadline: Optional[float] = None) -> Optional[str]:
+        """
+        Search results for a query, or None if search is disabled, failed or
+        missed the deadline - callers build the prompt without it.
+        """
+        if not self.enabled:
+            return None
+
+        started = time.perf_counter()
+        cached = self.get_cached(query)
+        if cached is not None:
+            SEARCH_CACHE.inc(result="hit")
+            SEARCH_SECONDS.observe(time.perf_counter() - started, result="hit")
+            logger.info(f"🏴‍☠️ Search cache hit: {query}")
+            return cached
+        SEARCH_CACHE.inc(result="miss")
+
+        deadline = self.deadline if deadline is None else deadline
+        # Joins a prefetch already in flight for this query instead of searching twice
+        task = self._start_fetch(query)
+        result = "error"
+        try:
+            # shield() keeps the request alive past the deadline so it can still fill the cache
+            found = await asyncio.wait_for(asyncio.shield(task), timeout=deadline)
+            result = "fetched"
+            return found
+        except asyncio.TimeoutError:
+            result = "timeout"
+            logger.warning(f"Search missed its {deadline:.1f}s deadline: {query}")
+            return None
+        except Exception:
+            # Already logged by _fetch
+            return None
+        finally:
+            SEARCH_SECONDS.observe(time.perf_counter() - started, result=result)
+
+# Single instance, shared by every chain!
+serper_search = SerperSearchService()
@@ -0,0 +1,368 @@
+"""
+Local stand-ins for Supabase (PostgREST), Serper and Vertex AI, arrr!
+
+Run the two HTTP fakes in their own process so they don't share an event
+loop with the load driver or the backend:
+
+    python -m bench.fakes --companies 170 --serper-latency-ms 300
+
+The fake chat model is imported by bench.server and runs inside the backend.
+"""
+import argparse
+import asyncio
+import random
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from app.services.db.tuesday_columns import METRIC_FIELDS
+
+DEFAULT_POSTGREST_PORT = 8790
+DEFAULT_SERPER_PORT = 8791
+
+# Rough ranges per metric, so summaries and top-performer lists look like the real thing
+METRIC_RANGES = {
+    'current_stock_price': (5, 900),
+    'ytd_return_percent': (-60, 150),
+    'market_cap_millions': (300, 3_000_000),
+    'rule_of_40_score': (-30, 90),
+    'ebitda_margin_percent': (-40, 60),
+    'return_on_invested_capital': (-20, 45),
+    'revenue_5yr_growth_rate': (-10, 60),
+    'sales_yoy_growth_percent': (-25, 80),
+    'projected_3yr_sales_growth': (-5, 50),
+    'capex_intensity_ratio': (0, 35),
+    'rd_intensity_percent': (0, 30),
+    'annual_revenue_millions': (50, 600_000),
+    'ghg_emissions_per_revenue': (0, 900),
+    'social_responsibility_score': (0, 100),
+}
+
+_WORDS = ("Apex", "Blue", "Harbor", "Iron", "Nova", "Quantum", "Silver", "Summit", "Vertex", "Zenith")
+_KINDS = ("Systems", "Holdings", "Therapeutics", "Energy", "Semiconductor", "Software", "Logistics", "Foods")
+
+
+def _ticker(i: int) -> str:
+    letters = ""
+    i += 26 * 26  # Three letters minimum, so synthetic tickers don't look like real two-letter ones
+    while i:
+        i, r = divmod(i, 26)
+        letters = chr(ord("A") + r) + letters
+    return letters
+
+
+def synthetic_tuesday_dataset(companies: int, seed: int = 7, missing_rate: float = 0.05) -> List[Dict[str, Any]]:
+    """N tuesday_dataset rows - metrics as text, like Supabase stores them, with some blanks"""
+    rng = random.Random(seed)
+    rows = []
+    for i in range(companies):
+        row = {
+            "stock_ticker": _ticker(i),
+            "company_name": f"{rng.choice(_WORDS)} {rng.choice(_KINDS)} {i} Inc",
+        }
+        for field in METRIC_FIELDS:
+            low, high = METRIC_RANGES.get(field, (0, 100))
+            row[field] = None if rng.random() < missing_rate else f"{rng.uniform(low, high):.2f}"
+        rows.append(row)
+    return rows
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _split_terms(text: str) -> List[str]:
+    """Split a PostgREST logic list on its top-level commas - quotes and parentheses keep theirs"""
+    terms, depth, quoted, start = [], 0, False, 0
+    for i, char in enumerate(text):
+        if char == '"':
+            quoted = not quoted
+        elif not quoted and char == "(":
+            depth += 1
+        elif not quoted and char == ")":
+            depth -= 1
+        elif not quoted and depth == 0 and char == ",":
+            terms.append(text[start:i])
+            start = i + 1
+    terms.append(text[start:])
+    return terms
+
+
+def _matches(row: Dict[str, Any], column: str, op: str, operand: str) -> bool:
+    operand = operand.strip('"')
+    if op == "eq":
+        return str(row.get(column)) == operand
+    if op == "lt":
+        return row.get(column) is not None and str(row.get(column)) < operand
+    return True
+
+
+def _matches_logic(row: Dict[str, Any], mode: str, text: str) -> bool:
+    """or=(...) / and(...) filters, as the keyset pagination query uses them"""
+    results = []
+    for term in _split_terms(text):
+        if term.startswith(("and(", "or(")):
+            inner_mode, _, inner = term.partition("(")
+            results.append(_matches_logic(row, inner_mode, inner[:-1]))
+        else:
+            column, op, operand = term.split(".", 2)
+            results.append(_matches(row, column, op, operand))
+    return any(results) if mode == "or" else all(results)
+
+
+def _error(status: int, code: str, message: str) -> JSONResponse:
+    # postgrest-py needs every key present to raise a proper APIError
+    return JSONResponse({"code": code, "message": message, "hint": None, "details": None}, status_code=status)
+
+
+def create_postgrest_app(companies: int = 170, seed: int = 7, latency_ms: float = 0.0) -> FastAPI:
+    """
+    In-memory PostgREST with just the tables, filters and RPCs the backend uses.
+
+    Supports eq./lt. filters (and or=/and() around them), order, limit and select column lists - enough
+    for every query in app/services/db, not a general implementation. Every
+    request waits latency_ms first; app.state tracks how many are in flight.
+    """
+    app = FastAPI()
+    app.state.in_flight = 0
+    app.state.max_in_flight = 0
+    tables: Dict[str, List[Dict[str, Any]]] = {
+        "tuesday_dataset": synthetic_tuesday_dataset(companies, seed),
+        "conversations": [],
+        "company_analysis": [],
+        "messages": [],
+    }
+    next_message_id = 1
+    # Lookups the RPCs and the overview view need, kept so the fake stays O(1) per row under load
+    tickers_by_name = {row["company_name"].lower(): row["stock_ticker"] for row in tables["tuesday_dataset"]}
+    conversations_by_id: Dict[str, Dict[str, Any]] = {}
+    companies_by_conversation: Dict[str, Dict[str, Any]] = {}
+
+    def company_for(conversation_id: str) -> Optional[Dict[str, Any]]:
+        return companies_by_conversation.get(conversation_id)
+
+    def ticker_for(name: str) -> Optional[str]:
+        return tickers_by_name.get(name.lower())
+
+    def insert(table: str, row: Dict[str, Any]) -> Dict[str, Any]:
+        nonlocal next_message_id
+        row = dict(row)
+        if table == "messages":
+            row.setdefault("id", next_message_id)
+            next_message_id += 1
+        else:
+            row.setdefault("id", str(uuid.uuid4()))
+        row.setdefault("created_at", _now())
+        tables[table].append(row)
+        if table == "conversations":
+            conversations_by_id[row["id"]] = row
+        elif table == "company_analysis":
+            companies_by_conversation.setdefault(row["conversation_id"], row)
+        return row
+
+    def create_company_conversation(company_name: str, conversation_name: str) -> Dict[str, Any]:
+        conversation = insert("conversations", {"name": conversation_name})
+        company = insert("company_analysis", {"name": company_name, "conversation_id": conversation["id"]})
+        return {"conversation": conversation, "company": company}
+
+    @app.middleware("http")
+    async def track_in_flight(request: Request, call_next):
+        app.state.in_flight += 1
+        app.state.max_in_flight = max(app.state.max_in_flight, app.state.in_flight)
+        try:
+            if latency_ms:
+                await asyncio.sleep(latency_ms / 1000)
+            return await call_next(request)
+        finally:
+            app.state.in_flight -= 1
+
+    def overview_rows() -> List[Dict[str, Any]]:
+        rows = []
+        for conversation in tables["conversations"]:
+            company = company_for(conversation["id"]) or {}
+            rows.append({
+                **conversation,
+                "company_id": company.get("id"),
+                "company_name": company.get("name"),
+                "tuesday_ticker": ticker_for(company["name"]) if company else None,
+            })
+        return rows
+
+    @app.get("/rest/v1/{table}")
+    async def select(table: str, request: Request):
+        if table == "conversation_overview":
+            rows = overview_rows()
+        elif table in tables:
+            rows = tables[table]
+        else:
+            return _error(404, "PGRST205", f"Could not find the table 'public.{table}'")
+
+        for key, value in request.query_params.multi_items():
+            if key in ("select", "order", "limit", "offset"):
+                continue
+            if key == "or":
+                rows = [row for row in rows if _matches_logic(row, "or", value[1:-1])]
+                continue
+            op, _, operand = value.partition(".")
+            rows = [row for row in rows if _matches(row, key, op, operand)]
+
+        order = request.query_params.get("order")
+        if order:
+            for part in reversed(order.split(",")):
+                column, _, direction = part.partition(".")
+                rows = sorted(rows, key=lambda row: str(row.get(column) or ""), reverse=direction.startswith("desc"))
+        if "limit" in request.query_params:
+            rows = rows[:int(request.query_params["limit"])]
+
+        columns = request.query_params.get("select", "*")
+        if columns != "*":
+            names = [column.strip() for column in columns.split(",")]
+            rows = [{name: row.get(name) for name in names} for row in rows]
+        return JSONResponse(rows)
+
+    @app.post("/rest/v1/rpc/{function}")
+    async def rpc(function: str, request: Request):
+        params = await request.json()
+        if function == "create_company_conversation":
+            return JSONResponse(create_company_conversation(params["p_company_name"], params["p_conversation_name"]))
+        if function == "create_company_conversations":
+            return JSONResponse([
+                create_company_conversation(company_name, conversation_name)
+                for company_name, conversation_name in zip(params["p_company_names"], params["p_conversation_names"])
+            ])
+        if function == "get_conversation_with_company":
+            conversation = conversations_by_id.get(params["p_conversation_id"])
+            if conversation is None:
+                return JSONResponse(None)
+            company = company_for(conversation["id"])
+            return JSONResponse({
+                "conversation": conversation,
+                "company": company,
+                "tuesday_ticker": ticker_for(company["name"]) if company else None,
+            })
+        return _error(404, "PGRST202", f"Could not find the function public.{function}")
+
+    @app.post("/rest/v1/{table}")
+    async def create(table: str, request: Request):
+        if table not in tables:
+            return _error(404, "PGRST205", f"Could not find the table 'public.{table}'")
+        body = await request.json()
+        rows = [insert(table, row) for row in (body if isinstance(body, list) else [body])]
+        if "return=minimal" in request.headers.get("prefer", ""):
+            return JSONResponse(None, status_code=201)
+        return JSONResponse(rows, status_code=201)
+
+    @app.get("/bench/companies")
+    async def companies_list():
+        """Names and tickers for the load driver to open conversations with"""
+        return [{"ticker": row["stock_ticker"], "name": row["company_name"]} for row in tables["tuesday_dataset"]]
+
+    return app
+
+
+def create_serper_app(latency_ms: float = 300.0, jitter_ms: float = 100.0) -> FastAPI:
+    """Serper /search that answers with a few organic snippets after latency_ms (+/- jitter)"""
+    app = FastAPI()
+    app.state.requests = 0
+
+    @app.post("/search")
+    async def search(request: Request):
+        body = await request.json()
+        app.state.requests += 1
+        delay = max(latency_ms + random.uniform(-jitter_ms, jitter_ms), 0.0) / 1000
+        await asyncio.sleep(delay)
+        query = body.get("q", "")
+        return {
+            "searchParameters": {"q": query},
+            "organic": [
+                {"title": f"{query} result {i}", "snippet": f"Recent coverage of {query}, item {i}: guidance, margins and outlook."}
+                for i in range(5)
+            ],
+        }
+
+    @app.get("/stats")
+    async def stats():
+        return {"requests": app.state.requests}
+
+    return app
+
+
+class FakeStreamingChatModel(BaseChatModel):
+    """
+    Chat model that streams a canned answer at a fixed token rate.
+
+    first_token_ms is the model's own time to first token; after that
+    tokens_per_second paces the rest. Usage metadata is reported on the last
+    chunk, like Vertex does, so per-turn token logging works unchanged.
+    """
+
+    tokens_per_second: float = 60.0
+    first_token_ms: float = 400.0
+    response_tokens: int = 250
+
+    @property
+    def _llm_type(self) -> str:
+        return "bench-fake-streaming"
+
+    def _tokens(self) -> Iterator[str]:
+        words = ("The", " company", " shows", " solid", " margins", ",", " strong", " growth", " and", " a", " fair", " valuation", ".")
+        for i in range(self.response_tokens):
+            yield words[i % len(words)]
+
+    def _usage(self, messages: List[BaseMessage]) -> Dict[str, int]:
+        input_tokens = sum(len(str(message.content)) for message in messages) // 4
+        return {"input_tokens": input_tokens, "output_tokens": self.response_tokens,
+                "total_tokens": input_tokens + self.response_tokens}
+
+    def _generate(self, messages: List[BaseMessage], stop=None, run_manager=None, **kwargs) -> ChatResult:
+        time.sleep(self.first_token_ms / 1000 + self.response_tokens / self.tokens_per_second)
+        message = AIMessage(content="".join(self._tokens()), usage_metadata=self._usage(messages))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _astream(self, messages: List[BaseMessage], stop=None, run_manager=None,
+                       **kwargs) -> AsyncIterator[ChatGenerationChunk]:
+        await asyncio.sleep(self.first_token_ms / 1000)
+        interval = 1 / self.tokens_per_second if self.tokens_per_second > 0 else 0.0
+        started = time.monotonic()
+        for i, token in enumerate(self._tokens()):
+            # Paced against the start, not the last sleep, so the rate holds under load
+            delay = started + i * interval - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+        yield ChatGenerationChunk(message=AIMessageChunk(
+            content="", usage_metadata=self._usage(messages), response_metadata={"finish_reason": "STOP"}))
+
+
+async def serve_fakes(host: str, postgrest_port: int, serper_port: int, companies: int,
+                      serper_latency_ms: float, seed: int = 7) -> None:
+    servers = [
+        uvicorn.Server(uvicorn.Config(create_postgrest_app(companies, seed), host=host, port=postgrest_port,
+                                      log_level="warning", access_log=False)),
+        uvicorn.Server(uvicorn.Config(create_serper_app(serper_latency_ms), host=host, port=serper_port,
+                                      log_level="warning", access_log=False)),
+    ]
+    await asyncio.gather(*(server.serve() for server in servers))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Fake PostgREST and Serper servers for benchmarks")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--postgrest-port", type=int, default=DEFAULT_POSTGREST_PORT)
+    parser.add_argument("--serper-port", type=int, default=DEFAULT_SERPER_PORT)
+    parser.add_argument("--companies", type=int, default=170)
+    parser.add_argument("--serper-latency-ms", type=float, default=300.0)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    asyncio.run(serve_fakes(args.host, args.postgrest_port, args.serper_port, args.companies,
+                            args.serper_latency_ms, args.seed))
+
+
+if __name__ == "__main__":
+    main()
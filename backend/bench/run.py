@@ -0,0 +1,430 @@
+"""
+Offline load test for the backend - no Supabase, Serper or Vertex needed, arrr!
+
+Starts bench.fakes (PostgREST + Serper) and bench.server (the real app with a
+fake streaming model) as subprocesses, opens hundreds of /ws/chat sessions
+while REST traffic runs alongside, and writes one JSON report:
+
+    cd backend
+    python -m bench.run --sessions 300 --turns 2 --companies 170
+    python -m bench.run --sessions 300 --compare bench/results/<earlier>.json
+
+Reported: connections/sec, p50/p95/p99 time to first token and turn latency
+(measured at the client), REST latency per route, and backend RSS per open
+session. Reports carry the git commit, so runs can be compared across commits.
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+import httpx
+import websockets
+
+BENCH_DIR = Path(__file__).parent
+BACKEND_DIR = BENCH_DIR.parent
+RESULTS_DIR = BENCH_DIR / "results"
+
+QUESTIONS = (
+    "Give me an overview of this company",
+    "How does its profitability compare to peers?",
+    "How is its ESG profile?",
+    "What are the main risks?",
+)
+
+# Headline numbers shown by --compare, and whether lower is better
+COMPARE_KEYS = (
+    ("connections.per_second", False),
+    ("ttft_ms.p50", True),
+    ("ttft_ms.p95", True),
+    ("ttft_ms.p99", True),
+    ("turn_ms.p50", True),
+    ("turn_ms.p95", True),
+    ("turn_ms.p99", True),
+    ("rest.all.p95", True),
+    ("memory.rss_per_session_kb", True),
+)
+
+
+def percentiles(samples: List[float]) -> Dict[str, Optional[float]]:
+    """p50/p95/p99 (nearest rank), mean and max of a list of milliseconds"""
+    if not samples:
+        return {"count": 0, "p50": None, "p95": None, "p99": None, "mean": None, "max": None}
+    ordered = sorted(samples)
+
+    def rank(p: float) -> float:
+        return round(ordered[min(max(math.ceil(p / 100 * len(ordered)) - 1, 0), len(ordered) - 1)], 2)
+
+    return {
+        "count": len(ordered),
+        "p50": rank(50),
+        "p95": rank(95),
+        "p99": rank(99),
+        "mean": round(sum(ordered) / len(ordered), 2),
+        "max": round(ordered[-1], 2),
+    }
+
+
+def rss_kb(pid: int) -> Optional[int]:
+    """Resident set size of a process from /proc - None where that isn't available"""
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        return None
+    return None
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def wait_until_up(url: str, timeout: float = 60.0) -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while True:
+            try:
+                if (await client.get(url, timeout=2.0)).status_code < 500:
+                    return
+            except httpx.HTTPError:
+                pass
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"{url} didn't come up within {timeout:g}s")
+            await asyncio.sleep(0.2)
+
+
+class Session:
+    """One simulated user: a socket on one conversation, sending turns back to back"""
+
+    def __init__(self, base_ws: str, conversation_id: str):
+        self.url = f"{base_ws}/ws/chat?conversation_id={conversation_id}"
+        self.socket = None
+        self.connect_ms: Optional[float] = None
+        self.ttft_ms: List[float] = []
+        self.turn_ms: List[float] = []
+        self.errors: List[str] = []
+
+    async def connect(self) -> None:
+        started = time.perf_counter()
+        try:
+            self.socket = await websockets.connect(self.url, max_size=None, open_timeout=30)
+            status = json.loads(await self.socket.recv())
+            if status.get("type") != "connection_status":
+                raise RuntimeError(f"unexpected first message {status.get('type')}")
+            self.connect_ms = (time.perf_counter() - started) * 1000
+        except Exception as e:
+            self.errors.append(f"connect: {e!r}")
+
+    async def turn(self, message: str, timeout: float) -> None:
+        if self.socket is None:
+            return
+        started = time.perf_counter()
+        first = None
+        try:
+            await self.socket.send(json.dumps({"type": "message", "message": message}))
+            while True:
+                reply = json.loads(await asyncio.wait_for(self.socket.recv(), timeout=timeout))
+                kind = reply.get("type")
+                if kind == "content" and first is None:
+                    first = time.perf_counter()
+                elif kind == "complete":
+                    break
+                elif kind == "error":
+                    raise RuntimeError(f"server error: {reply.get('data')}")
+            finished = time.perf_counter()
+            self.ttft_ms.append(((first or finished) - started) * 1000)
+            self.turn_ms.append((finished - started) * 1000)
+        except Exception as e:
+            self.errors.append(f"turn: {e!r}")
+
+    async def close(self) -> None:
+        if self.socket is not None:
+            try:
+                await self.socket.close()
+            except Exception:
+                pass
+
+
+async def rest_traffic(base_url: str, stop: asyncio.Event, company_names: List[str],
+                       rate: float, results: Dict[str, List[float]], errors: List[str]) -> None:
+    """Conversation list, company search and health checks at about `rate` requests/sec"""
+    routes = [
+        lambda i: "/conversations?limit=20",
+        lambda i: f"/tuesday/companies/search?q={company_names[i % len(company_names)].split()[0]}",
+        lambda i: "/health",
+    ]
+    interval = 1 / rate if rate > 0 else 0
+    async with httpx.AsyncClient(base_url=base_url, timeout=30.0) as client:
+        i = 0
+        in_flight = set()
+
+        async def request(path: str, route: str) -> None:
+            started = time.perf_counter()
+            try:
+                response = await client.get(path)
+                if response.status_code >= 400:
+                    errors.append(f"{route}: HTTP {response.status_code}")
+                    return
+                results.setdefault(route, []).append((time.perf_counter() - started) * 1000)
+            except httpx.HTTPError as e:
+                errors.append(f"{route}: {e!r}")
+
+        while not stop.is_set() and rate > 0:
+            path = routes[i % len(routes)](i)
+            task = asyncio.create_task(request(path, path.split("?")[0]))
+            in_flight.add(task)
+            task.add_done_callback(in_flight.discard)
+            i += 1
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=interval)
+            except asyncio.TimeoutError:
+                pass
+        if in_flight:
+            await asyncio.gather(*in_flight)
+
+
+async def create_conversations(base_url: str, company_names: List[str]) -> List[Optional[str]]:
+    """
+    One conversation per session through the bulk endpoint, like the app's batch import.
+
+    The endpoint rejects a name repeated within one request, so sessions that
+    share a company are created in separate batches. Failed items come back as None.
+    """
+    conversation_ids: List[Optional[str]] = [None] * len(company_names)
+    batches: List[List[int]] = []
+    for i, name in enumerate(company_names):
+        batch = next((batch for batch in batches
+                      if len(batch) < 500 and all(company_names[j] != name for j in batch)), None)
+        if batch is None:
+            batch = []
+            batches.append(batch)
+        batch.append(i)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=60.0) as client:
+        for batch in batches:
+            response = await client.post("/company/process-companies",
+                                         json={"company_names": [company_names[i] for i in batch]})
+            response.raise_for_status()
+            for i, result in zip(batch, response.json()["results"]):
+                if result["success"]:
+                    conversation_ids[i] = result["conversation_id"]
+    return conversation_ids
+
+
+async def run_load(args: argparse.Namespace, server_pid: int, base_url: str, fakes_url: str) -> Dict[str, Any]:
+    base_ws = base_url.replace("http://", "ws://")
+    async with httpx.AsyncClient() as client:
+        companies = (await client.get(f"{fakes_url}/bench/companies")).json()
+    # Sessions spread over fewer companies than sessions, so some share a company like real traffic does
+    company_names = [companies[i % min(len(companies), args.distinct_companies)]["name"]
+                     for i in range(args.sessions)]
+
+    conversation_ids = [conversation_id for conversation_id in await create_conversations(base_url, company_names)
+                        if conversation_id]
+    if len(conversation_ids) < args.sessions:
+        raise RuntimeError(f"Only {len(conversation_ids)} of {args.sessions} conversations were created")
+
+    rss_before = rss_kb(server_pid)
+    sessions = [Session(base_ws, conversation_id) for conversation_id in conversation_ids]
+
+    # Connect phase - at most connect_concurrency handshakes in flight
+    gate = asyncio.Semaphore(args.connect_concurrency)
+
+    async def connect(session: Session) -> None:
+        async with gate:
+            await session.connect()
+
+    connect_started = time.perf_counter()
+    await asyncio.gather(*(connect(session) for session in sessions))
+    connect_seconds = time.perf_counter() - connect_started
+    connected = [session for session in sessions if session.connect_ms is not None]
+
+    # Chat phase - every session sends its turns back to back, REST traffic alongside
+    stop_rest = asyncio.Event()
+    rest_ms: Dict[str, List[float]] = {}
+    rest_errors: List[str] = []
+    rest_task = asyncio.create_task(rest_traffic(base_url, stop_rest, company_names, args.rest_rate,
+                                                 rest_ms, rest_errors))
+
+    async def chat(session: Session, offset: int) -> None:
+        for turn in range(args.turns):
+            await session.turn(QUESTIONS[(offset + turn) % len(QUESTIONS)], args.turn_timeout)
+
+    chat_started = time.perf_counter()
+    await asyncio.gather(*(chat(session, i) for i, session in enumerate(connected)))
+    chat_seconds = time.perf_counter() - chat_started
+
+    # Every session is still open and has history - that's the memory we're after
+    rss_after = rss_kb(server_pid)
+    stop_rest.set()
+    await rest_task
+    async with httpx.AsyncClient() as client:
+        scrape = (await client.get(f"{base_url}/metrics")).text
+    await asyncio.gather(*(session.close() for session in sessions))
+
+    errors = [error for session in sessions for error in session.errors] + rest_errors
+    ttft = [ms for session in connected for ms in session.ttft_ms]
+    turns = [ms for session in connected for ms in session.turn_ms]
+    all_rest = [ms for samples in rest_ms.values() for ms in samples]
+    rss_delta = rss_after - rss_before if rss_before is not None and rss_after is not None else None
+
+    return {
+        "connections": {
+            "attempted": len(sessions),
+            "connected": len(connected),
+            "seconds": round(connect_seconds, 3),
+            "per_second": round(len(connected) / connect_seconds, 2) if connect_seconds else None,
+            "connect_ms": percentiles([session.connect_ms for session in connected]),
+        },
+        "ttft_ms": percentiles(ttft),
+        "turn_ms": percentiles(turns),
+        "turns": {
+            "completed": len(turns),
+            "seconds": round(chat_seconds, 3),
+            "per_second": round(len(turns) / chat_seconds, 2) if chat_seconds else None,
+        },
+        "rest": {"all": percentiles(all_rest), **{route: percentiles(samples) for route, samples in rest_ms.items()}},
+        "memory": {
+            "rss_before_kb": rss_before,
+            "rss_after_kb": rss_after,
+            "rss_per_session_kb": round(rss_delta / len(connected), 2) if rss_delta is not None and connected else None,
+        },
+        "server_metrics": {
+            line.split()[0]: float(line.split()[1]) for line in scrape.splitlines()
+            if line.startswith(("cara_live_chains", "cara_active_websockets", "cara_tuesday_dataset_version"))
+        },
+        "errors": {"count": len(errors), "sample": errors[:10]},
+    }
+
+
+def _lookup(report: Dict[str, Any], dotted: str) -> Optional[float]:
+    value: Any = report
+    for part in dotted.split("."):
+        if not isinstance(value, dict) or part not in value:
+            return None
+        value = value[part]
+    return value if isinstance(value, (int, float)) else None
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any]) -> str:
+    """Side-by-side headline numbers - positive change% is worse"""
+    lines = [f"{'metric':<30}{'baseline':>14}{'current':>14}{'change':>10}",
+             f"{'':<30}{baseline.get('commit') or '?':>14}{current.get('commit') or '?':>14}"]
+    for key, lower_is_better in COMPARE_KEYS:
+        before, after = _lookup(baseline, key), _lookup(current, key)
+        if before is None or after is None:
+            lines.append(f"{key:<30}{str(before):>14}{str(after):>14}{'':>10}")
+            continue
+        change = (after - before) / before * 100 if before else 0.0
+        worse = change if lower_is_better else -change
+        lines.append(f"{key:<30}{before:>14.2f}{after:>14.2f}{worse:>+9.1f}%")
+    return "\n".join(lines)
+
+
+def start_process(module: str, arguments: List[str], env: Dict[str, str], log_path: Path) -> subprocess.Popen:
+    log = open(log_path, "ab")
+    return subprocess.Popen([sys.executable, "-m", module, *arguments], cwd=BACKEND_DIR, env=env,
+                            stdout=log, stderr=subprocess.STDOUT)
+
+
+async def main_async(args: argparse.Namespace) -> Dict[str, Any]:
+    host = "127.0.0.1"
+    postgrest_port, serper_port, server_port = args.base_port, args.base_port + 1, args.base_port + 2
+    work_dir = Path(tempfile.mkdtemp(prefix="cara-bench-"))
+    env = {
+        **os.environ,
+        "SUPABASE_URL": f"http://{host}:{postgrest_port}",
+        "SUPABASE_KEY": "bench-" + "x" * 40,
+        "SERPER_URL": f"http://{host}:{serper_port}/search",
+        "SERPER_KEY": "bench",
+        "LOG_FILE": str(work_dir / "app.log"),
+    }
+    processes = [
+        start_process("bench.fakes", [
+            "--host", host, "--postgrest-port", str(postgrest_port), "--serper-port", str(serper_port),
+            "--companies", str(args.companies), "--serper-latency-ms", str(args.serper_latency_ms),
+        ], env, work_dir / "fakes.log"),
+    ]
+    try:
+        await wait_until_up(f"http://{host}:{postgrest_port}/bench/companies")
+        await wait_until_up(f"http://{host}:{serper_port}/stats")
+        server = start_process("bench.server", [
+            "--host", host, "--port", str(server_port),
+            "--tokens-per-second", str(args.tokens_per_second),
+            "--first-token-ms", str(args.first_token_ms),
+            "--response-tokens", str(args.response_tokens),
+        ], env, work_dir / "server.log")
+        processes.append(server)
+        base_url = f"http://{host}:{server_port}"
+        await wait_until_up(f"{base_url}/health")
+
+        results = await run_load(args, server.pid, base_url, f"http://{host}:{postgrest_port}")
+        async with httpx.AsyncClient() as client:
+            results["serper_requests"] = (await client.get(f"http://{host}:{serper_port}/stats")).json()["requests"]
+    finally:
+        for process in reversed(processes):
+            process.terminate()
+        for process in processes:
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+    return {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "compare")},
+        "logs": str(work_dir),
+        **results,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Offline load test with fake Supabase, Serper and Vertex")
+    parser.add_argument("--sessions", type=int, default=200, help="Concurrent /ws/chat sessions")
+    parser.add_argument("--turns", type=int, default=2, help="Messages per session, sent back to back")
+    parser.add_argument("--companies", type=int, default=170, help="Rows in the fake tuesday_dataset")
+    parser.add_argument("--distinct-companies", type=int, default=50, help="Companies the sessions are spread over")
+    parser.add_argument("--connect-concurrency", type=int, default=50, help="Handshakes in flight at once")
+    parser.add_argument("--rest-rate", type=float, default=50.0, help="REST requests/sec during the chat phase")
+    parser.add_argument("--tokens-per-second", type=float, default=60.0, help="Fake model output rate")
+    parser.add_argument("--first-token-ms", type=float, default=400.0, help="Fake model time to first token")
+    parser.add_argument("--response-tokens", type=int, default=250, help="Fake model tokens per answer")
+    parser.add_argument("--serper-latency-ms", type=float, default=300.0, help="Fake Serper response time")
+    parser.add_argument("--turn-timeout", type=float, default=120.0, help="Seconds to wait for a reply")
+    parser.add_argument("--base-port", type=int, default=8790, help="Fakes and server use this port and the next two")
+    parser.add_argument("--output", type=Path, help="Report path (default bench/results/<commit>-<time>.json)")
+    parser.add_argument("--compare", type=Path, help="Earlier report to compare against")
+    args = parser.parse_args()
+
+    report = asyncio.run(main_async(args))
+
+    output = args.output or RESULTS_DIR / f"{report['commit'] or 'unknown'}-{datetime.now():%Y%m%d-%H%M%S}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2))
+
+    print(f"🏴‍☠️ {report['connections']['connected']}/{report['connections']['attempted']} sessions, "
+          f"{report['connections']['per_second']} connections/sec, {report['turns']['completed']} turns")
+    print(f"   TTFT ms  p50={report['ttft_ms']['p50']} p95={report['ttft_ms']['p95']} p99={report['ttft_ms']['p99']}")
+    print(f"   turn ms  p50={report['turn_ms']['p50']} p95={report['turn_ms']['p95']} p99={report['turn_ms']['p99']}")
+    print(f"   REST ms  p95={report['rest']['all']['p95']}   RSS/session={report['memory']['rss_per_session_kb']} KB")
+    print(f"   errors={report['errors']['count']}   report={output}")
+    if args.compare:
+        print(compare(report, json.loads(args.compare.read_text())))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+"""
+The real backend, with the Vertex chat model swapped for FakeStreamingChatModel.
+
+Everything else - Supabase client, Serper search, snapshot store, session
+registry, stream writer - is the production code path. Point SUPABASE_URL and
+SERPER_URL at bench.fakes first; bench.run does all of this for you.
+
+    python -m bench.server --port 8792 --tokens-per-second 60
+"""
+import argparse
+import uvicorn
+from bench.fakes import FakeStreamingChatModel
+
+
+def install_fake_model(model: FakeStreamingChatModel) -> None:
+    """Make the shared model pool hand out the fake model - no Google credentials needed"""
+    from app.services.llm.model_pool import chat_models
+
+    async def warm_up(*args, **kwargs) -> None:
+        return None
+
+    chat_models.configure(credentials=object(), project_id="bench")
+    chat_models.get = lambda *args, **kwargs: model
+    chat_models.warm_up = warm_up
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Backend with a fake streaming chat model")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8792)
+    parser.add_argument("--tokens-per-second", type=float, default=60.0)
+    parser.add_argument("--first-token-ms", type=float, default=400.0)
+    parser.add_argument("--response-tokens", type=int, default=250)
+    args = parser.parse_args()
+
+    install_fake_model(FakeStreamingChatModel(
+        tokens_per_second=args.tokens_per_second,
+        first_token_ms=args.first_token_ms,
+        response_tokens=args.response_tokens
+    ))
+    from app.main import app
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning", access_log=False)
+
+
+if __name__ == "__main__":
+    main()
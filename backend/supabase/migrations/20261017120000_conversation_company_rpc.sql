@@ -0,0 +1,119 @@
+-- Single-round-trip create and lookup for a conversation and its company row.
+-- Run with `supabase db push` (or paste into the SQL editor). The backend falls
+-- back to plain table queries until these functions exist.
+
+create index if not exists company_analysis_conversation_id_idx
+    on public.company_analysis (conversation_id);
+
+-- Best Tuesday dataset ticker for a company name: exact ticker, then exact
+-- name, then the shortest name starting with it ("Nvidia" -> NVIDIA CORP).
+-- The backend still refines the match against its in-memory name index.
+create or replace function public.tuesday_ticker_for(p_company_name text)
+returns text
+language sql
+stable
+as $$
+    select t.stock_ticker
+    from public.tuesday_dataset t
+    where upper(t.stock_ticker) = upper(btrim(p_company_name))
+       or lower(t.company_name) = lower(btrim(p_company_name))
+       or starts_with(lower(t.company_name), lower(btrim(p_company_name)) || ' ')
+    order by upper(t.stock_ticker) = upper(btrim(p_company_name)) desc,
+             lower(t.company_name) = lower(btrim(p_company_name)) desc,
+             length(t.company_name)
+    limit 1
+$$;
+
+-- Conversation + linked company row in one transaction - either both exist or neither does.
+create or replace function public.create_company_conversation(
+    p_company_name text,
+    p_conversation_name text
+)
+returns json
+language plpgsql
+as $$
+declare
+    v_conversation public.conversations;
+    v_company public.company_analysis;
+begin
+    insert into public.conversations (name)
+    values (p_conversation_name)
+    returning * into v_conversation;
+
+    insert into public.company_analysis (name, conversation_id)
+    values (btrim(p_company_name), v_conversation.id)
+    returning * into v_company;
+
+    return json_build_object(
+        'conversation', row_to_json(v_conversation),
+        'company', row_to_json(v_company)
+    );
+end;
+$$;
+
+-- Bulk version for onboarding: one call, one transaction, results in input order.
+create or replace function public.create_company_conversations(
+    p_company_names text[],
+    p_conversation_names text[]
+)
+returns json
+language plpgsql
+as $$
+declare
+    v_results json[] := '{}';
+begin
+    if coalesce(array_length(p_company_names, 1), 0) <> coalesce(array_length(p_conversation_names, 1), 0) then
+        raise exception 'p_company_names and p_conversation_names must be the same length';
+    end if;
+
+    for i in 1 .. coalesce(array_length(p_company_names, 1), 0) loop
+        v_results := v_results || public.create_company_conversation(p_company_names[i], p_conversation_names[i]);
+    end loop;
+
+    return array_to_json(v_results);
+end;
+$$;
+
+-- Conversation + company + Tuesday ticker match in one query, for reopening an analysis.
+create or replace function public.get_conversation_with_company(
+    p_conversation_id public.conversations.id%type
+)
+returns json
+language sql
+stable
+as $$
+    select json_build_object(
+        'conversation', row_to_json(c),
+        'company', row_to_json(ca),
+        'tuesday_ticker', public.tuesday_ticker_for(ca.name)
+    )
+    from public.conversations c
+    left join lateral (
+        select *
+        from public.company_analysis
+        where conversation_id = c.id
+        order by created_at
+        limit 1
+    ) ca on true
+    where c.id = p_conversation_id
+$$;
+
+-- Conversation list with the company attached, same keyset columns as conversations.
+create or replace view public.conversation_overview
+with (security_invoker = true)
+as
+    select
+        c.id,
+        c.name,
+        c.created_at,
+        ca.id as company_id,
+        ca.name as company_name,
+        public.tuesday_ticker_for(ca.name) as tuesday_ticker
+    from public.conversations c
+    left join lateral (
+        select id, name
+        from public.company_analysis
+        where conversation_id = c.id
+        order by created_at
+        limit 1
+    ) ca on true;
@@ -0,0 +1,13 @@
+-- Persisted chat history, written in batches by the backend's write-behind buffer.
+
+create table if not exists public.messages (
+    id bigint generated always as identity primary key,
+    conversation_id uuid not null references public.conversations (id) on delete cascade,
+    role text not null check (role in ('user', 'assistant')),
+    content text not null,
+    created_at timestamptz not null default now()
+);
+
+-- Reconnects read the newest N messages of one conversation
+create index if not exists messages_conversation_recent_idx
+    on public.messages (conversation_id, created_at desc, id desc);
@@ -0,0 +1,95 @@
+-- Store each company's Tuesday ticker match on company_analysis, so the
+-- conversation list reads a column instead of calling tuesday_ticker_for()
+-- (a scan of tuesday_dataset) for every row on the page.
+-- Run with `supabase db push` after 20261017120000_conversation_company_rpc.sql.
+
+-- tuesday_ticker_for() still runs once per new company row - index its lookups
+create index if not exists tuesday_dataset_upper_ticker_idx
+    on public.tuesday_dataset (upper(stock_ticker));
+create index if not exists tuesday_dataset_lower_name_idx
+    on public.tuesday_dataset (lower(company_name) text_pattern_ops);
+
+-- The prefix match as a range, so the text_pattern_ops index can serve it
+create or replace function public.tuesday_ticker_for(p_company_name text)
+returns text
+language sql
+stable
+as $$
+    select t.stock_ticker
+    from public.tuesday_dataset t
+    where upper(t.stock_ticker) = upper(btrim(p_company_name))
+       or lower(t.company_name) = lower(btrim(p_company_name))
+       or lower(t.company_name) like replace(replace(replace(lower(btrim(p_company_name)),
+              '\', '\\'), '%', '\%'), '_', '\_') || ' %'
+    order by upper(t.stock_ticker) = upper(btrim(p_company_name)) desc,
+             lower(t.company_name) = lower(btrim(p_company_name)) desc,
+             length(t.company_name)
+    limit 1
+$$;
+
+alter table public.company_analysis
+    add column if not exists tuesday_ticker text;
+
+-- Matched on insert and rename, by the RPCs and the backend's plain-insert fallback alike
+create or replace function public.company_analysis_match_ticker()
+returns trigger
+language plpgsql
+as $$
+begin
+    if tg_op = 'INSERT' or new.name is distinct from old.name then
+        new.tuesday_ticker := public.tuesday_ticker_for(new.name);
+    end if;
+    return new;
+end;
+$$;
+
+drop trigger if exists company_analysis_match_ticker on public.company_analysis;
+create trigger company_analysis_match_ticker
+    before insert or update of name on public.company_analysis
+    for each row execute function public.company_analysis_match_ticker();
+
+-- Existing rows. Re-run this after reloading tuesday_dataset to refresh the matches.
+update public.company_analysis
+set tuesday_ticker = public.tuesday_ticker_for(name);
+
+create or replace function public.get_conversation_with_company(
+    p_conversation_id public.conversations.id%type
+)
+returns json
+language sql
+stable
+as $$
+    select json_build_object(
+        'conversation', row_to_json(c),
+        'company', row_to_json(ca),
+        'tuesday_ticker', ca.tuesday_ticker
+    )
+    from public.conversations c
+    left join lateral (
+        select *
+        from public.company_analysis
+        where conversation_id = c.id
+        order by created_at
+        limit 1
+    ) ca on true
+    where c.id = p_conversation_id
+$$;
+
+create or replace view public.conversation_overview
+with (security_invoker = true)
+as
+    select
+        c.id,
+        c.name,
+        c.created_at,
+        ca.id as company_id,
+        ca.name as company_name,
+        ca.tuesday_ticker
+    from public.conversations c
+    left join lateral (
+        select id, name, tuesday_ticker
+        from public.company_analysis
+        where conversation_id = c.id
+        order by created_at
+        limit 1
+    ) ca on true;
@@ -0,0 +1,103 @@
+"""
+Shared fixtures - the backend runs against the local fakes from bench.fakes.
+
+    cd backend
+    pip install -r requirements-dev.txt
+    python -m pytest
+"""
+import os
+import socket
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Callable, Iterator
+import pytest
+import uvicorn
+from fastapi import FastAPI
+from bench.fakes import synthetic_tuesday_dataset
+
+# The module-level Supabase clients need credentials at import time; tests point their own clients at a fake
+os.environ.setdefault("SUPABASE_URL", "http://127.0.0.1:9")
+os.environ.setdefault("SUPABASE_KEY", "test")
+
+
+@pytest.fixture(scope="module")
+def tuesday_rows():
+    """300 synthetic companies with gaps and exact ties, behind a Bloomberg-style DESCRIPTION_ROW"""
+    rows = synthetic_tuesday_dataset(300, seed=11, missing_rate=0.15)
+    for source, copy in [(3, 40), (3, 41), (7, 120)]:
+        # Whole-row and single-metric duplicates, so distances and ranks both see ties
+        rows[copy].update({field: value for field, value in rows[source].items() if field not in ("stock_ticker", "company_name")})
+    for row in rows[200:260]:
+        row["rule_of_40_score"] = "25.00"
+    description = {field: "Description of the metric" for field in rows[0]}
+    description.update(stock_ticker="DESCRIPTION_ROW", company_name="Field descriptions")
+    return [description] + rows
+
+
+@pytest.fixture
+def tuesday_client(tuesday_rows, monkeypatch):
+    """The Tuesday router serving a snapshot of tuesday_rows, with main's APIError handling"""
+    from fastapi import Request
+    from fastapi.responses import JSONResponse
+    from fastapi.testclient import TestClient
+    from app.api.endpoints.tuesday import router
+    from app.core.supabase.errors import APIError
+    from app.services.db.tuesday_columns import TuesdayColumns
+    from app.services.db.tuesday_name_index import CompanyNameIndex
+    from app.services.db.tuesday_snapshot import TuesdaySnapshot, tuesday_snapshot_store
+
+    columns = TuesdayColumns(tuesday_rows)
+    snapshot = TuesdaySnapshot(version=1_000_000, companies=columns.rows, columns=columns,
+                               name_index=CompanyNameIndex(columns), loaded_at=datetime.now(timezone.utc))
+
+    async def ensure_loaded():
+        return snapshot
+    monkeypatch.setattr(tuesday_snapshot_store, "ensure_loaded", ensure_loaded)
+
+    app = FastAPI()
+    app.include_router(router)
+
+    @app.exception_handler(APIError)
+    async def api_error_handler(request: Request, exc: APIError):
+        return JSONResponse(status_code=exc.status_code, content={"detail": exc.detail})
+
+    with TestClient(app) as client:
+        yield client
+
+
+@pytest.fixture
+def anyio_backend() -> str:
+    return "asyncio"
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def serve() -> Iterator[Callable[[FastAPI], str]]:
+    """Serve a fake app on its own thread and event loop - returns its base URL"""
+    servers = []
+
+    def start(app: FastAPI) -> str:
+        port = _free_port()
+        server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning",
+                                               access_log=False, lifespan="off"))
+        thread = threading.Thread(target=server.run, daemon=True)
+        thread.start()
+        deadline = time.monotonic() + 5
+        while not server.started:
+            if not thread.is_alive() or time.monotonic() > deadline:
+                raise RuntimeError(f"Fake server on port {port} didn't start")
+            time.sleep(0.01)
+        servers.append((server, thread))
+        return f"http://127.0.0.1:{port}"
+
+    yield start
+
+    for server, thread in servers:
+        server.should_exit = True
+        thread.join(timeout=5)
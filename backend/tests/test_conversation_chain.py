@@ -0,0 +1,44 @@
+import asyncio
+import pytest
+from langchain_core.messages import HumanMessage
+from bench.fakes import FakeStreamingChatModel
+from app.services.chains.base_conversation_chain import BaseConversationChain
+
+pytestmark = pytest.mark.anyio
+
+
+class EchoChain(BaseConversationChain):
+    async def get_formatted_prompt(self, message: str):
+        return self.messages + [HumanMessage(content=message)]
+
+
+async def run_turn(chain, message, events):
+    async for response in chain.process_message(message):
+        if response["type"] in ("content", "complete"):
+            events.append((message, response["type"]))
+
+
+async def test_turns_on_a_shared_chain_do_not_interleave():
+    chain = EchoChain(FakeStreamingChatModel(first_token_ms=30, tokens_per_second=500, response_tokens=10))
+    events = []
+
+    # Two sockets on one conversation, sending at the same time
+    await asyncio.gather(run_turn(chain, "first", events), run_turn(chain, "second", events))
+
+    turns = [message for message, kind in events if kind == "complete"]
+    assert turns == ["first", "second"]
+    first_done = events.index(("first", "complete"))
+    assert all(message == "first" for message, _ in events[:first_done + 1])
+    assert [human.content for human, _ in chain.history.turns] == ["first", "second"]
+
+
+async def test_abandoned_turn_frees_the_chain():
+    chain = EchoChain(FakeStreamingChatModel(first_token_ms=0, tokens_per_second=50, response_tokens=50))
+
+    stream = chain.process_message("dropped")
+    await stream.__anext__()
+    await stream.aclose()  # Socket closed mid-answer
+
+    events = []
+    await asyncio.wait_for(run_turn(chain, "next", events), timeout=5)
+    assert events[-1] == ("next", "complete")
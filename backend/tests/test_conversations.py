@@ -0,0 +1,120 @@
+import base64
+import json
+import httpx
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+from fastapi.testclient import TestClient
+from bench.fakes import create_postgrest_app
+from app.api.endpoints import conversations
+from app.api.endpoints.conversations import _list_etag
+from app.core.supabase.client import AsyncSupabaseClient
+from app.core.supabase.errors import APIError, BadRequestError
+from app.services.db.conversation import ConversationService, decode_cursor, encode_cursor
+
+ROW = {"id": "0b6a4f0e-2a55-4a59-9a0c-3f1a3c1e9d21", "created_at": "2026-10-17T12:30:00.123456+00:00"}
+
+
+def _cursor(payload) -> str:
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip("=")
+
+
+@pytest.fixture
+def client(serve, monkeypatch):
+    """The conversations router against a fake PostgREST, with main's APIError handling"""
+    url = serve(create_postgrest_app(companies=12))
+    monkeypatch.setenv("SUPABASE_URL", url)
+    monkeypatch.setattr(conversations, "conversation_service", ConversationService(AsyncSupabaseClient()))
+
+    app = FastAPI()
+    app.include_router(conversations.router)
+
+    @app.exception_handler(APIError)
+    async def api_error_handler(request: Request, exc: APIError):
+        return JSONResponse(status_code=exc.status_code, content={"detail": exc.detail})
+
+    for i in range(3):
+        httpx.post(f"{url}/rest/v1/rpc/create_company_conversation",
+                   json={"p_company_name": f"Company {i}", "p_conversation_name": f"Analysis {i}"})
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+def test_cursor_round_trip():
+    assert decode_cursor(encode_cursor(ROW)) == (ROW["created_at"], ROW["id"])
+
+
+def test_cursor_values_are_normalized():
+    created_at, conversation_id = decode_cursor(_cursor(["2026-10-17T12:30:00Z", ROW["id"].upper()]))
+    assert created_at == "2026-10-17T12:30:00+00:00"
+    assert conversation_id == ROW["id"]
+
+
+@pytest.mark.parametrize("cursor", [
+    "not-a-cursor",
+    _cursor({"created_at": ROW["created_at"], "id": ROW["id"]}),
+    _cursor([ROW["created_at"]]),
+    _cursor(['2026-10-17",id.gt."0', ROW["id"]]),
+    _cursor([ROW["created_at"], '0),or(id.neq.0']),
+])
+def test_tampered_cursor_is_rejected(cursor):
+    with pytest.raises(BadRequestError):
+        decode_cursor(cursor)
+
+
+def test_tampered_cursor_is_a_400(client):
+    response = client.get("/conversations", params={"cursor": _cursor([ROW["created_at"], "1 or 1=1"])})
+    assert response.status_code == 400
+
+
+def test_pages_follow_the_cursor(client):
+    first = client.get("/conversations", params={"limit": 2}).json()
+    assert len(first["conversations"]) == 2 and first["next_cursor"]
+
+    second = client.get("/conversations", params={"limit": 2, "cursor": first["next_cursor"]}).json()
+    assert len(second["conversations"]) == 1 and second["next_cursor"] is None
+    ids = [conv["id"] for conv in first["conversations"] + second["conversations"]]
+    assert len(set(ids)) == 3
+
+
+def test_unchanged_page_is_a_304(client):
+    response = client.get("/conversations")
+    etag = response.headers["etag"]
+
+    not_modified = client.get("/conversations", headers={"If-None-Match": etag})
+    assert not_modified.status_code == 304
+    assert not_modified.headers["etag"] == etag
+
+    other_page = client.get("/conversations", params={"limit": 1}, headers={"If-None-Match": etag})
+    assert other_page.status_code == 200
+
+
+def _page():
+    return [
+        {"id": "a", "created_at": "2026-10-17T12:00:00+00:00", "name": "Analysis a",
+         "company_id": "1", "company_name": "Nvidia", "tuesday_ticker": "NVDA"},
+        {"id": "b", "created_at": "2026-10-17T11:00:00+00:00", "name": "Analysis b",
+         "company_id": None, "company_name": None, "tuesday_ticker": None},
+    ]
+
+
+def test_etag_is_stable_for_the_same_page():
+    assert _list_etag(_page(), None, 50, None) == _list_etag(_page(), None, 50, None)
+
+
+@pytest.mark.parametrize("change", [
+    lambda page: page[0].update(name="Renamed"),
+    lambda page: page.pop(),
+    lambda page: page[1].update(company_id="2", company_name="Apple", tuesday_ticker="AAPL"),
+    lambda page: page[0].update(company_name="NVIDIA Corp"),
+    lambda page: page[0].update(tuesday_ticker=None),
+])
+def test_etag_changes_with_the_page(change):
+    page = _page()
+    change(page)
+    assert _list_etag(page, None, 50, None) != _list_etag(_page(), None, 50, None)
+
+
+def test_etag_depends_on_the_page_requested():
+    assert _list_etag(_page(), None, 50, None) != _list_etag(_page(), None, 20, None)
+    assert _list_etag(_page(), None, 50, None) != _list_etag(_page(), "next", 50, None)
@@ -0,0 +1,66 @@
+import pytest
+from app.services.chains.dataset_context import DEFAULT_FIELDS, METRIC_LABELS, is_dataset_wide, mentioned_metrics
+
+
+@pytest.mark.parametrize("question", [
+    "Is NVDA a good investment?",
+    "Should I invest in this company?",
+    "Is it overvalued?",
+    "Is the stock undervalued right now?",
+    "Should I buy this stock?",
+    "Any recent developments?",
+    "Tell me about Apple",
+])
+def test_generic_questions_name_no_metric(question):
+    # No metric named - the selector falls back to DEFAULT_FIELDS
+    assert mentioned_metrics(question) == []
+
+
+@pytest.mark.parametrize("question, expected", [
+    ("What's the current price?", ['current_stock_price']),
+    ("How does its capex compare?", ['capex_intensity_ratio']),
+    ("Is it an asset heavy business?", ['capex_intensity_ratio']),
+    ("How much does it spend on R&D?", ['rd_intensity_percent']),
+    ("What's the ROIC?", ['return_on_invested_capital']),
+    ("What about carbon emissions?", ['ghg_emissions_per_revenue']),
+])
+def test_named_metrics_are_found(question, expected):
+    assert mentioned_metrics(question) == expected
+
+
+def test_metrics_are_ordered_by_first_mention():
+    assert mentioned_metrics("How is the ROIC, and what about the price?") == [
+        'return_on_invested_capital', 'current_stock_price']
+    assert mentioned_metrics("What's the price, and how is the ROIC?") == [
+        'current_stock_price', 'return_on_invested_capital']
+
+
+def test_keywords_match_word_starts_only():
+    # A keyword inside another word doesn't count
+    assert mentioned_metrics("Will they reprice contracts?") == []
+    assert mentioned_metrics("Is it an emerging leader?") == []
+
+
+def test_default_fields_are_known_metrics():
+    assert set(DEFAULT_FIELDS) <= set(METRIC_LABELS)
+
+
+@pytest.mark.parametrize("question", [
+    "Which companies have the best margins?",
+    "What other stocks grow faster?",
+    "Show me the top 10 by ROIC",
+    "List the laggards",
+    "Screen for high growth",
+    "How does it rank across the dataset?",
+])
+def test_dataset_wide_questions(question):
+    assert is_dataset_wide(question)
+
+
+@pytest.mark.parametrize("question", [
+    "Is NVDA a good investment?",
+    "How are its margins?",
+    "What's the outlook for this company?",
+])
+def test_company_questions_are_not_dataset_wide(question):
+    assert not is_dataset_wide(question)
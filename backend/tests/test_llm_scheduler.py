@@ -0,0 +1,216 @@
+import asyncio
+import pytest
+from google.api_core.exceptions import TooManyRequests
+from app.services.llm.llm_scheduler import LLMQueueFull, LLMScheduler, QueueStatus
+
+pytestmark = pytest.mark.anyio
+
+
+def fake_model(admitted, name, chunks=("a", "b"), release=None):
+    """start() for one call - records when it's admitted, optionally holds the slot until release is set"""
+    async def start():
+        admitted.append(name)
+        if release is not None:
+            await release.wait()
+        for chunk in chunks:
+            yield chunk
+    return start
+
+
+def quota_model(calls, fail_times, chunks_before_error=()):
+    """start() that raises a 429 on its first fail_times calls, after chunks_before_error"""
+    async def start():
+        calls.append(len(calls) + 1)
+        if len(calls) <= fail_times:
+            for chunk in chunks_before_error:
+                yield chunk
+            raise TooManyRequests("quota exhausted")
+        yield "ok"
+    return start
+
+
+async def collect(scheduler, session_id, start, background=False):
+    statuses, chunks = [], []
+    async for item in scheduler.stream(session_id, start, background=background):
+        (statuses if isinstance(item, QueueStatus) else chunks).append(item)
+    return statuses, chunks
+
+
+async def settle():
+    """Let newly created tasks reach their wait"""
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+async def hold_slot(scheduler, admitted):
+    """Fill the only slot until the returned event is set"""
+    release = asyncio.Event()
+    task = asyncio.create_task(collect(scheduler, "holder", fake_model(admitted, "holder", release=release)))
+    await settle()
+    assert scheduler.active == 1
+    return release, task
+
+
+async def test_sessions_are_served_round_robin():
+    scheduler = LLMScheduler(max_concurrent=1, status_interval=0.01)
+    admitted = []
+    release, holder = await hold_slot(scheduler, admitted)
+
+    tasks = []
+    for session_id, name in [("a", "a1"), ("a", "a2"), ("a", "a3"), ("b", "b1"), ("c", "c1")]:
+        tasks.append(asyncio.create_task(collect(scheduler, session_id, fake_model(admitted, name))))
+        await settle()
+    assert scheduler.queued == 5
+    assert [scheduler.position(waiter) for waiter in scheduler._queues["a"]] == [1, 4, 5]
+    assert [scheduler.position(waiter) for waiter in scheduler._queues["b"]] == [2]
+    assert [scheduler.position(waiter) for waiter in scheduler._queues["c"]] == [3]
+
+    release.set()
+    await asyncio.gather(holder, *tasks)
+    assert admitted == ["holder", "a1", "b1", "c1", "a2", "a3"]
+    assert scheduler.active == 0 and scheduler.queued == 0
+
+
+async def test_waiters_get_their_position():
+    scheduler = LLMScheduler(max_concurrent=1, status_interval=0.01)
+    admitted = []
+    release, holder = await hold_slot(scheduler, admitted)
+
+    first = asyncio.create_task(collect(scheduler, "a", fake_model(admitted, "a1")))
+    await settle()
+    second = asyncio.create_task(collect(scheduler, "b", fake_model(admitted, "b1")))
+    await settle()
+
+    release.set()
+    (first_statuses, first_chunks), (second_statuses, _) = await asyncio.gather(first, second)
+    assert first_chunks == ["a", "b"]
+    assert first_statuses[0].position == 1 and first_statuses[0].reason == "queued"
+    assert second_statuses[0].position == 2
+    await holder
+
+
+async def test_cancelled_waiter_gives_up_its_place():
+    scheduler = LLMScheduler(max_concurrent=1, status_interval=0.01)
+    admitted = []
+    release, holder = await hold_slot(scheduler, admitted)
+
+    leaving = asyncio.create_task(collect(scheduler, "a", fake_model(admitted, "a1")))
+    await settle()
+    staying = asyncio.create_task(collect(scheduler, "b", fake_model(admitted, "b1")))
+    await settle()
+    assert scheduler.queued == 2
+
+    leaving.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await leaving
+    assert scheduler.queued == 1
+    assert scheduler.position(scheduler._queues["b"][0]) == 1
+
+    release.set()
+    await asyncio.gather(holder, staying)
+    assert admitted == ["holder", "b1"]
+    assert scheduler.active == 0 and scheduler.queued == 0
+
+
+async def test_quota_error_before_first_chunk_is_retried():
+    scheduler = LLMScheduler(max_concurrent=1, quota_retries=2, status_interval=0.01)
+    scheduler.backoff = lambda attempt: 0.05
+    calls = []
+
+    statuses, chunks = await collect(scheduler, "a", quota_model(calls, fail_times=1))
+
+    assert chunks == ["ok"]
+    assert calls == [1, 2]
+    assert scheduler.quota_errors == 1
+    # The retry waited out the pause, reported as a rate limit
+    assert [status.reason for status in statuses] == ["rate_limit"]
+    assert scheduler.active == 0
+
+
+async def test_quota_error_after_first_chunk_is_raised():
+    scheduler = LLMScheduler(max_concurrent=1, quota_retries=2)
+    scheduler.backoff = lambda attempt: 0.01
+    calls = []
+
+    with pytest.raises(TooManyRequests):
+        await collect(scheduler, "a", quota_model(calls, fail_times=1, chunks_before_error=("partial",)))
+
+    assert calls == [1]  # Retrying would repeat "partial"
+    assert scheduler.active == 0
+
+
+async def test_quota_error_is_raised_once_retries_run_out():
+    scheduler = LLMScheduler(max_concurrent=1, quota_retries=2)
+    scheduler.backoff = lambda attempt: 0.01
+    calls = []
+
+    with pytest.raises(TooManyRequests):
+        await collect(scheduler, "a", quota_model(calls, fail_times=10))
+
+    assert calls == [1, 2, 3]
+    assert scheduler.quota_errors == 3
+    assert scheduler.active == 0
+
+
+async def test_queue_full_at_max_queued():
+    scheduler = LLMScheduler(max_concurrent=1, max_queued=2, status_interval=0.01)
+    admitted = []
+    release, holder = await hold_slot(scheduler, admitted)
+
+    queued = [asyncio.create_task(collect(scheduler, f"s{i}", fake_model(admitted, f"s{i}"))) for i in range(2)]
+    await settle()
+    assert scheduler.queued == 2
+
+    with pytest.raises(LLMQueueFull) as raised:
+        await collect(scheduler, "late", fake_model(admitted, "late"))
+    assert raised.value.retry_after > 0
+    assert scheduler.rejected == 1
+
+    release.set()
+    await asyncio.gather(holder, *queued)
+    assert "late" not in admitted
+
+
+async def test_background_calls_wait_for_sessions():
+    scheduler = LLMScheduler(max_concurrent=1, status_interval=0.01)
+    admitted = []
+    release, holder = await hold_slot(scheduler, admitted)
+
+    summary = asyncio.create_task(collect(scheduler, "summary", fake_model(admitted, "summary"), background=True))
+    await settle()
+    user = asyncio.create_task(collect(scheduler, "a", fake_model(admitted, "a1")))
+    await settle()
+
+    release.set()
+    await asyncio.gather(holder, summary, user)
+    assert admitted == ["holder", "a1", "summary"]
+    assert scheduler.stats()["background_active"] == 0
+
+
+async def test_background_calls_are_capped():
+    scheduler = LLMScheduler(max_concurrent=4, max_background=1, status_interval=0.01)
+    admitted = []
+    release = asyncio.Event()
+
+    summaries = [
+        asyncio.create_task(collect(scheduler, f"summary-{i}", fake_model(admitted, f"summary-{i}", release=release),
+                                    background=True))
+        for i in range(3)
+    ]
+    await settle()
+    assert scheduler.stats()["background_active"] == 1
+    assert scheduler.stats()["background_queued"] == 2
+
+    release.set()
+    await asyncio.gather(*summaries)
+    assert scheduler.active == 0
+
+
+async def test_invoke_returns_the_call_result():
+    scheduler = LLMScheduler(max_concurrent=1)
+
+    async def call():
+        return "summary"
+
+    assert await scheduler.invoke("a", call, background=True) == "summary"
+    assert scheduler.active == 0
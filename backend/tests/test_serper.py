@@ -0,0 +1,94 @@
+import asyncio
+import logging
+import pytest
+from bench.fakes import create_serper_app
+from app.services.search.serper import SerperSearchService
+
+pytestmark = pytest.mark.anyio
+
+
+async def _wait_for_cache(service: SerperSearchService, query: str, timeout: float = 2.0) -> str:
+    for _ in range(int(timeout / 0.02)):
+        cached = service.get_cached(query)
+        if cached is not None:
+            return cached
+        await asyncio.sleep(0.02)
+    raise AssertionError(f"{query!r} never reached the cache")
+
+
+async def test_search_past_deadline_returns_none_and_fills_cache(serve):
+    fake = create_serper_app(latency_ms=300, jitter_ms=0)
+    service = SerperSearchService(api_key="test", url=f"{serve(fake)}/search", deadline=0.05)
+    try:
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        assert await service.search("Acme earnings") is None
+        assert loop.time() - started < 0.25
+
+        # The request kept going after the deadline and lands in the cache
+        cached = await _wait_for_cache(service, "Acme earnings")
+        assert "Acme earnings" in cached
+        assert await service.search("acme   EARNINGS") == cached
+        assert fake.state.requests == 1
+    finally:
+        await service.aclose()
+
+
+async def test_concurrent_searches_share_one_request(serve):
+    fake = create_serper_app(latency_ms=100, jitter_ms=0)
+    service = SerperSearchService(api_key="test", url=f"{serve(fake)}/search", deadline=2.0)
+    try:
+        results = await asyncio.gather(*(service.search(query) for query in ["Acme news", "acme news", " ACME  news "]))
+        assert results[0] is not None
+        assert results == [results[0]] * 3
+        assert fake.state.requests == 1
+    finally:
+        await service.aclose()
+
+
+async def test_cached_result_expires_after_ttl(serve):
+    fake = create_serper_app(latency_ms=0, jitter_ms=0)
+    service = SerperSearchService(api_key="test", url=f"{serve(fake)}/search", deadline=2.0, cache_ttl=0.1)
+    try:
+        assert await service.search("Acme guidance") is not None
+        assert await service.search("Acme guidance") is not None
+        assert fake.state.requests == 1
+
+        await asyncio.sleep(0.15)
+        assert service.get_cached("Acme guidance") is None
+        assert await service.search("Acme guidance") is not None
+        assert fake.state.requests == 2
+    finally:
+        await service.aclose()
+
+
+async def test_failed_search_returns_none_and_caches_nothing(serve):
+    service = SerperSearchService(api_key="test", url=f"{serve(create_serper_app())}/missing", deadline=2.0)
+    try:
+        assert await service.search("Acme outlook") is None
+        assert service.get_cached("Acme outlook") is None
+    finally:
+        await service.aclose()
+
+
+async def test_zero_deadline_is_not_replaced_by_the_default(serve):
+    fake = create_serper_app(latency_ms=200, jitter_ms=0)
+    service = SerperSearchService(api_key="test", url=f"{serve(fake)}/search", deadline=5.0)
+    try:
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        assert await service.search("Acme margins", deadline=0) is None
+        assert loop.time() - started < 0.1
+        await _wait_for_cache(service, "Acme margins")
+    finally:
+        await service.aclose()
+
+
+async def test_failed_search_is_logged_once(serve, caplog):
+    service = SerperSearchService(api_key="test", url=f"{serve(create_serper_app())}/missing", deadline=2.0)
+    try:
+        with caplog.at_level(logging.ERROR, logger="app.services.search.serper"):
+            assert await service.search("Acme debt") is None
+        assert len([record for record in caplog.records if record.levelno >= logging.ERROR]) == 1
+    finally:
+        await service.aclose()
@@ -0,0 +1,62 @@
+import asyncio
+import pytest
+from bench.fakes import create_postgrest_app
+from app.core.metrics import DB_QUERY_SECONDS
+from app.core.supabase.client import AsyncSupabaseClient
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def fake_supabase(serve, monkeypatch):
+    """An AsyncSupabaseClient pointed at a fake PostgREST - set the client's env before calling"""
+    clients = []
+
+    def connect(latency_ms: float = 0.0):
+        fake = create_postgrest_app(companies=12, latency_ms=latency_ms)
+        monkeypatch.setenv("SUPABASE_URL", serve(fake))
+        monkeypatch.setenv("SUPABASE_KEY", "test")
+        client = AsyncSupabaseClient()
+        clients.append(client)
+        return fake, client
+
+    yield connect
+
+    for client in clients:
+        await client.aclose()
+
+
+async def test_execute_returns_rows_and_times_the_query(fake_supabase):
+    _, db = fake_supabase()
+    before = DB_QUERY_SECONDS.count(method="test.select", outcome="ok")
+
+    result = await db.execute(db.table("tuesday_dataset").select("stock_ticker").limit(3), label="test.select")
+
+    assert len(result.data) == 3
+    assert DB_QUERY_SECONDS.count(method="test.select", outcome="ok") == before + 1
+
+
+async def test_execute_times_out(fake_supabase, monkeypatch):
+    monkeypatch.setenv("SUPABASE_TIMEOUT_SECONDS", "0.2")
+    _, db = fake_supabase(latency_ms=1000)
+    before = DB_QUERY_SECONDS.count(method="test.slow", outcome="timeout")
+
+    started = asyncio.get_running_loop().time()
+    with pytest.raises(asyncio.TimeoutError):
+        await db.execute(db.table("tuesday_dataset").select("stock_ticker"), label="test.slow")
+
+    assert asyncio.get_running_loop().time() - started < 0.6
+    assert DB_QUERY_SECONDS.count(method="test.slow", outcome="timeout") == before + 1
+
+
+async def test_execute_caps_concurrent_queries(fake_supabase, monkeypatch):
+    monkeypatch.setenv("SUPABASE_MAX_CONCURRENCY", "2")
+    fake, db = fake_supabase(latency_ms=100)
+
+    results = await asyncio.gather(*(
+        db.execute(db.table("tuesday_dataset").select("stock_ticker").limit(1), label="test.capped")
+        for _ in range(6)
+    ))
+
+    assert all(len(result.data) == 1 for result in results)
+    assert fake.state.max_in_flight == 2
@@ -0,0 +1,91 @@
+import math
+import numpy as np
+import pytest
+from app.services.db.tuesday_columns import TuesdayColumns
+from app.services.db.tuesday_peers import PEER_FIELDS, compute_peer_table, standardize, tuesday_peer_engine
+
+TOLERANCE = 5e-3
+
+
+def brute_force_distances(columns: TuesdayColumns) -> np.ndarray:
+    """Every pair's RMS z-score distance over shared metrics, one pair at a time - inf where they aren't peers"""
+    fields = tuple(field for field in PEER_FIELDS if columns.has_metric(field))
+    z = standardize(columns, fields)
+    min_shared = max(len(fields) // 2, 1)
+    distances = np.full((columns.size, columns.size), np.inf)
+    for i in range(columns.size):
+        if columns.tickers[i] == "DESCRIPTION_ROW":
+            continue
+        for j in range(columns.size):
+            if i == j or columns.tickers[j] == "DESCRIPTION_ROW":
+                continue
+            shared = ~np.isnan(z[i]) & ~np.isnan(z[j])
+            if shared.sum() >= min_shared:
+                distances[i, j] = math.sqrt(np.mean((z[i, shared] - z[j, shared]) ** 2))
+    return distances
+
+
+@pytest.fixture(scope="module")
+def columns(tuesday_rows):
+    return TuesdayColumns(tuesday_rows)
+
+
+@pytest.fixture(scope="module")
+def expected(columns):
+    return brute_force_distances(columns)
+
+
+@pytest.mark.parametrize("block_rows", [512, 64, 7])
+def test_peer_table_matches_brute_force(columns, expected, block_rows):
+    k = 20
+    table = compute_peer_table(columns, k=k, block_rows=block_rows)
+
+    for row in range(1, columns.size):
+        nearest = np.sort(expected[row])[:k]
+        # Same distances in the same order - float32 products cancel to ~1e-3 around zero, so not bit-exact...
+        np.testing.assert_allclose(table.distances[row], nearest, rtol=1e-4, atol=TOLERANCE)
+        # ...and each listed peer really is at its listed distance - ties may come in either order
+        peers = table.neighbors[row]
+        assert len(set(peers.tolist())) == k and row not in peers
+        np.testing.assert_allclose(expected[row, peers], table.distances[row], rtol=1e-4, atol=TOLERANCE)
+
+
+def test_duplicate_companies_are_closest_peers(columns, tuesday_rows):
+    table = compute_peer_table(columns)
+    # tuesday_rows copies company 3 (row 4 after the description row) onto rows 41 and 42
+    assert set(table.neighbors[4, :2].tolist()) == {41, 42}
+    np.testing.assert_allclose(table.distances[4, :2], 0, atol=TOLERANCE)
+
+
+def test_description_row_is_nobodys_peer(columns):
+    table = compute_peer_table(columns)
+    assert 0 not in table.neighbors
+    assert (table.neighbors[0] == -1).all()
+    assert table.peers(0, 5) == []
+
+
+def test_peer_table_is_padded_for_small_datasets(tuesday_rows):
+    columns = TuesdayColumns(tuesday_rows[1:4])
+    table = compute_peer_table(columns, k=20)
+    assert table.neighbors.shape == (3, 2)
+    assert len(table.peers(0, 20)) <= 2
+
+
+def test_peers_endpoint(tuesday_client, tuesday_rows):
+    ticker = tuesday_rows[4]["stock_ticker"]
+    response = tuesday_client.get(f"/companies/{ticker.lower()}/peers", params={"limit": 3})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["ticker"] == ticker
+    assert [peer["rank"] for peer in body["peers"]] == [1, 2, 3]
+    assert {peer["ticker"] for peer in body["peers"][:2]} == {tuesday_rows[41]["stock_ticker"], tuesday_rows[42]["stock_ticker"]}
+
+
+@pytest.mark.parametrize("ticker", ["DESCRIPTION_ROW", "description_row", "NOPE"])
+def test_peers_404_for_non_companies(tuesday_client, ticker):
+    assert tuesday_client.get(f"/companies/{ticker}/peers").status_code == 404
+
+
+def test_peers_limit_is_capped_at_the_table_size(tuesday_client, tuesday_rows):
+    ticker = tuesday_rows[4]["stock_ticker"]
+    assert tuesday_client.get(f"/companies/{ticker}/peers", params={"limit": tuesday_peer_engine.k + 1}).status_code == 422
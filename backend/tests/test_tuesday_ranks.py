@@ -0,0 +1,69 @@
+import math
+import numpy as np
+import pytest
+from app.services.db.tuesday_columns import METRIC_FIELDS, TuesdayColumns
+from app.services.db.tuesday_ranks import compute_metric_ranks
+
+
+def brute_force_ranks(column: np.ndarray):
+    """Mid-rank percentile and rank-from-the-top of every value, one value at a time"""
+    present = column[~np.isnan(column)]
+    percentiles, ranks = [], []
+    for value in column:
+        if math.isnan(value):
+            percentiles.append(math.nan)
+            ranks.append(0)
+            continue
+        below = int((present < value).sum())
+        equal = int((present == value).sum())
+        percentiles.append((2 * below + equal) / (2 * present.size) * 100)
+        ranks.append(int((present > value).sum()) + 1)
+    return np.array(percentiles), np.array(ranks)
+
+
+def test_ranks_match_brute_force(tuesday_rows):
+    columns = TuesdayColumns(tuesday_rows)
+    ranks = compute_metric_ranks(columns)
+
+    assert set(ranks.percentiles) == set(METRIC_FIELDS)
+    for field in METRIC_FIELDS:
+        percentiles, field_ranks = brute_force_ranks(columns.metrics[field])
+        np.testing.assert_allclose(ranks.percentiles[field], percentiles, rtol=1e-5, equal_nan=True)
+        np.testing.assert_array_equal(ranks.ranks[field], field_ranks)
+        assert ranks.counts[field] == int((~np.isnan(columns.metrics[field])).sum())
+
+
+def test_ties_share_percentile_and_best_rank():
+    rows = [{"stock_ticker": f"T{i}", "rule_of_40_score": value} for i, value in enumerate(["10", "20", "20", None, "30"])]
+    ranks = compute_metric_ranks(TuesdayColumns(rows))
+
+    np.testing.assert_allclose(ranks.percentiles["rule_of_40_score"], [12.5, 50, 50, math.nan, 87.5], equal_nan=True)
+    assert ranks.ranks["rule_of_40_score"].tolist() == [4, 2, 2, 0, 1]
+    assert ranks.counts["rule_of_40_score"] == 4
+    assert ranks.lookup(1, "rule_of_40_score") == {"percentile": 50.0, "rank": 2, "count": 4}
+    assert ranks.lookup(3, "rule_of_40_score") is None
+
+
+def test_description_row_has_no_ranks(tuesday_rows):
+    ranks = compute_metric_ranks(TuesdayColumns(tuesday_rows))
+    assert all(ranks.lookup(0, field) is None for field in METRIC_FIELDS)
+
+
+def test_rank_arrays_are_read_only(tuesday_rows):
+    ranks = compute_metric_ranks(TuesdayColumns(tuesday_rows))
+    with pytest.raises(ValueError):
+        ranks.ranks["rule_of_40_score"][1] = 1
+
+
+def test_percentiles_endpoint(tuesday_client, tuesday_rows):
+    ticker = tuesday_rows[1]["stock_ticker"]
+    response = tuesday_client.get(f"/companies/{ticker}/percentiles")
+    assert response.status_code == 200
+    body = response.json()
+    assert body["ticker"] == ticker
+    assert set(body["metrics"]) == set(METRIC_FIELDS)
+
+
+@pytest.mark.parametrize("ticker", ["DESCRIPTION_ROW", "NOPE"])
+def test_percentiles_404_for_non_companies(tuesday_client, ticker):
+    assert tuesday_client.get(f"/companies/{ticker}/percentiles").status_code == 404
@@ -14,6 +14,15 @@ export interface ProcessCompanyResponse {
   error?: string;
 }
 
+export interface ProcessCompaniesResponse {
+  success: boolean;
+  message?: string;
+  succeeded?: number;
+  failed?: number;
+  results?: ProcessCompanyResponse[];
+  error?: string;
+}
+
 export class CompanyService extends BaseApiService {
   constructor() {
     super("/company"); // Base path for company endpoints
@@ -44,6 +53,38 @@ export class CompanyService extends BaseApiService {
       };
     }
   }
+
+  /**
+   * Process many companies in one request - each name gets its own result
+   */
+  async processCompanies(
+    companyNames: string[]
+  ): Promise<ProcessCompaniesResponse> {
+    try {
+      console.log(
+        `[CompanyService] Processing ${companyNames.length} companies`
+      );
+
+      const response = await this.post<ProcessCompaniesResponse>(
+        "/process-companies",
+        {
+          company_names: companyNames,
+        }
+      );
+
+      console.log(
+        `[CompanyService] Companies processed: ${response.succeeded} ok, ${response.failed} failed`
+      );
+      return response;
+    } catch (error) {
+      console.error("[CompanyService] Error processing companies:", error);
+      return {
+        success: false,
+        error:
+          error instanceof Error ? error.message : "Unknown error occurred",
+      };
+    }
+  }
 }
 
 export const companyService = new CompanyService();
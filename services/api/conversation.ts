@@ -4,11 +4,15 @@ export interface ConversationResponse {
   id: string;
   name: string;
   created_at: string;
+  company_id?: string | null;
+  company_name?: string | null;
+  tuesday_ticker?: string | null; // Tuesday dataset match for the company
 }
 
 export interface GetConversationsResponse {
   success: boolean;
   conversations: ConversationResponse[];
+  next_cursor?: string | null; // Pass back as `cursor` to fetch the next page
   message?: string;
   error?: string;
 }
@@ -19,13 +23,19 @@ export class ConversationService extends BaseApiService {
   }
 
   /**
-   * Fetch all conversations from the treasure chest, arrr!
+   * Fetch a page of conversations from the treasure chest, arrr!
    */
-  async getAllConversations(): Promise<GetConversationsResponse> {
+  async getAllConversations(
+    limit?: number,
+    cursor?: string
+  ): Promise<GetConversationsResponse> {
     try {
-      console.log("[ConversationService] Fetching all conversations");
+      console.log("[ConversationService] Fetching conversations");
 
-      const response = await this.get<GetConversationsResponse>("");
+      const response = await this.get<GetConversationsResponse>("", {
+        limit,
+        cursor,
+      });
 
       console.log(
         `[ConversationService] Found ${
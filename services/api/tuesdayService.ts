@@ -0,0 +1,47 @@
+import { BaseApiService } from "./baseService";
+
+export interface CompanySuggestion {
+  ticker: string;
+  name: string;
+  label: string; // "NVIDIA CORP (NVDA)" - same shape as COMPANY_NAMES values
+  score: number;
+}
+
+export interface SearchCompaniesResponse {
+  success: boolean;
+  companies: CompanySuggestion[];
+  dataset_version?: number;
+  message?: string;
+  error?: string;
+}
+
+export class TuesdayService extends BaseApiService {
+  constructor() {
+    super("/tuesday"); // Base path for Tuesday dataset endpoints
+  }
+
+  /**
+   * Ranked company autocomplete from the server-side name index
+   */
+  async searchCompanies(
+    query: string,
+    limit: number = 8
+  ): Promise<SearchCompaniesResponse> {
+    try {
+      return await this.get<SearchCompaniesResponse>("/companies/search", {
+        q: query,
+        limit,
+      });
+    } catch (error) {
+      console.error("[TuesdayService] Error searching companies:", error);
+      return {
+        success: false,
+        companies: [],
+        error:
+          error instanceof Error ? error.message : "Unknown error occurred",
+      };
+    }
+  }
+}
+
+export const tuesdayService = new TuesdayService();
@@ -4,6 +4,12 @@ export type MessageCallback = (content: string) => void;
 export type CompletionCallback = () => void;
 export type ErrorCallback = (error: Error) => void;
 export type ConnectionStatusCallback = (status: string) => void;
+export type QueueStatus = {
+  position: number;
+  eta_seconds: number;
+  reason: "queued" | "rate_limit";
+};
+export type QueueStatusCallback = (status: QueueStatus) => void;
 
 export type ConnectionState =
   | "disconnected"
@@ -214,6 +220,11 @@ export class WebSocketService {
           console.log("[WSService] Heartbeat acknowledged");
           break;
 
+        case "queue_status":
+          // Waiting for model capacity - the reply follows on this socket
+          this.events.emit("queueStatus", message.data);
+          break;
+
         case "error":
           console.error("[WSService] Server error:", message);
           const errorMessage = message.data?.message || "Server error";
@@ -362,6 +373,14 @@ export class WebSocketService {
     return () => this.events.off("connectionStatus", callback);
   }
 
+  /**
+   * Register queue status handler (position and ETA while a reply waits for the model)
+   */
+  onQueueStatus(callback: QueueStatusCallback): () => void {
+    this.events.on("queueStatus", callback);
+    return () => this.events.off("queueStatus", callback);
+  }
+
   /**
    * Remove all event listeners (for cleanup)
    */